@@ -0,0 +1,155 @@
+import collections
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+# Micro-batching para a API de inferência: requisições concorrentes que chegam
+# dentro de uma janela de poucos milissegundos são juntadas em um único lote,
+# e o modelo roda uma vez por lote em vez de uma vez por requisição.
+
+class FilaCheia(Exception):
+    """A fila do batcher atingiu o limite (backpressure: o cliente deve tentar de novo)."""
+
+class LatencyMetrics:
+    """Latência (p50/p99) das últimas requisições, vazão e tamanho dos lotes."""
+
+    def __init__(self, janela=10_000):
+        self._latencias = collections.deque(maxlen=janela)
+        self._tamanhos_lote = collections.deque(maxlen=janela)
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+        self.total_requisicoes = 0
+        self.total_lotes = 0
+        self.total_lotes_com_falha = 0  # lote inteiro falhou (requisições refeitas uma a uma)
+        self.total_rejeitadas = 0
+
+    def registrar_lote(self, latencias, n_linhas, falhou=False):
+        with self._lock:
+            self._latencias.extend(latencias)
+            self._tamanhos_lote.append(n_linhas)
+            self.total_requisicoes += len(latencias)
+            self.total_lotes += 1
+            self.total_lotes_com_falha += falhou
+
+    def registrar_rejeicao(self):
+        with self._lock:
+            self.total_rejeitadas += 1
+
+    def resumo(self):
+        with self._lock:
+            latencias = np.array(self._latencias) * 1000
+            tamanhos = np.array(self._tamanhos_lote)
+            duracao = time.time() - self.inicio
+            return {
+                "requisicoes": self.total_requisicoes,
+                "rejeitadas": self.total_rejeitadas,
+                "lotes": self.total_lotes,
+                "lotes_com_falha": self.total_lotes_com_falha,
+                "vazao_req_s": round(self.total_requisicoes / duracao, 2) if duracao > 0 else 0.0,
+                "latencia_p50_ms": round(float(np.percentile(latencias, 50)), 3) if len(latencias) else None,
+                "latencia_p99_ms": round(float(np.percentile(latencias, 99)), 3) if len(latencias) else None,
+                "linhas_por_lote_media": round(float(tamanhos.mean()), 2) if len(tamanhos) else None,
+            }
+
+class MicroBatcher:
+    """
+    Junta os DataFrames enviados por 'submit' em lotes e chama 'funcao_lote'
+    uma vez por lote, em uma thread própria.
+
+    Um lote fecha quando a janela ('janela_ms', contada a partir da primeira
+    requisição do lote) termina ou quando atinge 'max_linhas'. A fila é
+    limitada a 'max_fila' requisições: acima disso 'submit' levanta FilaCheia.
+
+    Args:
+        funcao_lote (callable): Recebe um DataFrame e devolve um DataFrame com
+                                uma linha de resultado por linha de entrada
+                                (ou None em caso de erro).
+        janela_ms (float): Janela de espera para juntar requisições.
+        max_linhas (int): Tamanho máximo do lote, em linhas.
+        max_fila (int): Máximo de requisições aguardando na fila.
+    """
+
+    def __init__(self, funcao_lote, janela_ms=5.0, max_linhas=1024, max_fila=10_000):
+        self.funcao_lote = funcao_lote
+        self.janela = janela_ms / 1000
+        self.max_linhas = max_linhas
+        self.fila = queue.Queue(maxsize=max_fila)
+        self.metricas = LatencyMetrics()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _garantir_thread(self):
+        # Threads não sobrevivem ao fork: cada worker do gunicorn inicia a sua
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self._loop, daemon=True).start()
+                    self._pid = os.getpid()
+
+    def submit(self, df_entrada):
+        """Enfileira um DataFrame e retorna um Future com o seu pedaço do resultado."""
+        self._garantir_thread()
+        futuro = Future()
+        try:
+            self.fila.put_nowait((df_entrada, futuro, time.perf_counter()))
+        except queue.Full:
+            self.metricas.registrar_rejeicao()
+            raise FilaCheia(f"Fila cheia ({self.fila.maxsize} requisições aguardando)")
+        return futuro
+
+    def _coletar_lote(self):
+        """Bloqueia até a primeira requisição e junta as que chegarem na janela."""
+        itens = [self.fila.get()]
+        n_linhas = len(itens[0][0])
+        limite = time.perf_counter() + self.janela
+
+        while n_linhas < self.max_linhas:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                item = self.fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            itens.append(item)
+            n_linhas += len(item[0])
+        return itens, n_linhas
+
+    def _processar(self, df_entrada):
+        resultado = self.funcao_lote(df_entrada)
+        if resultado is None:
+            raise RuntimeError("Falha ao processar o lote (ver log do serviço).")
+        return resultado
+
+    def _loop(self):
+        while True:
+            itens, n_linhas = self._coletar_lote()
+
+            try:
+                resultado = self._processar(pd.concat([item[0] for item in itens]))
+            except Exception as e:
+                if len(itens) == 1:
+                    itens[0][1].set_exception(e)
+                else:
+                    # Uma requisição ruim não derruba as outras do lote: refaz uma a uma
+                    for df_entrada, futuro, _ in itens:
+                        try:
+                            futuro.set_result(self._processar(df_entrada))
+                        except Exception as erro:
+                            futuro.set_exception(erro)
+                fim_lote = time.perf_counter()
+                self.metricas.registrar_lote([fim_lote - item[2] for item in itens], n_linhas, falhou=True)
+                continue
+
+            # Devolve a cada requisição as suas linhas (por posição)
+            fim_lote = time.perf_counter()
+            inicio = 0
+            for df_entrada, futuro, _ in itens:
+                futuro.set_result(resultado.iloc[inicio:inicio + len(df_entrada)])
+                inicio += len(df_entrada)
+            self.metricas.registrar_lote([fim_lote - item[2] for item in itens], n_linhas)
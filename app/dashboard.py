@@ -0,0 +1,388 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Blueprint, jsonify, request
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from models.classification_rules import CLASSES, classify_attainment
+
+# Backend do dashboard da carteira (gerentes de conta): classes de Health
+# Score, risco de churn e atingimento de meta, abertos por meio de pagamento,
+# faixa de parcelas e semana.
+#
+# As visões saem de cubos pré-agregados no refresh ('refresh_cubes'), e não
+# de 'engineer_features' ou do modelo a cada página:
+#
+# - 'clientes':   classe x risco_churn x faixa_atingimento
+#                 -> n_clientes, tpv_total, tpv_meta, soma_prob_churn
+# - 'transacoes': classe x risco_churn x faixa_atingimento x meio x
+#                 faixa_parcelas x semana -> n_transacoes, tpv, margem
+#
+# Cada cubo é um array denso (medida x dimensões) de poucos MB, qualquer que
+# seja o tamanho da carteira: uma consulta filtra os eixos pedidos e soma os
+# demais (microssegundos a milissegundos), sem tocar no histórico.
+# Contagem de clientes só existe no cubo 'clientes': um cliente aparece em
+# várias células de 'transacoes' e a soma lá não seria de clientes distintos.
+
+DASHBOARD_DIR = os.path.join(PROJECT_ROOT, 'dados', 'dashboard')
+
+SEM_SCORE = 'Sem score'
+CLASSES_DASHBOARD = CLASSES + [SEM_SCORE]
+
+# Probabilidade de churn (0-1) -> risco (limites inferiores, inclusivos)
+LIMITES_RISCO_CHURN = np.array([0.3, 0.6])
+RISCOS_CHURN = ['Baixo', 'Medio', 'Alto', SEM_SCORE]
+
+# Parcelas -> faixa (limites inferiores, inclusivos). Nulo ou 0 conta como à vista.
+LIMITES_PARCELAS = np.array([2, 4, 7, 13])
+FAIXAS_PARCELAS = ['1x', '2-3x', '4-6x', '7-12x', '13x+']
+
+DIMENSOES_CLIENTE = ('classe', 'risco_churn', 'faixa_atingimento')
+CUBOS = {
+    'clientes': {
+        'dimensoes': DIMENSOES_CLIENTE,
+        'medidas': ('n_clientes', 'tpv_total', 'tpv_meta', 'soma_prob_churn'),
+    },
+    'transacoes': {
+        'dimensoes': DIMENSOES_CLIENTE + ('meio', 'faixa_parcelas', 'semana'),
+        'medidas': ('n_transacoes', 'tpv', 'margem'),
+    },
+}
+
+def _probabilidade_churn(df_clientes):
+    # A tabela de scores guarda a probabilidade em % (0-100, ver 'predict_churn_batch')
+    return df_clientes['probabilidade_churn'].to_numpy(dtype=np.float64, na_value=np.nan) / 100
+
+def _codigos_cliente(df_clientes):
+    """
+    Célula (classe x risco x faixa de atingimento) de cada cliente.
+
+    Args:
+        df_clientes (pd.DataFrame): 'id_cliente' como índice e as colunas
+            'classificacao' (classe prevista), 'probabilidade_churn' (em %) e
+            'atingimento_meta_tpv'. Valores nulos vão para 'Sem score' (a
+            faixa de atingimento nula segue a regra: 'Critico').
+    """
+    classe = pd.Categorical(df_clientes['classificacao'], categories=CLASSES_DASHBOARD).codes
+    classe = np.where(classe < 0, len(CLASSES), classe)
+
+    probabilidade = _probabilidade_churn(df_clientes)
+    risco = np.searchsorted(LIMITES_RISCO_CHURN, probabilidade, side='right')
+    risco[np.isnan(probabilidade)] = len(RISCOS_CHURN) - 1
+
+    faixa = classify_attainment(df_clientes['atingimento_meta_tpv']).cat.codes.to_numpy()
+    return (classe * len(RISCOS_CHURN) + risco) * len(CLASSES) + faixa
+
+class _AcumuladorTransacoes:
+    """
+    Soma os blocos do histórico no cubo 'transacoes'. Os eixos de meio e de
+    semana crescem conforme aparecem meios e semanas novos.
+    """
+
+    def __init__(self, n_celulas_cliente):
+        self.n_celulas_cliente = n_celulas_cliente
+        self.meios = []
+        self.semana_inicial = None
+        # medida x célula do cliente x meio x faixa de parcelas x semana
+        self.cubo = np.zeros((3, n_celulas_cliente, 0, len(FAIXAS_PARCELAS), 0))
+
+    def _crescer(self, n_meios, semana_min, semana_max):
+        if self.semana_inicial is None:
+            self.semana_inicial = semana_min
+        semana_final = self.semana_inicial + self.cubo.shape[4] - 1
+        antes = max(self.semana_inicial - semana_min, 0)
+        depois = max(semana_max - semana_final, 0)
+        mais_meios = n_meios - self.cubo.shape[2]
+        if antes or depois or mais_meios:
+            self.cubo = np.pad(self.cubo, ((0, 0), (0, 0), (0, mais_meios), (0, 0), (antes, depois)))
+            self.semana_inicial -= antes
+
+    def add(self, celula_cliente, df_bloco):
+        # 1. Códigos do bloco: meio (dicionário global), faixa de parcelas e semana
+        codes_meio, meios_bloco = pd.factorize(df_bloco['meio_pagamento'].to_numpy())
+        for meio in map(str, meios_bloco):
+            if meio not in self.meios:
+                self.meios.append(meio)
+        meio = np.where(codes_meio >= 0, pd.Index(self.meios).get_indexer(list(map(str, meios_bloco)))[codes_meio], -1)
+
+        parcelas = df_bloco['parcelas'].to_numpy(dtype=np.float64, na_value=np.nan)
+        faixa_parcelas = np.searchsorted(LIMITES_PARCELAS, np.nan_to_num(parcelas, nan=1.0), side='right')
+
+        # Semanas começando na segunda-feira (1970-01-01 foi uma quinta)
+        dias = pd.to_datetime(df_bloco['data']).to_numpy('datetime64[D]')
+        validas = ~np.isnat(dias) & (meio >= 0)
+        semana = (dias.astype(np.int64) + 3) // 7
+        if not validas.any():
+            return
+        self._crescer(len(self.meios), int(semana[validas].min()), int(semana[validas].max()))
+
+        # 2. Um bincount por medida sobre a célula combinada
+        _, _, n_meios, n_faixas, n_semanas = self.cubo.shape
+        celula = (((celula_cliente * n_meios + meio) * n_faixas + faixa_parcelas) * n_semanas
+                  + (semana - self.semana_inicial))[validas]
+        tpv = df_bloco['tpv_dia'].to_numpy(dtype=np.float64, na_value=np.nan)[validas]
+        margem = df_bloco['margem_op_dia'].to_numpy(dtype=np.float64, na_value=np.nan)[validas]
+        n_celulas = self.cubo[0].size
+        for i, pesos in enumerate((None, np.nan_to_num(tpv), np.nan_to_num(margem))):
+            self.cubo[i] += np.bincount(celula, weights=pesos, minlength=n_celulas).reshape(self.cubo.shape[1:])
+
+def refresh_cubes(df_clientes, historico, pasta=DASHBOARD_DIR):
+    """
+    Recalcula e grava os cubos do dashboard.
+
+    Args:
+        df_clientes (pd.DataFrame): Um cliente por linha ('id_cliente' como
+            índice) com 'classificacao', 'probabilidade_churn' (em %, da tabela de
+            scores), 'atingimento_meta_tpv', 'tpv_total' e 'tpv_meta' (das
+            features da FASE 2).
+        historico (pd.DataFrame ou iterável de DataFrames): Histórico da FASE 1,
+            inteiro ou em blocos (ex: 'iter_historical_data').
+        pasta (str): Onde gravar os cubos.
+
+    Returns:
+        dict: Os metadados gravados (inclui o tempo do refresh).
+    """
+    inicio = time.perf_counter()
+    n_celulas_cliente = len(CLASSES_DASHBOARD) * len(RISCOS_CHURN) * len(CLASSES)
+    celula_cliente = _codigos_cliente(df_clientes)
+
+    # 1. Cubo 'clientes': uma linha por cliente
+    pesos = {
+        'n_clientes': None,
+        'tpv_total': df_clientes['tpv_total'].to_numpy(dtype=np.float64, na_value=np.nan),
+        'tpv_meta': df_clientes['tpv_meta'].to_numpy(dtype=np.float64, na_value=np.nan),
+        'soma_prob_churn': _probabilidade_churn(df_clientes),
+    }
+    forma_clientes = (len(CLASSES_DASHBOARD), len(RISCOS_CHURN), len(CLASSES))
+    cubo_clientes = np.stack([
+        np.bincount(celula_cliente, weights=None if p is None else np.nan_to_num(p),
+                    minlength=n_celulas_cliente).reshape(forma_clientes)
+        for p in pesos.values()
+    ])
+
+    # 2. Cubo 'transacoes': bloco a bloco do histórico
+    indice_clientes = pd.Index(df_clientes.index.astype(str))
+    sem_cliente = _codigos_cliente(pd.DataFrame(
+        {'classificacao': [None], 'probabilidade_churn': [np.nan], 'atingimento_meta_tpv': [np.nan]}))[0]
+    acumulador = _AcumuladorTransacoes(n_celulas_cliente)
+    n_linhas = 0
+    for df_bloco in ([historico] if isinstance(historico, pd.DataFrame) else historico):
+        # Clientes do histórico fora da tabela de clientes entram como 'Sem score'
+        posicao = indice_clientes.get_indexer(df_bloco['id_cliente'].astype(str))
+        acumulador.add(np.where(posicao >= 0, celula_cliente[posicao], sem_cliente), df_bloco)
+        n_linhas += len(df_bloco)
+    cubo_transacoes = acumulador.cubo.reshape(
+        (3,) + forma_clientes + acumulador.cubo.shape[2:])
+
+    semanas = []
+    if acumulador.semana_inicial is not None:
+        semanas = [str(np.datetime64(s * 7 - 3, 'D'))
+                   for s in range(acumulador.semana_inicial, acumulador.semana_inicial + cubo_transacoes.shape[-1])]
+    rotulos = {
+        'classe': CLASSES_DASHBOARD,
+        'risco_churn': RISCOS_CHURN,
+        'faixa_atingimento': CLASSES,
+        'meio': acumulador.meios,
+        'faixa_parcelas': FAIXAS_PARCELAS,
+        'semana': semanas,
+    }
+
+    # 3. Gravação atômica (o servidor recarrega quando o metadado muda)
+    os.makedirs(pasta, exist_ok=True)
+    tmp_path = os.path.join(pasta, 'cubos.tmp.npz')
+    np.savez(tmp_path, clientes=cubo_clientes, transacoes=cubo_transacoes)
+    os.replace(tmp_path, os.path.join(pasta, 'cubos.npz'))
+
+    metadata = {
+        'rotulos': rotulos,
+        'clientes': len(df_clientes),
+        'linhas_historico': n_linhas,
+        'celulas': {'clientes': int(cubo_clientes[0].size), 'transacoes': int(cubo_transacoes[0].size)},
+        'tempo_refresh_s': round(time.perf_counter() - inicio, 2),
+        'atualizado_em': pd.Timestamp.now().isoformat(timespec='seconds'),
+    }
+    with open(os.path.join(pasta, 'cubos.json.tmp'), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    os.replace(os.path.join(pasta, 'cubos.json.tmp'), os.path.join(pasta, 'cubos.json'))
+
+    print(f"Cubos do dashboard atualizados em {metadata['tempo_refresh_s']}s "
+          f"({len(df_clientes)} clientes, {n_linhas} linhas do histórico).")
+    return metadata
+
+class DashboardCubes:
+    """
+    Cubos gravados por 'refresh_cubes', em memória. Recarrega sozinho quando
+    um refresh novo é gravado.
+
+    Uso:
+        cubos = DashboardCubes()
+        cubos.query('transacoes', por=['meio', 'semana'], filtros={'classe': ['Critico']})
+    """
+
+    def __init__(self, pasta=DASHBOARD_DIR):
+        self.pasta = pasta
+        self._versao = None
+        self._cubos = None
+        self.metadata = None
+        self._lock = threading.Lock()
+
+    def _carregar(self):
+        path_metadata = os.path.join(self.pasta, 'cubos.json')
+        try:
+            versao = os.stat(path_metadata).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if versao != self._versao:
+            with self._lock:
+                if versao != self._versao:
+                    with open(path_metadata, encoding='utf-8') as f:
+                        metadata = json.load(f)
+                    with np.load(os.path.join(self.pasta, 'cubos.npz')) as arquivo:
+                        self._cubos = {nome: arquivo[nome] for nome in CUBOS}
+                    self.metadata = metadata
+                    self._versao = versao
+        return True
+
+    def summary(self):
+        """Metadados do último refresh (rótulos das dimensões, tempo, tamanho), ou None."""
+        if not self._carregar():
+            return None
+        return self.metadata
+
+    def query(self, cubo, por=(), filtros=None, inicio=None, fim=None):
+        """
+        Consulta um cubo: filtra as dimensões e soma tudo o que não está em 'por'.
+
+        Args:
+            cubo (str): 'clientes' ou 'transacoes'.
+            por (list): Dimensões do resultado (ex: ['classe', 'meio']).
+            filtros (dict, opcional): {dimensão: [valores]} a manter.
+            inicio, fim (str, opcional): Semanas (YYYY-MM-DD, inclusive) do cubo 'transacoes'.
+
+        Returns:
+            pd.DataFrame: Uma linha por combinação de 'por' com alguma
+                          ocorrência, com as medidas e as derivadas
+                          (tpv_medio_cliente / atingimento_carteira / prob_churn_media
+                          ou tpv_medio_transacao / take_rate), ou None se não houver cubos.
+        """
+        if cubo not in CUBOS:
+            raise ValueError(f"Cubo '{cubo}' inválido. Use um de {list(CUBOS)}.")
+        if not self._carregar():
+            return None
+        dimensoes, medidas = CUBOS[cubo]['dimensoes'], CUBOS[cubo]['medidas']
+        por = list(por)
+        invalidas = [d for d in por + list(filtros or {}) if d not in dimensoes]
+        if invalidas:
+            raise ValueError(f"Dimensões inválidas para o cubo '{cubo}': {invalidas}")
+
+        # 1. Filtros: fica só a parte pedida de cada eixo
+        valores = self._cubos[cubo]
+        rotulos = {d: list(self.metadata['rotulos'][d]) for d in dimensoes}
+        filtros = dict(filtros or {})
+        if cubo == 'transacoes' and (inicio is not None or fim is not None):
+            filtros['semana'] = [s for s in filtros.get('semana', rotulos['semana'])
+                                 if (inicio is None or s >= inicio) and (fim is None or s <= fim)]
+        for eixo, dimensao in enumerate(dimensoes):
+            if dimensao in filtros:
+                manter = [i for i, rotulo in enumerate(rotulos[dimensao]) if rotulo in set(filtros[dimensao])]
+                valores = np.take(valores, manter, axis=eixo + 1)
+                rotulos[dimensao] = [rotulos[dimensao][i] for i in manter]
+
+        # 2. Soma dos eixos fora de 'por' e reordenação na ordem de 'por'
+        somar = tuple(eixo + 1 for eixo, d in enumerate(dimensoes) if d not in por)
+        valores = valores.sum(axis=somar)
+        restantes = [d for d in dimensoes if d in por]
+        valores = np.moveaxis(valores, [restantes.index(d) + 1 for d in por], range(1, len(por) + 1))
+
+        # 3. Tabela só com as combinações que têm ocorrências
+        valores = valores.reshape(len(medidas), -1)
+        indice = pd.MultiIndex.from_product([rotulos[d] for d in por], names=por) if por else pd.RangeIndex(1)
+        df = pd.DataFrame(valores.T, index=indice, columns=list(medidas))
+        df = df[df[medidas[0]] > 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if cubo == 'clientes':
+                df['tpv_medio_cliente'] = df['tpv_total'] / df['n_clientes']
+                df['atingimento_carteira'] = df['tpv_total'] / df['tpv_meta']
+                df['prob_churn_media'] = df['soma_prob_churn'] / df['n_clientes']
+            else:
+                df['tpv_medio_transacao'] = df['tpv'] / df['n_transacoes']
+                df['take_rate'] = df['margem'] / df['tpv']
+        return df.reset_index() if por else df.reset_index(drop=True)
+
+# --- Rotas (registradas em app/main.py) ---
+
+dashboard = Blueprint('dashboard', __name__, url_prefix='/dashboard')
+cubos = DashboardCubes()
+
+@dashboard.route('/resumo', methods=['GET'])
+def resumo():
+    """Dimensões, valores possíveis e tempo do último refresh dos cubos."""
+    metadata = cubos.summary()
+    if metadata is None:
+        return jsonify({"status": "erro", "mensagem": "Cubos do dashboard não encontrados."}), 503
+    return jsonify({"status": "sucesso", **metadata})
+
+@dashboard.route('/<cubo>', methods=['GET'])
+def consultar(cubo):
+    """
+    Ex: GET /dashboard/transacoes?por=classe,semana&meio=PIX,CREDIT&inicio=2024-03-04
+        GET /dashboard/clientes?por=risco_churn&classe=Critico
+    Os demais parâmetros são filtros (valores separados por vírgula).
+    """
+    parametros = request.args.to_dict()
+    por = [d for d in parametros.pop('por', '').split(',') if d]
+    inicio, fim = parametros.pop('inicio', None), parametros.pop('fim', None)
+    filtros = {dimensao: valor.split(',') for dimensao, valor in parametros.items()}
+
+    inicio_consulta = time.perf_counter()
+    try:
+        df = cubos.query(cubo, por, filtros, inicio, fim)
+    except ValueError as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 400
+    if df is None:
+        return jsonify({"status": "erro", "mensagem": "Cubos do dashboard não encontrados."}), 503
+
+    return jsonify({
+        "status": "sucesso",
+        "atualizado_em": cubos.metadata['atualizado_em'],
+        "tempo_consulta_ms": round((time.perf_counter() - inicio_consulta) * 1000, 2),
+        "resultados": df.astype(object).where(df.notna(), None).to_dict(orient='records'),
+    })
+
+if __name__ == '__main__':
+    # Job de refresh dos cubos (rode com: python app/dashboard.py), depois
+    # da FASE 2 e da materialização dos scores (src/models/score_store.py)
+    from data.artifacts import FEATURES_CLIENTES_PATH, read_artifact
+    from data.history_cache import get_cached_historical_data
+    from models.score_store import SCORES_DB_PATH
+
+    print("--- Atualizando os cubos do dashboard ---")
+
+    df_features = read_artifact(FEATURES_CLIENTES_PATH, columns=['atingimento_meta_tpv', 'tpv_total', 'tpv_meta'])
+    df_historico = get_cached_historical_data(
+        dat_start_filter='2024-01-01', refresh=False,
+        columns=['data', 'id_cliente', 'tpv_dia', 'margem_op_dia', 'meio_pagamento', 'parcelas']
+    )
+
+    if df_features is not None and df_historico is not None:
+        with sqlite3.connect(SCORES_DB_PATH) as conexao:
+            df_scores = pd.read_sql_query(
+                "SELECT id_cliente, classificacao, probabilidade_churn FROM scores", conexao
+            ).set_index('id_cliente')
+        df_features.index = df_features.index.astype(str)
+        df_clientes = df_features.join(df_scores, how='left')
+        refresh_cubes(df_clientes, df_historico)
+    else:
+        print("Falha ao carregar os dados para os cubos do dashboard.")
@@ -0,0 +1,226 @@
+import collections
+import hashlib
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from models.model_registry import registry
+from models.sarimax_engine import SarimaxEngine
+
+# Previsões SARIMAX em lote para a API: várias séries x horizontes x exógenas
+# em uma requisição, calculadas em um pool de processos e memorizadas em um
+# cache LRU com TTL.
+#
+# A chave do cache é (série, versão do motor, steps, hash das exógenas): as
+# chamadas repetidas de 7/14/30 dias do serviço de score voltam sem
+# recalcular, e um novo motor salvo (nova versão) invalida tudo.
+#
+# Horizontes da mesma série são calculados juntos: a previsão de 7 dias é o
+# início da de 30 (mesmo estado de partida), então só o maior horizonte
+# pendente é calculado e os menores são recortados dele.
+
+class ForecastCache:
+    """Cache LRU (até 'max_itens') com expiração por tempo ('ttl_s')."""
+
+    def __init__(self, max_itens=100_000, ttl_s=3600.0):
+        self.max_itens = max_itens
+        self.ttl_s = ttl_s
+        self._itens = collections.OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def get(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._itens[chave]
+                self.faltas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def put(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl_s, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def resumo(self):
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                "itens": len(self._itens),
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": round(self.acertos / total, 4) if total else None,
+            }
+
+def hash_exog(exog):
+    """Hash do conteúdo da matriz de exógenas ('' se não houver)."""
+    if exog is None:
+        return ''
+    valores = np.ascontiguousarray(exog, dtype=np.float64)
+    return hashlib.blake2b(repr(valores.shape).encode() + valores.tobytes(), digest_size=16).hexdigest()
+
+# --- Processos do pool: cada um carrega o motor salvo uma única vez ---
+
+_ENGINE_WORKER = None
+
+def _inicializar_worker(path):
+    global _ENGINE_WORKER
+    _ENGINE_WORKER = SarimaxEngine.load(path)
+
+def _prever_lote(itens, engine=None):
+    """
+    Calcula um lote de previsões: itens (serie, steps, exog). Devolve, para
+    cada item, (datas, previsoes, erro).
+    """
+    engine = engine if engine is not None else _ENGINE_WORKER
+    saida = []
+    for serie, steps, exog in itens:
+        try:
+            df_previsao = engine.forecast(serie, steps, exog)
+            saida.append((df_previsao.index.strftime('%Y-%m-%d').tolist(),
+                          df_previsao['previsao'].to_numpy(), None))
+        except (KeyError, ValueError) as e:
+            saida.append((None, None, e.args[0] if e.args else str(e)))
+    return saida
+
+class ForecastService:
+    """
+    Previsões em lote com o motor SARIMAX do registro ('sarimax').
+
+    Args:
+        n_workers (int): Processos do pool (0 = calcula na própria thread).
+        max_itens_cache (int): Tamanho máximo do cache LRU.
+        ttl_s (float): Validade de cada previsão no cache, em segundos.
+        min_itens_pool (int): Abaixo disso o lote é calculado na própria thread
+                              (enviar ao pool custaria mais do que calcular).
+        itens_por_tarefa (int): Previsões enviadas juntas a cada processo.
+    """
+
+    def __init__(self, n_workers=2, max_itens_cache=100_000, ttl_s=3600.0, min_itens_pool=32,
+                 itens_por_tarefa=64):
+        self.n_workers = n_workers
+        self.min_itens_pool = min_itens_pool
+        self.itens_por_tarefa = itens_por_tarefa
+        self.cache = ForecastCache(max_itens_cache, ttl_s)
+        self._pool = None
+        self._versao_pool = None
+        self._lock = threading.Lock()
+
+    def _obter_pool(self, versao):
+        # Um pool por versão do motor: um motor novo salvo recria os processos
+        with self._lock:
+            if self._pool is None or self._versao_pool != versao:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False)
+                # 'forkserver': os processos não herdam as threads do servidor
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.n_workers,
+                    mp_context=multiprocessing.get_context('forkserver'),
+                    initializer=_inicializar_worker,
+                    initargs=(registry.path('sarimax'),),
+                )
+                self._versao_pool = versao
+            return self._pool
+
+    def _calcular(self, itens, engine, versao):
+        if self.n_workers == 0 or len(itens) < self.min_itens_pool or versao.startswith('memoria-'):
+            return _prever_lote(itens, engine)
+
+        pool = self._obter_pool(versao)
+        lotes = [itens[i:i + self.itens_por_tarefa] for i in range(0, len(itens), self.itens_por_tarefa)]
+        try:
+            return [resultado for lote in pool.map(_prever_lote, lotes) for resultado in lote]
+        except BrokenProcessPool:
+            # Um processo morreu: o pool é recriado na próxima chamada e este
+            # lote é calculado aqui mesmo
+            print("Erro: pool de previsões interrompido; calculando o lote na própria thread.")
+            with self._lock:
+                self._pool = None
+            return _prever_lote(itens, engine)
+
+    def forecast_batch(self, pedidos):
+        """
+        Args:
+            pedidos (list[dict]): Cada pedido tem 'serie', 'steps' (int ou lista
+                                  de horizontes) e, se o motor usa exógenas,
+                                  'exog' (matriz com pelo menos max(steps) linhas).
+
+        Returns:
+            list[dict]: Um resultado por (série, horizonte), na ordem dos pedidos,
+                        com 'serie', 'steps', 'datas_previsao' e
+                        'previsoes_indicador' (ou 'erro'); None se o motor
+                        não estiver carregado.
+        """
+        engine = registry.get('sarimax')
+        if engine is None:
+            return None
+        versao = registry.version('sarimax')
+
+        # 1. Procura cada (série, horizonte) no cache
+        resultados = []
+        pendentes = {}  # índice do pedido -> horizontes sem cache
+        for indice, pedido in enumerate(pedidos):
+            serie = pedido.get('serie')
+            horizontes = pedido.get('steps')
+            horizontes = horizontes if isinstance(horizontes, list) else [horizontes]
+            if not isinstance(serie, str):
+                resultados.extend({"serie": serie, "steps": steps, "erro": "'serie' deve ser um texto."}
+                                  for steps in horizontes)
+                continue
+            try:
+                exog = np.asarray(pedido['exog'], dtype=np.float64) if pedido.get('exog') is not None else None
+            except (TypeError, ValueError):
+                resultados.extend({"serie": serie, "steps": steps, "erro": "'exog' deve ser uma matriz numérica."}
+                                  for steps in horizontes)
+                continue
+            for steps in horizontes:
+                if not isinstance(steps, int) or isinstance(steps, bool) or steps < 1:
+                    resultados.append({"serie": serie, "steps": steps, "erro": "'steps' deve ser um inteiro >= 1."})
+                    continue
+                exog_horizonte = exog[:steps] if exog is not None else None
+                chave = (serie, versao, steps, hash_exog(exog_horizonte))
+                resultado = {"serie": serie, "steps": steps, "_chave": chave}
+                valor = self.cache.get(chave)
+                if valor is not None:
+                    resultado.update(valor)
+                else:
+                    pendentes.setdefault(indice, []).append(resultado)
+                resultados.append(resultado)
+
+        # 2. Calcula só o maior horizonte pendente de cada pedido
+        itens = []
+        for indice, faltando in pendentes.items():
+            pedido = pedidos[indice]
+            maior = max(resultado['steps'] for resultado in faltando)
+            exog = np.asarray(pedido['exog'], dtype=np.float64)[:maior] if pedido.get('exog') is not None else None
+            itens.append((pedido.get('serie'), maior, exog))
+
+        calculados = self._calcular(itens, engine, versao) if itens else []
+
+        # 3. Recorta cada horizonte da previsão maior e grava no cache
+        for (indice, faltando), (datas, previsoes, erro) in zip(pendentes.items(), calculados):
+            for resultado in faltando:
+                if erro is not None:
+                    resultado["erro"] = erro
+                    continue
+                valor = {
+                    "datas_previsao": datas[:resultado['steps']],
+                    "previsoes_indicador": np.round(previsoes[:resultado['steps']], 2).tolist(),
+                }
+                self.cache.put(resultado['_chave'], valor)
+                resultado.update(valor)
+
+        for resultado in resultados:
+            resultado.pop('_chave', None)
+        return resultados
@@ -0,0 +1,191 @@
+import os
+import sys
+from concurrent.futures import TimeoutError as FuturoTimeout
+
+import pandas as pd
+from flask import Flask, Response, jsonify, request
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from app.batching import FilaCheia, MicroBatcher
+from app.dashboard import dashboard
+from app.forecasting import ForecastService
+from data.instrumentation import prometheus_metrics
+from models.model_registry import registry
+from models.predict_model import predict_churn_batch, predict_health_score_batch
+from models.score_store import ScoreStore
+
+# Serviço de inferência (Health Score e Churn).
+#
+# Desenvolvimento: python app/main.py
+# Produção:        gunicorn --preload -w 4 -k gthread --threads 16 -b 0.0.0.0:5000 app.main:app
+#
+# Cada worker junta as requisições concorrentes em micro-lotes (ver
+# app/batching.py). Configuração por variáveis de ambiente:
+BATCH_JANELA_MS = float(os.environ.get('BATCH_JANELA_MS', '5'))
+BATCH_MAX_LINHAS = int(os.environ.get('BATCH_MAX_LINHAS', '1024'))
+BATCH_MAX_FILA = int(os.environ.get('BATCH_MAX_FILA', '10000'))
+TIMEOUT_REQUISICAO_S = float(os.environ.get('TIMEOUT_REQUISICAO_S', '10'))
+# Previsões SARIMAX (ver app/forecasting.py)
+FORECAST_WORKERS = int(os.environ.get('FORECAST_WORKERS', '2'))
+FORECAST_CACHE_ITENS = int(os.environ.get('FORECAST_CACHE_ITENS', '100000'))
+FORECAST_CACHE_TTL_S = float(os.environ.get('FORECAST_CACHE_TTL_S', '3600'))
+
+app = Flask(__name__)
+
+# Com 'gunicorn --preload' os modelos são carregados uma vez no processo
+# mestre e compartilhados pelos workers após o fork
+if os.environ.get('PRELOAD_MODELOS', '1') == '1':
+    registry.preload()
+
+BATCHERS = {
+    'health_score': MicroBatcher(predict_health_score_batch, BATCH_JANELA_MS, BATCH_MAX_LINHAS, BATCH_MAX_FILA),
+    'churn': MicroBatcher(predict_churn_batch, BATCH_JANELA_MS, BATCH_MAX_LINHAS, BATCH_MAX_FILA),
+}
+
+def _erro(mensagem, status):
+    return jsonify({"status": "erro", "mensagem": mensagem}), status
+
+def _prever(nome):
+    """
+    Corpo da requisição (JSON):
+        {"clientes": [{"id_cliente": "...", "<feature>": valor, ...}, ...]}
+    ou um único objeto de cliente.
+    """
+    corpo = request.get_json(silent=True)
+    if corpo is None:
+        return _erro("Corpo da requisição deve ser um JSON.", 400)
+
+    clientes = corpo.get('clientes', corpo) if isinstance(corpo, dict) else corpo
+    if isinstance(clientes, dict):
+        clientes = [clientes]
+    if not isinstance(clientes, list) or not all(isinstance(cliente, dict) for cliente in clientes):
+        return _erro("'clientes' deve ser uma lista de objetos {id_cliente, <feature>: valor}.", 400)
+    if not clientes:
+        return _erro("Nenhum cliente enviado.", 400)
+
+    df_entrada = pd.DataFrame(clientes)
+    if 'id_cliente' in df_entrada.columns:
+        df_entrada = df_entrada.set_index('id_cliente')
+
+    model = registry.get_forest(nome)
+    if model is None:
+        return _erro("Modelos não carregados.", 503)
+    faltando = [col for col in model.feature_names_in_ if col not in df_entrada.columns]
+    if faltando:
+        return _erro(f"Features ausentes nos dados de entrada: {faltando}", 400)
+
+    # Valida os tipos antes de entrar no lote (um valor inválido não afeta as outras requisições)
+    try:
+        df_entrada = df_entrada[list(model.feature_names_in_)].apply(pd.to_numeric, errors='raise')
+    except (ValueError, TypeError) as e:
+        return _erro(f"Features com valores não numéricos: {e}", 400)
+
+    try:
+        futuro = BATCHERS[nome].submit(df_entrada)
+    except FilaCheia as e:
+        resposta, status = _erro(str(e), 503)
+        resposta.headers['Retry-After'] = '1'
+        return resposta, status
+
+    try:
+        df_resultado = futuro.result(timeout=TIMEOUT_REQUISICAO_S)
+    except FuturoTimeout:
+        return _erro("Tempo limite excedido.", 504)
+    except Exception as e:
+        return _erro(str(e), 500)
+
+    if df_resultado.index.name == 'id_cliente':
+        df_resultado = df_resultado.reset_index()
+    return jsonify({
+        "status": "sucesso",
+        "resultados": df_resultado.to_dict(orient='records')
+    })
+
+@app.route('/predict/health-score', methods=['POST'])
+def predict_health_score():
+    return _prever('health_score')
+
+@app.route('/predict/churn', methods=['POST'])
+def predict_churn():
+    return _prever('churn')
+
+forecast_service = ForecastService(FORECAST_WORKERS, FORECAST_CACHE_ITENS, FORECAST_CACHE_TTL_S)
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    """
+    Previsão SARIMAX dos Indicadores Pais (motor de src/models/sarimax_engine.py).
+
+    Uma série:  {"serie": "canal:PIX:tpv", "steps": 3, "exog": [[0.5], [1.2], [0.8]]}
+    Em lote:    {"previsoes": [{"serie": "...", "steps": [7, 14, 30], "exog": [...]}, ...]}
+    """
+    corpo = request.get_json(silent=True)
+    if not isinstance(corpo, dict):
+        return _erro("Corpo da requisição deve ser um objeto JSON.", 400)
+
+    em_lote = 'previsoes' in corpo
+    pedidos = corpo['previsoes'] if em_lote else [corpo]
+    if not isinstance(pedidos, list) or not pedidos or not all(isinstance(p, dict) for p in pedidos):
+        return _erro("'previsoes' deve ser uma lista de objetos {serie, steps, exog}.", 400)
+
+    resultados = forecast_service.forecast_batch(pedidos)
+    if resultados is None:
+        return _erro("Motor SARIMAX não carregado.", 503)
+
+    if em_lote or isinstance(corpo.get('steps'), list):
+        return jsonify({"status": "sucesso", "resultados": resultados})
+
+    # Contrato original (uma série, um horizonte)
+    resultado = resultados[0]
+    if 'erro' in resultado:
+        return _erro(resultado['erro'], 400)
+    return jsonify({"status": "sucesso", **resultado})
+
+# Scores pré-calculados pelo job de materialização (src/models/score_store.py).
+# Aberto no primeiro uso: importar o módulo não cria 'dados/scores.sqlite'
+_score_store = None
+
+def get_score_store():
+    global _score_store
+    if _score_store is None:
+        _score_store = ScoreStore()
+    return _score_store
+
+@app.route('/scores/<id_cliente>', methods=['GET'])
+def get_score(id_cliente):
+    """Score materializado de um cliente: uma busca pela chave primária, sem rodar o modelo."""
+    score = get_score_store().get(id_cliente)
+    if score is None:
+        return _erro(f"Cliente '{id_cliente}' não encontrado na tabela de scores.", 404)
+    return jsonify({"status": "sucesso", **score})
+
+# Visões da carteira a partir dos cubos pré-agregados (app/dashboard.py)
+app.register_blueprint(dashboard)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Latência p50/p99, vazão e tamanho médio dos lotes de cada modelo e cache de previsões (neste worker)."""
+    return jsonify({
+        "pid": os.getpid(),
+        **{nome: batcher.metricas.resumo() for nome, batcher in BATCHERS.items()},
+        "cache_previsoes": forecast_service.cache.resumo(),
+    })
+
+@app.route('/metrics/prometheus', methods=['GET'])
+def metrics_prometheus():
+    """Spans da instrumentação (data/instrumentation.py) no formato do Prometheus (ligue com INSTRUMENTACAO=metricas)."""
+    return Response(prometheus_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "ok"})
+
+if __name__ == '__main__':
+    # A API estará acessível em http://127.0.0.1:5000/
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', '5000')), threaded=True)
@@ -0,0 +1,182 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Adiciona a raiz do projeto ao path (mesmo padrão de 'history_cache.py')
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# Artefatos entre as fases do pipeline (FASE 2 -> FASE 3, FASE 2 -> FASE 5) em
+# Feather (Arrow IPC, sem compressão) em vez de CSV:
+#
+# - Os tipos e o índice ('id_cliente') vão no próprio arquivo: nada de
+#   re-interpretar texto nem inferir dtypes a cada leitura.
+# - A leitura é por memory map: as colunas numéricas viram arrays do pandas
+#   apontando para as páginas do arquivo (sem cópia, sem parse).
+# - Ao lado de cada artefato fica '<nome>.meta.json' com o schema, o número
+#   de linhas, o hash do conteúdo e os hashes dos artefatos de onde ele veio
+#   ('upstream'). Uma fase pode pular o recálculo quando os hashes de
+#   entrada são os mesmos da última execução (ver 'is_up_to_date').
+#
+# Os mesmos metadados servem para saídas que não são tabelas (ex: modelos em
+# 'modelos/'), via 'write_metadata' / 'is_up_to_date'.
+
+PROCESSED_DIR = os.path.join(PROJECT_ROOT, 'dados', 'processed')
+FEATURES_CLIENTES_PATH = os.path.join(PROCESSED_DIR, 'features_clientes.feather')
+FEATURES_CHURN_PATH = os.path.join(PROCESSED_DIR, 'features_churn_clientes.feather')
+LABELS_CHURN_PATH = os.path.join(PROCESSED_DIR, 'labels_churn.feather')
+
+def metadata_path(path):
+    """'dados/processed/x.feather' -> 'dados/processed/x.meta.json'."""
+    return os.path.splitext(path)[0] + '.meta.json'
+
+def read_metadata(path):
+    """Metadados gravados ao lado de 'path', ou None se não existirem."""
+    try:
+        with open(metadata_path(path), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def write_metadata(path, upstream=None, **campos):
+    """
+    Grava os metadados de 'path' (escrita atômica).
+
+    Args:
+        path (str): Arquivo de saída ao qual os metadados se referem.
+        upstream (dict, opcional): {nome da entrada: hash} usado para produzir 'path'.
+        **campos: Outros campos (ex: schema, hash, linhas).
+    """
+    metadata = dict(campos, upstream=upstream or {},
+                    criado_em=pd.Timestamp.now().isoformat(timespec='seconds'))
+    destino = metadata_path(path)
+    tmp_path = destino + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, destino)
+    return metadata
+
+def content_hash(df):
+    """
+    Hash do conteúdo do DataFrame (valores, índice, nomes e dtypes das
+    colunas), independente do formato em que ele foi gravado.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+    h.update(repr(df.index.name).encode())
+    # Um uint64 por linha (vetorizado), combinando o índice e todas as colunas
+    h.update(np.ascontiguousarray(pd.util.hash_pandas_object(df, index=True).to_numpy()).tobytes())
+    return h.hexdigest()
+
+def code_hash(objetos):
+    """
+    Hash do código-fonte: o arquivo inteiro de cada módulo e o corpo de cada
+    função (mudar um helper do módulo invalida as saídas que dependem dele).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for objeto in objetos:
+        if inspect.ismodule(objeto):
+            with open(inspect.getsourcefile(objeto), 'rb') as f:
+                h.update(f.read())
+        else:
+            h.update(inspect.getsource(objeto).encode())
+    return h.hexdigest()
+
+def artifact_hash(path):
+    """Hash do conteúdo registrado para o artefato (sem ler os dados), ou None."""
+    metadata = read_metadata(path)
+    return metadata.get('hash') if metadata else None
+
+def is_up_to_date(path, upstream):
+    """
+    True se 'path' existe e foi produzido exatamente a partir de 'upstream'
+    (mesmos hashes de entrada): a fase pode pular o recálculo.
+    """
+    metadata = read_metadata(path)
+    return os.path.exists(path) and metadata is not None and metadata.get('upstream') == upstream
+
+def write_artifact(df, path, upstream=None):
+    """
+    Grava o DataFrame em Feather (com o índice) e os metadados ao lado.
+
+    Args:
+        df (pd.DataFrame): Tabela da fase (ex: features por cliente).
+        path (str): Destino '.feather'.
+        upstream (dict, opcional): {nome da entrada: hash} usado para produzir 'df'.
+
+    Returns:
+        dict: Os metadados gravados (schema, linhas, hash, upstream).
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Escrita atômica: uma fase lendo em paralelo nunca vê o arquivo pela metade
+    tmp_path = path + '.tmp'
+    tabela = pa.Table.from_pandas(df, preserve_index=True)
+    feather.write_feather(tabela, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+    return write_metadata(
+        path, upstream,
+        formato='feather',
+        linhas=len(df),
+        indice=df.index.name,
+        schema={str(col): str(dtype) for col, dtype in df.dtypes.items()},
+        hash=content_hash(df),
+    )
+
+def read_artifact(path, columns=None):
+    """
+    Lê um artefato gravado por 'write_artifact' (memory map, sem cópia das
+    colunas numéricas). Se só existir o CSV antigo com o mesmo nome, lê o
+    CSV (com 'id_cliente' como índice).
+
+    Args:
+        path (str): Artefato '.feather'.
+        columns (list, opcional): Colunas a ler (o índice vem sempre).
+
+    Returns:
+        pd.DataFrame: A tabela, ou None se o arquivo não existir.
+    """
+    if not os.path.exists(path):
+        csv_path = os.path.splitext(path)[0] + '.csv'
+        if not os.path.exists(csv_path):
+            print(f"Erro: Artefato não encontrado em {path}")
+            return None
+        print(f"Aviso: lendo o CSV antigo {csv_path} (grave o artefato com 'write_artifact').")
+        df = pd.read_csv(csv_path, index_col='id_cliente')
+        return df[list(columns)] if columns is not None else df
+
+    if columns is not None:
+        metadata = read_metadata(path) or {}
+        indice = metadata.get('indice')
+        columns = list(columns) + ([indice] if indice and indice not in columns else [])
+
+    tabela = feather.read_table(path, columns=columns, memory_map=True)
+    # split_blocks: uma coluna por bloco, então as colunas numéricas não são
+    # copiadas para um bloco 2D consolidado
+    return tabela.to_pandas(split_blocks=True)
+
+if __name__ == '__main__':
+    # Teste rápido do módulo (rode com: python data/artifacts.py)
+    import tempfile
+    sys.path.append(os.path.join(PROJECT_ROOT, 'src'))
+    from benchmarks.synthetic import make_synthetic_churn_features
+
+    df = make_synthetic_churn_features(10_000)
+    with tempfile.TemporaryDirectory() as pasta:
+        path = os.path.join(pasta, 'features_churn_clientes.feather')
+        metadata = write_artifact(df, path, upstream={'features_clientes': 'abc'})
+        df_lido = read_artifact(path)
+        print(f"Hash: {metadata['hash']} | igual após a leitura: {content_hash(df_lido) == metadata['hash']}")
+        print(f"Atualizado para a mesma entrada: {is_up_to_date(path, {'features_clientes': 'abc'})}")
+        print(f"Atualizado para outra entrada: {is_up_to_date(path, {'features_clientes': 'def'})}")
+        pd.testing.assert_frame_equal(df, df_lido)
+        print(read_artifact(path, columns=['is_churn']).head())
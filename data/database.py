@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import sqlalchemy
+from dotenv import load_dotenv
+
+# Acesso ao banco de origem (Redshift) compartilhado pelo processo:
+#
+# - Um único engine por processo, com pool de conexões: as funções de
+#   make_dataset.py não leem o .env nem criam um engine novo a cada chamada,
+#   e as consultas concorrentes de 'fetch_all' usam conexões do mesmo pool.
+#   Depois de um fork (ex: workers do gunicorn) o processo filho cria o seu.
+# - Statement timeout em toda conexão (no servidor, via 'SET statement_timeout';
+#   no SQLite de teste, interrompendo a consulta), para uma consulta travada
+#   não bloquear o pipeline para sempre.
+# - 'run_query' tenta de novo, com espera exponencial, quando a falha é de
+#   conexão (OperationalError / conexão invalidada). Consultas canceladas pelo
+#   statement timeout não são repetidas.
+#
+# Configuração por variáveis de ambiente (além das credenciais RS_*):
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DB_URL = os.environ.get('DB_URL')  # ex: sqlite:///dados/standin.sqlite (default: Redshift do .env)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '4'))
+DB_STATEMENT_TIMEOUT_S = float(os.environ.get('DB_STATEMENT_TIMEOUT_S', '900'))
+DB_TENTATIVAS = int(os.environ.get('DB_TENTATIVAS', '3'))
+DB_ESPERA_TENTATIVA_S = 1.0  # dobra a cada nova tentativa
+
+_engine = None
+_engine_pid = None
+_lock = threading.Lock()
+
+def _redshift_url():
+    """URL do Redshift a partir do .env na raiz do projeto (KeyError se faltar credencial)."""
+    load_dotenv(os.path.join(PROJECT_ROOT, '.env'))
+    return (
+        f"postgresql+psycopg2://{os.environ['RS_USER']}:{os.environ['RS_PASS']}@"
+        f"{os.environ['RS_HOST']}:{os.environ['RS_PORT']}/{os.environ['RS_DB']}"
+    )
+
+def apply_statement_timeout(engine, timeout_s=DB_STATEMENT_TIMEOUT_S):
+    """
+    Limita o tempo de cada consulta feita pelo engine.
+
+    PostgreSQL/Redshift: 'SET statement_timeout' em cada conexão nova (o
+    servidor cancela a consulta). SQLite: um progress handler interrompe a
+    consulta que passar do prazo (OperationalError 'interrupted').
+    """
+    if not timeout_s:
+        return engine
+
+    if engine.dialect.name == 'sqlite':
+        @sqlalchemy.event.listens_for(engine, 'before_cursor_execute')
+        def _prazo_sqlite(connection, cursor, statement, parameters, context, executemany):
+            prazo = time.monotonic() + timeout_s
+            connection.connection.driver_connection.set_progress_handler(lambda: time.monotonic() > prazo, 10_000)
+    elif engine.dialect.name in ('postgresql', 'redshift'):
+        @sqlalchemy.event.listens_for(engine, 'connect')
+        def _prazo_servidor(dbapi_connection, connection_record):
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"SET statement_timeout = {int(timeout_s * 1000)}")
+    return engine
+
+def get_engine():
+    """
+    Engine compartilhado do processo (criado no primeiro uso).
+
+    Returns:
+        sqlalchemy.Engine: O engine, ou None se as credenciais não estiverem no .env.
+    """
+    global _engine, _engine_pid
+
+    with _lock:
+        if _engine is not None and _engine_pid == os.getpid():
+            return _engine
+        try:
+            url = DB_URL or _redshift_url()
+        except KeyError as e:
+            print(f"Erro: Variável de ambiente {e} não encontrada.")
+            print("Certifique-se que seu arquivo .env está preenchido na raiz do projeto.")
+            return None
+
+        opcoes = {'pool_pre_ping': True}
+        if not url.startswith('sqlite'):
+            opcoes.update(pool_size=DB_POOL_SIZE, max_overflow=DB_POOL_SIZE, pool_recycle=1800,
+                          connect_args={'connect_timeout': 30})
+        _engine = apply_statement_timeout(sqlalchemy.create_engine(url, **opcoes))
+        _engine_pid = os.getpid()
+        return _engine
+
+def set_engine(engine):
+    """Troca o engine compartilhado (ex: um SQLite/PostgreSQL local nos testes)."""
+    global _engine, _engine_pid
+
+    with _lock:
+        _engine, _engine_pid = engine, os.getpid()
+
+def _cancelada_por_timeout(erro):
+    # Statement timeout ou cancelamento: PostgreSQL/Redshift (SQLSTATE 57014,
+    # 'QueryCanceled') ou o progress handler do SQLite ('interrupted')
+    original = erro.orig
+    return (
+        getattr(original, 'pgcode', None) == '57014'
+        or getattr(original, 'sqlstate', None) == '57014'
+        or type(original).__name__ == 'QueryCanceled'
+        or str(original).strip() == 'interrupted'
+    )
+
+def _retentavel(erro):
+    # Falhas de conexão valem uma nova tentativa. Erros de SQL e consultas
+    # canceladas pelo statement timeout não: a próxima bateria no mesmo prazo
+    if _cancelada_por_timeout(erro):
+        return False
+    return isinstance(erro, sqlalchemy.exc.OperationalError) or (
+        isinstance(erro, sqlalchemy.exc.DBAPIError) and erro.connection_invalidated
+    )
+
+def run_query(query, params=None, engine=None, tentativas=DB_TENTATIVAS, **kwargs):
+    """
+    Executa a consulta e devolve o resultado em um DataFrame, tentando de novo
+    (com espera exponencial) se a falha for de conexão.
+
+    Args:
+        query (str): SQL (parâmetros no formato ':nome').
+        params (dict, opcional): Parâmetros da consulta.
+        engine (sqlalchemy.Engine, opcional): Default: o engine compartilhado.
+        tentativas (int): Número máximo de execuções.
+        **kwargs: Repassados ao 'pd.read_sql_query' (ex: parse_dates).
+
+    Returns:
+        pd.DataFrame: O resultado (a última exceção sobe se todas as tentativas falharem).
+    """
+    engine = engine or get_engine()
+    if engine is None:
+        raise RuntimeError("Banco de origem não configurado.")
+
+    for tentativa in range(1, tentativas + 1):
+        try:
+            with engine.connect() as connection:
+                return pd.read_sql_query(sqlalchemy.text(query), connection, params=params, **kwargs)
+        except sqlalchemy.exc.DBAPIError as e:
+            if tentativa == tentativas or not _retentavel(e):
+                raise
+            espera = DB_ESPERA_TENTATIVA_S * 2 ** (tentativa - 1)
+            print(f"Aviso: consulta falhou ({type(e.orig).__name__}), tentativa {tentativa}/{tentativas}. "
+                  f"Tentando de novo em {espera:.1f}s...")
+            time.sleep(espera)
@@ -0,0 +1,203 @@
+import json
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Adiciona a raiz do projeto ao path para podermos importar 'data.make_dataset'
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from data.make_dataset import get_historical_data
+
+# Cache local do histórico (FASE 1) em Parquet, particionado por dat_reference:
+# dados/cache/historico/dat_reference=2024-01-01/part-0.parquet
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'dados', 'cache', 'historico')
+METADATA_FILE = '_cache_metadata.json'
+
+PARTITIONING = ds.partitioning(pa.schema([('dat_reference', pa.string())]), flavor='hive')
+
+def _read_metadata(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, METADATA_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _write_metadata(cache_dir, metadata):
+    with open(os.path.join(cache_dir, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+def latest_cached_date(cache_dir=CACHE_DIR):
+    """
+    Retorna a data (YYYY-MM-DD) da partição mais recente do cache, ou None se
+    o cache estiver vazio. Lê apenas os nomes das pastas, não os arquivos.
+    """
+    if not os.path.isdir(cache_dir):
+        return None
+    datas = [
+        nome.split('=', 1)[1] for nome in os.listdir(cache_dir)
+        if nome.startswith('dat_reference=')
+    ]
+    return max(datas) if datas else None
+
+def _write_partitions(df_novos, cache_dir):
+    """Grava (ou sobrescreve) as partições de data presentes em 'df_novos'."""
+    df_novos = df_novos.copy()
+    df_novos['dat_reference'] = pd.to_datetime(df_novos.pop('data')).dt.strftime('%Y-%m-%d')
+
+    ds.write_dataset(
+        pa.Table.from_pandas(df_novos, preserve_index=False),
+        cache_dir,
+        format='parquet',
+        partitioning=PARTITIONING,
+        basename_template='part-{i}.parquet',
+        # Só as partições recebidas são substituídas; as demais ficam intactas
+        existing_data_behavior='delete_matching'
+    )
+
+def refresh_cache(dat_start_filter='2024-01-01', cache_dir=CACHE_DIR, fetch_fn=get_historical_data):
+    """
+    Atualiza o cache local buscando na fonte APENAS as datas a partir da
+    partição mais recente (inclusive, pois o último dia pode ter chegado
+    incompleto na carga anterior).
+
+    Se o cache ainda não existe, ou se 'dat_start_filter' é anterior ao início
+    do que está em cache, o histórico é baixado por completo.
+
+    Args:
+        dat_start_filter (str): Data de início do histórico (formato YYYY-MM-DD).
+        cache_dir (str): Pasta do cache.
+        fetch_fn (callable): Função que busca o histórico a partir de uma data
+                             (default: get_historical_data).
+
+    Returns:
+        bool: True se o cache está utilizável (mesmo que a fonte tenha falhado).
+    """
+    metadata = _read_metadata(cache_dir)
+    ultima_data = latest_cached_date(cache_dir)
+
+    recarga_completa = (
+        metadata is None or ultima_data is None or dat_start_filter < metadata['dat_start_filter']
+    )
+    if recarga_completa:
+        print(f"Cache do histórico vazio ou incompleto. Baixando desde {dat_start_filter}...")
+        inicio_busca = dat_start_filter
+    else:
+        print(f"Cache do histórico encontrado até {ultima_data}. Buscando apenas as novas datas...")
+        inicio_busca = ultima_data
+
+    df_novos = fetch_fn(dat_start_filter=inicio_busca)
+
+    if df_novos is None:
+        # Fonte indisponível: seguimos com o que já temos em cache, se houver
+        print("Aviso: não foi possível atualizar o cache. Usando os dados locais.")
+        return not recarga_completa
+
+    if recarga_completa:
+        if os.path.isdir(cache_dir):
+            shutil.rmtree(cache_dir)
+        metadata = {'dat_start_filter': dat_start_filter}
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if not df_novos.empty:
+        _write_partitions(df_novos, cache_dir)
+
+    metadata['atualizado_em'] = pd.Timestamp.now().isoformat(timespec='seconds')
+    _write_metadata(cache_dir, metadata)
+    print(f"Cache atualizado com {len(df_novos)} registros (desde {inicio_busca}).")
+    return True
+
+def read_cached_historical_data(dat_start_filter='2024-01-01', dat_end_filter=None,
+                                columns=None, clientes=None, cache_dir=CACHE_DIR):
+    """
+    Lê o histórico do cache local. Só as colunas pedidas são lidas (projeção)
+    e os filtros de data e cliente são empurrados para a leitura: partições
+    fora do intervalo de datas nem são abertas.
+
+    Args:
+        dat_start_filter (str): Data inicial (inclusive, YYYY-MM-DD).
+        dat_end_filter (str, opcional): Data final (inclusive, YYYY-MM-DD).
+        columns (list, opcional): Colunas a retornar (default: todas).
+        clientes (list, opcional): Lista de 'id_cliente' a retornar.
+        cache_dir (str): Pasta do cache.
+
+    Returns:
+        pd.DataFrame: O histórico no mesmo formato de 'get_historical_data'.
+    """
+    dataset = ds.dataset(cache_dir, format='parquet', partitioning=PARTITIONING,
+                         exclude_invalid_files=True)
+
+    filtro = ds.field('dat_reference') >= dat_start_filter
+    if dat_end_filter is not None:
+        filtro &= ds.field('dat_reference') <= dat_end_filter
+    if clientes is not None:
+        filtro &= ds.field('id_cliente').isin(list(clientes))
+
+    colunas_arquivo = None
+    if columns is not None:
+        colunas_arquivo = ['dat_reference' if col == 'data' else col for col in columns]
+
+    df = dataset.to_table(columns=colunas_arquivo, filter=filtro).to_pandas()
+
+    if 'dat_reference' in df.columns:
+        df = df.rename(columns={'dat_reference': 'data'})
+        df['data'] = pd.to_datetime(df['data'])
+        df = df[['data'] + [col for col in df.columns if col != 'data']]
+
+    # Mantém a ordem da query original (id_cliente, data)
+    ordenacao = [col for col in ('id_cliente', 'data') if col in df.columns]
+    if ordenacao:
+        df = df.sort_values(by=ordenacao, ignore_index=True)
+
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+def get_cached_historical_data(dat_start_filter='2024-01-01', dat_end_filter=None,
+                               columns=None, clientes=None, refresh=True, cache_dir=CACHE_DIR):
+    """
+    Substituto de 'get_historical_data' com cache local: atualiza o cache de
+    forma incremental (só as datas novas vêm do Redshift) e lê o resto do disco.
+
+    Args:
+        dat_start_filter (str): Data de início para o filtro (formato YYYY-MM-DD).
+        dat_end_filter (str, opcional): Data final (inclusive, YYYY-MM-DD).
+        columns (list, opcional): Colunas a retornar (default: todas).
+        clientes (list, opcional): Lista de 'id_cliente' a retornar.
+        refresh (bool): Se False, não consulta a fonte (apenas o cache local).
+        cache_dir (str): Pasta do cache.
+
+    Returns:
+        pd.DataFrame: Um DataFrame com os dados históricos, ou None se falhar.
+    """
+    if refresh:
+        if not refresh_cache(dat_start_filter, cache_dir=cache_dir):
+            return None
+    elif latest_cached_date(cache_dir) is None:
+        print(f"Erro: cache do histórico vazio em {cache_dir}")
+        return None
+
+    inicio = time.perf_counter()
+    df_historico = read_cached_historical_data(
+        dat_start_filter, dat_end_filter, columns=columns, clientes=clientes, cache_dir=cache_dir
+    )
+    print(f"{len(df_historico)} registros históricos lidos do cache em {time.perf_counter() - inicio:.2f}s.")
+    return df_historico
+
+if __name__ == '__main__':
+    # Teste rápido do módulo (rode com: python data/history_cache.py)
+    print("--- Testando o módulo history_cache ---")
+
+    df_hist = get_cached_historical_data(dat_start_filter='2024-01-01')
+
+    if df_hist is not None:
+        print(df_hist.head())
+        df_hist.info()
+    else:
+        print("\n--- Teste do cache de Dados Históricos FALHOU ---")
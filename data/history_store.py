@@ -0,0 +1,384 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Adiciona a raiz do projeto ao path (mesmo padrão de 'history_cache.py')
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# Histórico denso em matrizes float32 (memory map, arquivos '.npy'):
+#
+#   dados/history_store/tpv.npy        dias x clientes            (NaN = sem TPV no dia)
+#   dados/history_store/margem.npy     dias x clientes            (NaN = sem margem no dia)
+#   dados/history_store/tpv_meio.npy   dias x clientes x meios    (0 = sem TPV no meio)
+#   dados/history_store/clientes.npy   dicionário código -> id_cliente
+#   dados/history_store/_store_metadata.json
+#
+# Cada célula é a soma do dia (linhas do mesmo cliente e dia se somam, como
+# em 'build_indicator_series'). O código do cliente é a coluna da matriz e
+# nunca muda (clientes novos entram no fim); a data vira linha pela conta
+# 'dia - dia_inicial', sem dicionário. Assim as FASES 2, 4 e a previsão leem
+# fatias contíguas das matrizes em vez de fatorizar e ordenar os ids
+# (strings) do histórico longo a cada execução.
+#
+# A linha é o dia: acrescentar um dia ('append_days') grava uma linha no fim
+# do arquivo, e um bloco de clientes ('slice') é uma fatia de colunas. Os
+# arquivos têm folga (capacidade) de dias, clientes e meios; só quando ela
+# acaba as matrizes são regravadas, maiores.
+
+HISTORY_STORE_DIR = os.path.join(PROJECT_ROOT, 'dados', 'history_store')
+METADATA_FILE = '_store_metadata.json'
+INDICADORES = ('tpv', 'margem', 'tpv_meio')
+
+# Células (dia x cliente x meio) montadas em memória por vez em 'append_days'
+CELULAS_POR_BLOCO = 2 ** 24
+
+def _nova_capacidade(necessario, minimo):
+    """Capacidade com 25% de folga (no mínimo 'minimo' a mais)."""
+    return int(necessario + max(necessario // 4, minimo))
+
+def _dias(datas):
+    """Datas -> número do dia (int64, dias desde 1970-01-01) e máscara das válidas."""
+    dias = pd.to_datetime(pd.Series(datas)).to_numpy('datetime64[D]')
+    return dias.astype(np.int64), ~np.isnat(dias)
+
+class HistoryStore:
+    """
+    Histórico diário denso por cliente (ver o comentário do módulo).
+
+    Uso:
+        store = HistoryStore.build(df_historico)      # primeira carga
+        store = HistoryStore()                        # reabre (memory map)
+        store.append_days(df_ontem)                   # carga diária
+        tpv = store.slice('tpv', inicio='2024-06-01', clientes=['CLI1', 'CLI7'])
+    """
+
+    def __init__(self, pasta=HISTORY_STORE_DIR, modo='r+'):
+        self.pasta = pasta
+        self.modo = modo
+        self.dia_inicial = None
+        self.n_dias = 0
+        self.meios = []
+        self._clientes = np.array([], dtype=str)
+        self._indice_clientes = pd.Index(self._clientes)
+        self._matrizes = {}
+
+        try:
+            with open(os.path.join(pasta, METADATA_FILE), encoding='utf-8') as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            return
+
+        self.dia_inicial = metadata['dia_inicial']
+        self.n_dias = metadata['n_dias']
+        self.meios = metadata['meios']
+        self._clientes = np.load(os.path.join(pasta, 'clientes.npy'))[:metadata['n_clientes']]
+        self._indice_clientes = pd.Index(self._clientes)
+        for nome in INDICADORES:
+            self._matrizes[nome] = np.load(os.path.join(pasta, f'{nome}.npy'), mmap_mode=modo)
+
+    @classmethod
+    def build(cls, df_historico, pasta=HISTORY_STORE_DIR, celulas_por_bloco=CELULAS_POR_BLOCO):
+        """
+        Cria o store (apagando um anterior na mesma pasta) a partir do
+        histórico completo da FASE 1. Os clientes ficam em ordem alfabética,
+        a mesma de 'aggregate_client_features'.
+        """
+        os.makedirs(pasta, exist_ok=True)
+        for nome in INDICADORES + ('clientes',):
+            if os.path.exists(os.path.join(pasta, f'{nome}.npy')):
+                os.remove(os.path.join(pasta, f'{nome}.npy'))
+        if os.path.exists(os.path.join(pasta, METADATA_FILE)):
+            os.remove(os.path.join(pasta, METADATA_FILE))
+
+        store = cls(pasta)
+        store.append_days(df_historico, celulas_por_bloco)
+        return store
+
+    def __len__(self):
+        return len(self._clientes)
+
+    @property
+    def clientes(self):
+        """Dicionário código -> id_cliente (o código é a coluna das matrizes)."""
+        return self._indice_clientes
+
+    @property
+    def datas(self):
+        """Datas das linhas das matrizes (um dia por linha, sem buracos)."""
+        if self.dia_inicial is None:
+            return pd.DatetimeIndex([], name='data')
+        inicio = pd.Timestamp(np.datetime64(self.dia_inicial, 'D'))
+        return pd.date_range(inicio, periods=self.n_dias, freq='D', name='data')
+
+    def client_codes(self, ids):
+        """
+        Códigos (colunas) dos clientes, -1 para ids que não estão no store.
+        Os ids são comparados como texto (o dicionário guarda 'str').
+        """
+        return self._indice_clientes.get_indexer(pd.Index(ids).astype(str))
+
+    def day_positions(self, datas):
+        """Linhas das datas nas matrizes (podem cair fora de [0, n_dias))."""
+        dias, _ = _dias(datas)
+        return dias - self.dia_inicial
+
+    # --- Gravação ---
+
+    def _salvar_metadata(self):
+        metadata = {
+            'dia_inicial': self.dia_inicial,
+            'data_inicial': str(np.datetime64(self.dia_inicial, 'D')),
+            'n_dias': self.n_dias,
+            'n_clientes': len(self._clientes),
+            'meios': self.meios,
+            'atualizado_em': pd.Timestamp.now().isoformat(timespec='seconds'),
+        }
+        destino = os.path.join(self.pasta, METADATA_FILE)
+        with open(destino + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        os.replace(destino + '.tmp', destino)
+
+    def _reservar(self, n_dias, n_clientes, n_meios):
+        """
+        Garante capacidade para (n_dias, n_clientes, n_meios). Se não houver,
+        regrava as matrizes maiores (com folga), copiando o conteúdo atual.
+        """
+        atual = self._matrizes.get('tpv_meio')
+        capacidade = atual.shape if atual is not None else (0, 0, 0)
+        if n_dias <= capacidade[0] and n_clientes <= capacidade[1] and n_meios <= capacidade[2]:
+            return
+
+        nova = (
+            capacidade[0] if n_dias <= capacidade[0] else _nova_capacidade(n_dias, 32),
+            capacidade[1] if n_clientes <= capacidade[1] else _nova_capacidade(n_clientes, 1024),
+            capacidade[2] if n_meios <= capacidade[2] else _nova_capacidade(n_meios, 2),
+        )
+        usados = (slice(0, self.n_dias), slice(0, len(self._clientes)))
+        for nome in INDICADORES:
+            forma = nova if nome == 'tpv_meio' else nova[:2]
+            path = os.path.join(self.pasta, f'{nome}.npy')
+            matriz = np.lib.format.open_memmap(path + '.tmp', mode='w+', dtype=np.float32, shape=forma)
+            matriz[:] = 0.0 if nome == 'tpv_meio' else np.nan
+            if nome in self._matrizes:
+                antiga = self._matrizes[nome]
+                matriz[usados] = antiga[usados]
+            matriz.flush()
+            del matriz
+            self._matrizes.pop(nome, None)
+            os.replace(path + '.tmp', path)
+            self._matrizes[nome] = np.load(path, mmap_mode='r+')
+
+    def append_days(self, df_novos, celulas_por_bloco=CELULAS_POR_BLOCO):
+        """
+        Grava os dias de 'df_novos' (ex: o dia de ontem) no store. Cada dia
+        presente em 'df_novos' substitui por completo o que havia no store
+        para ele (o último dia pode ter chegado incompleto na carga anterior);
+        os demais dias não mudam. Clientes e meios de pagamento novos entram
+        no fim dos dicionários.
+
+        Args:
+            df_novos (pd.DataFrame): Linhas no formato de 'get_historical_data'.
+            celulas_por_bloco (int): Limite de células montadas em memória por vez.
+
+        Returns:
+            int: Dias gravados, ou None se 'df_novos' tiver datas anteriores ao início do store.
+        """
+        if self.modo == 'r':
+            print("Erro: store aberto somente para leitura.")
+            return None
+
+        # 1. Dias e linhas válidas (sem data ou sem cliente são ignoradas)
+        dias, validas = _dias(df_novos['data'])
+        validas &= df_novos['id_cliente'].notna().to_numpy()
+        if not validas.any():
+            return 0
+        linhas = np.flatnonzero(validas)
+        dias = dias[linhas]
+        if self.dia_inicial is None:
+            self.dia_inicial = int(dias.min())
+        elif dias.min() < self.dia_inicial:
+            print(f"Erro: datas anteriores ao início do store ({np.datetime64(self.dia_inicial, 'D')}). "
+                  f"Recrie o store com 'HistoryStore.build'.")
+            return None
+        posicao_dia = dias - self.dia_inicial
+
+        # 2. Clientes e meios novos entram no fim dos dicionários
+        # Ids como texto (ex: 'idt_safepay_creditor' inteiro), como no dicionário
+        ids = df_novos['id_cliente'].to_numpy()[linhas].astype(str)
+        cliente = self.client_codes(ids)
+        novos = np.sort(pd.unique(ids[cliente < 0]))
+        if len(novos):
+            self._clientes = np.concatenate((self._clientes, novos))
+            self._indice_clientes = pd.Index(self._clientes)
+            cliente[cliente < 0] = self.client_codes(ids[cliente < 0])
+
+        codes_meio, meios_lote = pd.factorize(df_novos['meio_pagamento'].to_numpy()[linhas])
+        meios_lote = [str(meio) for meio in meios_lote]
+        self.meios = self.meios + sorted(set(meios_lote) - set(self.meios))
+        meio = np.where(codes_meio >= 0, pd.Index(self.meios).get_indexer(meios_lote)[codes_meio], -1)
+
+        n_clientes, n_meios = len(self._clientes), len(self.meios)
+        self._reservar(int(posicao_dia.max()) + 1, n_clientes, n_meios)
+        if len(novos):
+            np.save(os.path.join(self.pasta, 'clientes.npy'), self._clientes)
+
+        # 3. Linhas ordenadas por dia; cada bloco de dias vira matrizes densas
+        #    (bincount das somas do dia) gravadas nas linhas desses dias
+        ordem = np.argsort(posicao_dia, kind='stable')
+        posicao_dia, cliente, meio = posicao_dia[ordem], cliente[ordem], meio[ordem]
+        tpv = df_novos['tpv_dia'].to_numpy(dtype=np.float64)[linhas][ordem]
+        margem = df_novos['margem_op_dia'].to_numpy(dtype=np.float64)[linhas][ordem]
+        tpv_valido, margem_valida = ~np.isnan(tpv), ~np.isnan(margem)
+        tpv_zero = np.where(tpv_valido, tpv, 0.0)
+
+        inicio_dia = np.flatnonzero(np.diff(posicao_dia, prepend=-1))
+        dias_gravados = posicao_dia[inicio_dia]
+        limites = np.append(inicio_dia, len(posicao_dia))
+        dias_por_bloco = max(1, celulas_por_bloco // (n_clientes * (n_meios + 2)))
+
+        for b0 in range(0, len(dias_gravados), dias_por_bloco):
+            b1 = min(b0 + dias_por_bloco, len(dias_gravados))
+            bloco = slice(limites[b0], limites[b1])
+            n_celulas = (b1 - b0) * n_clientes
+            # Dia dentro do bloco (0..b1-b0-1) de cada linha
+            dia_bloco = np.repeat(np.arange(b1 - b0), np.diff(limites[b0:b1 + 1]))
+            celula = dia_bloco * n_clientes + cliente[bloco]
+
+            for nome, valores, valido in (('tpv', tpv, tpv_valido), ('margem', margem, margem_valida)):
+                soma = np.bincount(celula, weights=np.where(valido[bloco], valores[bloco], 0.0), minlength=n_celulas)
+                contagem = np.bincount(celula, weights=valido[bloco], minlength=n_celulas)
+                soma[contagem == 0] = np.nan
+                self._matrizes[nome][dias_gravados[b0:b1], :n_clientes] = soma.reshape(-1, n_clientes)
+
+            com_meio = meio[bloco] >= 0
+            por_meio = np.bincount(
+                (celula * n_meios + meio[bloco])[com_meio], weights=tpv_zero[bloco][com_meio],
+                minlength=n_celulas * n_meios
+            )
+            self._matrizes['tpv_meio'][dias_gravados[b0:b1], :n_clientes, :n_meios] = \
+                por_meio.reshape(-1, n_clientes, n_meios)
+
+        # 4. Metadados por último: um store interrompido no meio da gravação
+        #    continua apontando para os dias e clientes anteriores
+        for matriz in self._matrizes.values():
+            matriz.flush()
+        self.n_dias = max(self.n_dias, int(dias_gravados[-1]) + 1)
+        self._salvar_metadata()
+        return len(dias_gravados)
+
+    # --- Leitura ---
+
+    def slice(self, indicador='tpv', clientes=None, inicio=None, fim=None):
+        """
+        Fatia (dias x clientes [x meios]) de uma das matrizes.
+
+        Args:
+            indicador (str): 'tpv', 'margem' ou 'tpv_meio' (colunas em 'meios').
+            clientes (slice ou list, opcional): Faixa de códigos (ex: slice(0, 4096),
+                      sem cópia) ou lista de ids (cópia, na ordem pedida).
+            inicio, fim (str/Timestamp, opcional): Datas (inclusive) da fatia.
+
+        Returns:
+            np.ndarray: float32 (NaN = cliente sem valor no dia, exceto em 'tpv_meio').
+        """
+        if indicador not in INDICADORES:
+            raise ValueError(f"Indicador '{indicador}' inválido. Use um de {INDICADORES}.")
+        if indicador not in self._matrizes:
+            raise KeyError(f"Store vazio em {self.pasta}.")
+
+        d0 = 0 if inicio is None else int(np.clip(self.day_positions([inicio])[0], 0, self.n_dias))
+        d1 = self.n_dias if fim is None else int(np.clip(self.day_positions([fim])[0] + 1, d0, self.n_dias))
+        # Só a parte usada da capacidade
+        matriz = self._matrizes[indicador][d0:d1, :len(self._clientes)]
+        if indicador == 'tpv_meio':
+            matriz = matriz[:, :, :len(self.meios)]
+
+        if clientes is None:
+            return matriz
+        if isinstance(clientes, slice):
+            return matriz[:, clientes]
+        codigos = self.client_codes(clientes)
+        if (codigos < 0).any():
+            faltando = list(pd.Index(clientes)[codigos < 0][:5])
+            raise KeyError(f"Clientes não encontrados no store: {faltando}")
+        return matriz[:, codigos]
+
+    def indicator_series(self, indicador='tpv', clientes=None):
+        """
+        Séries diárias no formato de 'build_indicator_series' (nível
+        'cliente'): dias sem transação valem 0 para TPV e margem; a take rate
+        fica NaN nesses dias.
+
+        Args:
+            indicador (str): 'tpv', 'margem_op' ou 'take_rate'.
+            clientes (list, opcional): Ids dos clientes (default: todos).
+
+        Returns:
+            pd.DataFrame: Índice diário ('data') e colunas 'cliente:<id>:<indicador>'.
+        """
+        ids = self._clientes if clientes is None else np.asarray(clientes)
+        tpv = np.nan_to_num(self.slice('tpv', clientes), nan=0.0).astype(np.float64)
+        if indicador == 'tpv':
+            valores = tpv
+        else:
+            margem = np.nan_to_num(self.slice('margem', clientes), nan=0.0).astype(np.float64)
+            if indicador == 'margem_op':
+                valores = margem
+            else:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    valores = np.where(tpv > 0, margem / tpv, np.nan)
+        return pd.DataFrame(valores, index=self.datas, columns=[f'cliente:{id_cliente}:{indicador}' for id_cliente in ids])
+
+    def last_transaction_days(self, snapshots, clientes_por_bloco=65_536):
+        """
+        Data da última transação (TPV ou margem no dia) de cada cliente até
+        cada snapshot (inclusive), para os labels de churn.
+
+        Returns:
+            np.ndarray: datetime64[D] (snapshots x clientes), NaT se o cliente
+                        não tinha nenhuma transação até o snapshot.
+        """
+        posicoes = np.minimum(self.day_positions(snapshots), self.n_dias - 1)
+        ultima = np.full((len(posicoes), len(self._clientes)), -1, dtype=np.int64)
+        linhas = np.arange(self.n_dias)[:, np.newaxis]
+        for c0 in range(0, len(self._clientes), clientes_por_bloco):
+            bloco = slice(c0, min(c0 + clientes_por_bloco, len(self._clientes)))
+            com_transacao = ~np.isnan(self.slice('tpv', bloco)) | ~np.isnan(self.slice('margem', bloco))
+            acumulado = np.maximum.accumulate(np.where(com_transacao, linhas, -1), axis=0)
+            ultima[posicoes >= 0, bloco] = acumulado[posicoes[posicoes >= 0]]
+
+        datas = (ultima + self.dia_inicial).astype('datetime64[D]')
+        datas[ultima < 0] = np.datetime64('NaT')
+        return datas
+
+if __name__ == '__main__':
+    # Teste rápido com histórico sintético (rode com: python data/history_store.py)
+    import tempfile
+    sys.path.append(os.path.join(PROJECT_ROOT, 'src'))
+    from benchmarks.synthetic import make_synthetic_history
+    from models.sarimax_engine import build_indicator_series
+
+    df_historico = make_synthetic_history(2_000, max_dias=90)
+    ultimo_dia = df_historico['data'].max()
+    with tempfile.TemporaryDirectory() as pasta:
+        # Primeira carga sem o último dia; o último dia entra com 'append_days'
+        store = HistoryStore.build(df_historico[df_historico['data'] < ultimo_dia], pasta)
+        store.append_days(df_historico[df_historico['data'] == ultimo_dia])
+        store = HistoryStore(pasta, modo='r')
+        print(f"{len(store)} clientes x {store.n_dias} dias, meios: {store.meios}")
+
+        esperado = build_indicator_series(df_historico, 'cliente', 'tpv')
+        obtido = store.indicator_series('tpv', clientes=[col.split(':')[1] for col in esperado.columns])
+        np.testing.assert_allclose(obtido.to_numpy(), esperado.to_numpy(), rtol=1e-6)
+        print("Séries diárias iguais a 'build_indicator_series'.")
+
+        ultima = store.last_transaction_days([ultimo_dia])[0]
+        esperada = df_historico.groupby('id_cliente')['data'].max()
+        assert (ultima == esperada.reindex(store.clientes).to_numpy('datetime64[D]')).all()
+        print("Última transação igual à do histórico.")
+        print(store.slice('tpv', clientes=['CLI1', 'CLI7'], inicio='2024-01-01', fim='2024-01-05'))
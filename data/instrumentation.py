@@ -0,0 +1,353 @@
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Adiciona a raiz do projeto ao path (mesmo padrão de 'artifacts.py')
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# Instrumentação das fases do pipeline: cada fase e sub-passo (agregações,
+# mix de pagamento, tendência, fit/predict dos modelos) roda dentro de um
+# 'span' que mede tempo de relógio, tempo de CPU do processo, linhas de
+# entrada/saída e o pico de memória residente (RSS) durante o span.
+#
+# - Desligada (o padrão), 'span' devolve um objeto nulo compartilhado: o custo
+#   é uma chamada de função, sem relógio, sem lock e sem alocação.
+# - Ligada, cada span fechado vira uma linha JSON em 'dados/spans.jsonl' e é
+#   acumulado por nome, para o endpoint de métricas do serviço no formato do
+#   Prometheus ('prometheus_metrics').
+# - Um único span (pelo nome) pode rodar sob um profiler por amostragem; as
+#   pilhas amostradas vão para 'dados/perfis/' no formato "folded" (uma pilha
+#   por linha + contagem), aberto pelo speedscope ou pelo flamegraph.pl.
+#
+# Liga por variável de ambiente (INSTRUMENTACAO=1, o caminho do .jsonl ou
+# 'metricas' para só acumular as métricas, como no serviço;
+# INSTRUMENTACAO_PERFIL=<nome do span>) ou com 'configure' no código.
+
+SPANS_PATH = os.path.join(PROJECT_ROOT, 'dados', 'spans.jsonl')
+PERFIS_DIR = os.path.join(PROJECT_ROOT, 'dados', 'perfis')
+
+_config = None  # None = instrumentação desligada
+_local = threading.local()
+_lock = threading.Lock()
+_metricas = {}  # nome do span -> métricas acumuladas
+
+class _NullSpan:
+    """Span da instrumentação desligada: não mede nada."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **atributos):
+        pass
+
+_SPAN_NULO = _NullSpan()
+
+class _RssSampler:
+    """Thread que amostra o RSS do processo e atualiza o pico dos spans abertos."""
+
+    def __init__(self, intervalo):
+        import psutil
+
+        self.intervalo = intervalo
+        self._processo = psutil.Process()
+        self._abertos = set()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True, name='instrumentacao-rss')
+        self._thread.start()
+
+    def rss(self):
+        return self._processo.memory_info().rss
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            if self._abertos:
+                rss = self.rss()
+                for aberto in list(self._abertos):
+                    aberto.pico_rss = max(aberto.pico_rss, rss)
+
+    def abrir(self, aberto):
+        aberto.inicio_rss = aberto.pico_rss = self.rss()
+        self._abertos.add(aberto)
+
+    def fechar(self, aberto):
+        self._abertos.discard(aberto)
+        aberto.pico_rss = max(aberto.pico_rss, self.rss())
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem de uma thread: a cada 'intervalo' segundos guarda
+    a pilha de chamadas atual da thread (via 'sys._current_frames'). Ao
+    contrário do cProfile, não intercepta cada chamada, então o custo não
+    depende de quantas funções a fase chama.
+    """
+
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+        self.pilhas = collections.Counter()
+        self._parar = threading.Event()
+
+    def _amostrar(self, thread_id):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(thread_id)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                frame = frame.f_back
+            if pilha:
+                self.pilhas[';'.join(reversed(pilha))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._amostrar, args=(threading.get_ident(),), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._parar.set()
+        self._thread.join()
+        return self
+
+    def top_functions(self, n=10):
+        """As 'n' funções com mais amostras no topo da pilha (tempo próprio)."""
+        proprias = collections.Counter()
+        for pilha, contagem in self.pilhas.items():
+            proprias[pilha.rsplit(';', 1)[-1]] += contagem
+        return proprias.most_common(n)
+
+    def save(self, path):
+        """Grava as pilhas no formato 'folded' (flamegraph.pl / speedscope)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for pilha, contagem in self.pilhas.most_common():
+                f.write(f"{pilha} {contagem}\n")
+        return path
+
+class Span:
+    """Um span aberto: use via 'span(...)' como gerenciador de contexto."""
+
+    def __init__(self, nome, atributos):
+        self.nome = nome
+        self.atributos = atributos
+        self._config = _config
+        self.inicio_rss = self.pico_rss = None
+        self._perfil = None
+
+    def set(self, **atributos):
+        """Acrescenta atributos ao span (ex: linhas_saida=len(df))."""
+        self.atributos.update(atributos)
+
+    def __enter__(self):
+        pilha = getattr(_local, 'pilha', None)
+        if pilha is None:
+            pilha = _local.pilha = []
+        self.caminho = f"{pilha[-1].caminho}/{self.nome}" if pilha else self.nome
+        pilha.append(self)
+
+        if self._config['amostrador'] is not None:
+            self._config['amostrador'].abrir(self)
+        if self._config['perfil'] in (self.nome, self.caminho):
+            self._perfil = SamplingProfiler(self._config['intervalo_perfil']).start()
+        self.inicio = time.time()
+        self._relogio = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, tipo_erro, erro, tb):
+        tempo = time.perf_counter() - self._relogio
+        cpu = time.process_time() - self._cpu
+        _local.pilha.pop()
+
+        registro = {
+            'span': self.caminho,
+            'inicio': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.inicio)),
+            'tempo_s': round(tempo, 6),
+            'cpu_s': round(cpu, 6),
+            'pid': os.getpid(),
+        }
+        if self._config['amostrador'] is not None:
+            self._config['amostrador'].fechar(self)
+            registro['rss_pico_mb'] = round(self.pico_rss / 1024 ** 2, 1)
+            registro['rss_delta_mb'] = round((self.pico_rss - self.inicio_rss) / 1024 ** 2, 1)
+        registro.update(self.atributos)
+        if tipo_erro is not None:
+            registro['erro'] = tipo_erro.__name__
+        if self._perfil is not None:
+            self._perfil.stop()
+            nome_arquivo = f"{self.caminho.replace('/', '.')}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+            registro['perfil'] = self._perfil.save(os.path.join(self._config['perfis_dir'], nome_arquivo))
+            registro['perfil_top'] = self._perfil.top_functions(5)
+        _record(registro, self._config['path'])
+        return False
+
+def _record(registro, path):
+    with _lock:
+        metricas = _metricas.setdefault(registro['span'], {
+            'chamadas': 0, 'erros': 0, 'tempo_s': 0.0, 'cpu_s': 0.0, 'linhas_entrada': 0,
+            'linhas_saida': 0, 'rss_pico_mb': 0.0,
+        })
+        metricas['chamadas'] += 1
+        metricas['erros'] += 'erro' in registro
+        metricas['tempo_s'] += registro['tempo_s']
+        metricas['cpu_s'] += registro['cpu_s']
+        metricas['linhas_entrada'] += registro.get('linhas_entrada') or 0
+        metricas['linhas_saida'] += registro.get('linhas_saida') or 0
+        metricas['rss_pico_mb'] = max(metricas['rss_pico_mb'], registro.get('rss_pico_mb') or 0.0)
+
+        if path is not None:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+
+def configure(ativo=True, path=SPANS_PATH, memoria=True, intervalo_memoria=0.01, perfil=None,
+              intervalo_perfil=0.005, perfis_dir=PERFIS_DIR):
+    """
+    Liga (ou desliga) a instrumentação no processo atual.
+
+    Args:
+        ativo (bool): False desliga tudo ('span' volta a ser um objeto nulo).
+        path (str, opcional): Arquivo .jsonl dos spans (None = só as métricas em memória).
+        memoria (bool): Se True, amostra o RSS para o pico de memória de cada span.
+        intervalo_memoria (float): Intervalo da amostragem do RSS (segundos).
+        perfil (str, opcional): Nome (ou caminho, ex: 'engineer_features/tendencia')
+                                do span que roda sob o profiler por amostragem.
+        intervalo_perfil (float): Intervalo da amostragem do profiler (segundos).
+        perfis_dir (str): Pasta dos perfis '.folded'.
+    """
+    global _config
+
+    if _config is not None and _config['amostrador'] is not None:
+        _config['amostrador'].parar()
+    if not ativo:
+        _config = None
+        return
+    if path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    _config = {
+        'path': path,
+        'amostrador': _RssSampler(intervalo_memoria) if memoria else None,
+        'perfil': perfil,
+        'intervalo_perfil': intervalo_perfil,
+        'perfis_dir': perfis_dir,
+    }
+
+def is_enabled():
+    return _config is not None
+
+def span(nome, **atributos):
+    """
+    Mede o bloco 'with' como um span (filho do span aberto na mesma thread).
+
+    Ex:
+        with span('fit', linhas_entrada=len(X_train)) as s:
+            model.fit(X_train, y_train)
+            s.set(arvores=model.n_estimators)
+
+    Args:
+        nome (str): Nome do passo (o caminho inclui os spans de fora).
+        **atributos: Atributos do registro (ex: linhas_entrada, linhas_saida).
+    """
+    if _config is None:
+        return _SPAN_NULO
+    return Span(nome, atributos)
+
+def instrumented(nome):
+    """
+    Decorador: a função inteira vira um span. Linhas de entrada e de saída
+    vêm do primeiro argumento e do retorno, quando são tabelas/arrays.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if _config is None:
+                return funcao(*args, **kwargs)
+            atributos = {}
+            if args and hasattr(args[0], 'shape'):
+                atributos['linhas_entrada'] = len(args[0])
+            with Span(nome, atributos) as aberto:
+                resultado = funcao(*args, **kwargs)
+                if hasattr(resultado, 'shape'):
+                    aberto.set(linhas_saida=len(resultado))
+            return resultado
+        return envolvida
+    return decorador
+
+def metrics_summary():
+    """Métricas acumuladas por span neste processo: {span: {chamadas, tempo_s, ...}}."""
+    with _lock:
+        return {nome: dict(metricas) for nome, metricas in _metricas.items()}
+
+def reset_metrics():
+    """Zera as métricas acumuladas (ex: entre rodadas de um benchmark)."""
+    with _lock:
+        _metricas.clear()
+
+def prometheus_metrics():
+    """Métricas acumuladas por span no formato texto do Prometheus (exposition 0.0.4)."""
+    series = [
+        ('pipeline_span_chamadas_total', 'counter', 'chamadas', "Spans fechados."),
+        ('pipeline_span_erros_total', 'counter', 'erros', "Spans fechados com exceção."),
+        ('pipeline_span_segundos_total', 'counter', 'tempo_s', "Tempo de relógio dentro do span."),
+        ('pipeline_span_cpu_segundos_total', 'counter', 'cpu_s', "Tempo de CPU do processo dentro do span."),
+        ('pipeline_span_linhas_entrada_total', 'counter', 'linhas_entrada', "Linhas recebidas pelo span."),
+        ('pipeline_span_linhas_saida_total', 'counter', 'linhas_saida', "Linhas devolvidas pelo span."),
+        ('pipeline_span_rss_pico_megabytes', 'gauge', 'rss_pico_mb', "Maior pico de RSS observado no span."),
+    ]
+    resumo = metrics_summary()
+    linhas = []
+    for metrica, tipo, campo, ajuda in series:
+        linhas.append(f"# HELP {metrica} {ajuda}")
+        linhas.append(f"# TYPE {metrica} {tipo}")
+        for nome, metricas in sorted(resumo.items()):
+            rotulo = nome.replace('\\', '\\\\').replace('"', '\\"')
+            linhas.append(f'{metrica}{{span="{rotulo}"}} {metricas[campo]}')
+    return '\n'.join(linhas) + '\n'
+
+def summarize_spans(path=SPANS_PATH):
+    """
+    Resumo de um arquivo de spans: uma linha por caminho de span, com
+    chamadas, tempo total/médio, CPU, linhas e o maior pico de RSS.
+    """
+    import pandas as pd
+
+    df = pd.read_json(path, lines=True)
+    for coluna in ('linhas_entrada', 'linhas_saida', 'rss_pico_mb'):
+        if coluna not in df.columns:
+            df[coluna] = None
+    resumo = df.groupby('span').agg(
+        chamadas=('tempo_s', 'size'),
+        tempo_total_s=('tempo_s', 'sum'),
+        tempo_medio_s=('tempo_s', 'mean'),
+        cpu_total_s=('cpu_s', 'sum'),
+        linhas_entrada=('linhas_entrada', 'sum'),
+        linhas_saida=('linhas_saida', 'sum'),
+        rss_pico_mb=('rss_pico_mb', 'max'),
+    )
+    return resumo
+
+# Liga pelo ambiente (ex: INSTRUMENTACAO=1 python src/models/train_model.py)
+if os.environ.get('INSTRUMENTACAO'):
+    _destino = {'1': SPANS_PATH, 'metricas': None}.get(os.environ['INSTRUMENTACAO'], os.environ['INSTRUMENTACAO'])
+    configure(path=_destino, perfil=os.environ.get('INSTRUMENTACAO_PERFIL'))
+
+if __name__ == '__main__':
+    # Resumo de uma execução instrumentada (rode com: python data/instrumentation.py [dados/spans.jsonl])
+    path = sys.argv[1] if len(sys.argv) > 1 else SPANS_PATH
+    if not os.path.exists(path):
+        print(f"Erro: arquivo de spans não encontrado em {path}. Rode o pipeline com INSTRUMENTACAO=1.")
+        sys.exit(1)
+    import pandas as pd
+
+    with pd.option_context('display.width', 200, 'display.max_rows', 200):
+        print(summarize_spans(path).round(3).to_string())
@@ -1,74 +1,101 @@
 import pandas as pd
 import sqlalchemy
 import os
-from dotenv import load_dotenv
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
 
-# codigo de exemplo para realizar a conexão com o redshift, porém durante o hacka não foi possível realizar essa conexão
-# possivelmente por alguma restrição de acesso ao banco, que gerou uma "busca eterna"
+# Adiciona a raiz do projeto ao path para podermos importar 'data.database' e 'data.instrumentation'
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
 
-def get_historical_data(dat_start_filter='2024-01-01'):
-    """
-    Conecta ao Redshift e busca os dados históricos da ent_margin_summary.
-    
-    Esta função lê as credenciais do arquivo .env na raiz do projeto.
-    
-    Args:
-        dat_start_filter (str): Data de início para o filtro (formato YYYY-MM-DD).
-
-    Returns:
-        pd.DataFrame: Um DataFrame com os dados históricos, ou None se falhar.
-    """
-    
-    load_dotenv()
+from data.database import get_engine, run_query
+from data.instrumentation import instrumented
 
-    try:
-        user = os.environ['RS_USER']
-        password = os.environ['RS_PASS']
-        host = os.environ['RS_HOST']
-        port = os.environ['RS_PORT']
-        database = os.environ['RS_DB']
-    except KeyError as e:
-        print(f"Erro: Variável de ambiente {e} não encontrada.")
-        print("Certifique-se que seu arquivo .env está preenchido na raiz do projeto.")
-        return None
-
-    connection_string = (
-        f"postgresql+psycopg2://{user}:{password}@"
-        f"{host}:{port}/{database}"
-    )
+# codigo de exemplo para realizar a conexão com o redshift, porém durante o hacka não foi possível realizar essa conexão
+# possivelmente por alguma restrição de acesso ao banco, que gerou uma "busca eterna"
 
-    try:
-        engine = sqlalchemy.create_engine(connection_string)
-        print("Engine do SQLAlchemy criado com sucesso.")
-    except Exception as e:
-        print(f"Erro ao criar o engine do SQLAlchemy: {e}")
-        return None
+# Schema compacto do histórico usado na leitura em streaming (iter_historical_data).
+# float32 guarda ~7 dígitos significativos, suficiente para os valores diários
+# de TPV/margem; as agregações da FASE 2 são feitas em float64.
+HISTORICO_DTYPES = {
+    'tpv_dia': 'float32',
+    'margem_op_dia': 'float32',
+    'meio_pagamento': 'category',
+    'parcelas': 'int32',
+}
 
-    query_base = f"""
+QUERY_HISTORICO = """
     SELECT
         dat_reference AS data,
         idt_safepay_creditor AS id_cliente,
         num_tpv_value AS tpv_dia,
-        num_contribution_margin AS margem_op_dia, -- OK, usei sua coluna
+        num_contribution_margin AS margem_op_dia,
+        idt_main_payment_method AS meio_pagamento,
+        num_installment_qty AS parcelas
+    FROM
+        hackathon_dax.dax_ent_margin_summary
+    WHERE
+        dat_reference >= :dat_start_filter
+    ORDER BY
+        id_cliente, data;
+"""
 
-        -- COLUNAS CORRIGIDAS (essenciais para FASE 2)
+QUERY_HISTORICO_PERIODO = """
+    SELECT
+        dat_reference AS data,
+        idt_safepay_creditor AS id_cliente,
+        num_tpv_value AS tpv_dia,
+        num_contribution_margin AS margem_op_dia,
         idt_main_payment_method AS meio_pagamento,
         num_installment_qty AS parcelas
-        
     FROM
-        hackathon_dax.dax_ent_margin_summary -- OK, usei sua tabela
-        
+        hackathon_dax.dax_ent_margin_summary
     WHERE
-        dat_reference >= '{dat_start_filter}'
+        dat_reference >= :dat_start_filter AND dat_reference < :dat_end_filter
     ORDER BY
         id_cliente, data;
+"""
+
+QUERY_METAS = """
+    SELECT
+        num_total_contract_tpv AS tpv_meta,
+        idt_safepay_creditor AS id_cliente
+    FROM
+        hacka03.tpv_target_client;
+"""
+
+@instrumented('get_historical_data')
+def get_historical_data(dat_start_filter='2024-01-01', dat_end_filter=None, engine=None):
     """
+    Conecta ao Redshift e busca os dados históricos da ent_margin_summary.
+    
+    A conexão vem do engine compartilhado do processo (data/database.py),
+    que lê as credenciais do arquivo .env na raiz do projeto.
+    
+    Args:
+        dat_start_filter (str): Data de início para o filtro (formato YYYY-MM-DD).
+        dat_end_filter (str, opcional): Data final, exclusiva (ex: uma fatia de 'fetch_all').
+        engine (sqlalchemy.Engine, opcional): Default: o engine compartilhado.
 
-    print("Buscando dados históricos no Redshift...")
+    Returns:
+        pd.DataFrame: Um DataFrame com os dados históricos, ou None se falhar.
+    """
+    
+    engine = engine or get_engine()
+    if engine is None:
+        return None
+
+    periodo = f"de {dat_start_filter} a {dat_end_filter}" if dat_end_filter else f"desde {dat_start_filter}"
+    print(f"Buscando dados históricos no Redshift ({periodo})...")
     
     try:
-        with engine.connect() as connection:
-            df_historico = pd.read_sql_query(query_base, connection)
+        if dat_end_filter is None:
+            df_historico = run_query(QUERY_HISTORICO, {'dat_start_filter': dat_start_filter}, engine)
+        else:
+            df_historico = run_query(QUERY_HISTORICO_PERIODO, {'dat_start_filter': dat_start_filter,
+                                                               'dat_end_filter': dat_end_filter}, engine)
         
         if df_historico.empty:
             print("Aviso: A query de dados históricos foi executada, mas não retornou dados.")
@@ -81,45 +108,25 @@ def get_historical_data(dat_start_filter='2024-01-01'):
         print(f"Erro ao executar a query de DADOS HISTÓRICOS: {e}")
         return None
 
-def get_metas_from_redshift():
+@instrumented('get_metas')
+def get_metas_from_redshift(engine=None):
     """
     Busca a 'tpv_meta' de outra tabela no Redshift.
     
+    Args:
+        engine (sqlalchemy.Engine, opcional): Default: o engine compartilhado.
+
     Returns:
         pd.DataFrame: DataFrame de metas com 'id_cliente' como índice.
     """
     print("\nBuscando metas (tpv_meta) do Redshift...")
 
-    project_root = os.path.join(os.path.dirname(__file__), '..', '..')
-    load_dotenv(os.path.join(project_root, '.env'))
-
-    try:
-        user = os.environ['RS_USER']
-        password = os.environ['RS_PASS']
-        host = os.environ['RS_HOST']
-        port = os.environ['RS_PORT']
-        database = os.environ['RS_DB']
-        
-        connection_string = (
-            f"postgresql+psycopg2://{user}:{password}@"
-            f"{host}:{port}/{database}"
-        )
-        engine = sqlalchemy.create_engine(connection_string)
-    except Exception as e:
-        print(f"Erro ao conectar no Redshift (função de metas): {e}")
+    engine = engine or get_engine()
+    if engine is None:
         return None
-
-    query_metas = """
-    SELECT
-        num_total_contract_tpv AS tpv_meta,
-        idt_safepay_creditor AS id_cliente
-    FROM
-        hacka03.tpv_target_client;           
-    """
     
     try:
-        with engine.connect() as connection:
-            df_metas = pd.read_sql_query(query_metas, connection)
+        df_metas = run_query(QUERY_METAS, engine=engine)
             
         if df_metas.empty:
             print("Aviso: A query de metas foi executada, mas não retornou dados.")
@@ -134,6 +141,137 @@ def get_metas_from_redshift():
         print(f"Erro ao executar a query de METAS: {e}")
         return None
 
+def _date_slices(dat_start_filter, dat_end_filter, fatias):
+    """Divide [início, fim) em 'fatias' períodos contíguos de dias inteiros."""
+    bordas = pd.date_range(dat_start_filter, dat_end_filter, periods=fatias + 1).normalize()
+    bordas = bordas.drop_duplicates().strftime('%Y-%m-%d')
+    return list(zip(bordas[:-1], bordas[1:]))
+
+@instrumented('fetch_all')
+def fetch_all(dat_start_filter='2024-01-01', dat_end_filter=None, fatias=1, n_workers=None,
+              timeout_s=None, engine=None):
+    """
+    Busca o histórico e as metas ao mesmo tempo (um pool de threads sobre o
+    pool de conexões do engine compartilhado): a latência total é a da
+    consulta mais lenta, não a soma. O histórico pode ser dividido em
+    'fatias' de datas, cada uma em uma consulta (e conexão) própria.
+
+    Args:
+        dat_start_filter (str): Data de início do histórico (formato YYYY-MM-DD).
+        dat_end_filter (str, opcional): Data final do histórico, exclusiva
+                                        (default: amanhã, se 'fatias' > 1).
+        fatias (int): Consultas paralelas do histórico, por período.
+        n_workers (int, opcional): Threads (default: uma por consulta).
+        timeout_s (float, opcional): Prazo total de espera; o que não chegar
+                                     até lá volta como None (a consulta em si
+                                     é cancelada pelo statement timeout do banco).
+        engine (sqlalchemy.Engine, opcional): Default: o engine compartilhado.
+
+    Returns:
+        tuple: (df_historico, df_metas), cada um None se a sua busca falhar.
+               O histórico fica na ordem (id_cliente, data), como em 'get_historical_data'.
+    """
+    engine = engine or get_engine()
+    if engine is None:
+        return None, None
+
+    if fatias > 1:
+        dat_end_filter = dat_end_filter or (pd.Timestamp.today().normalize() + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        periodos = _date_slices(dat_start_filter, dat_end_filter, fatias)
+    else:
+        periodos = [(dat_start_filter, dat_end_filter)]
+
+    executor = ThreadPoolExecutor(max_workers=n_workers or len(periodos) + 1)
+    try:
+        futuro_metas = executor.submit(get_metas_from_redshift, engine)
+        futuros_historico = [executor.submit(get_historical_data, inicio, fim, engine) for inicio, fim in periodos]
+
+        prazo = None if timeout_s is None else time.monotonic() + timeout_s
+
+        def resultado(futuro, nome):
+            try:
+                return futuro.result(timeout=None if prazo is None else max(0.0, prazo - time.monotonic()))
+            except FuturoTimeout:
+                print(f"Erro: a busca de {nome} não terminou em {timeout_s}s.")
+                return None
+
+        df_metas = resultado(futuro_metas, 'metas')
+        partes = [resultado(futuro, f'histórico ({inicio} a {fim})')
+                  for futuro, (inicio, fim) in zip(futuros_historico, periodos)]
+    finally:
+        # Não espera consultas que passaram do prazo (o banco as cancela)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if any(parte is None for parte in partes):
+        return None, df_metas
+    if len(partes) == 1:
+        return partes[0], df_metas
+
+    # Cada fatia vem ordenada por (id_cliente, data); juntas, ordena de novo
+    df_historico = pd.concat(partes, ignore_index=True)
+    df_historico = df_historico.sort_values(['id_cliente', 'data'], kind='stable', ignore_index=True)
+    return df_historico, df_metas
+
+def _apply_historico_schema(df_chunk):
+    """
+    Converte um bloco do histórico para o schema compacto (HISTORICO_DTYPES).
+    'parcelas' com valores nulos vira o inteiro anulável 'Int32'.
+    """
+    df_chunk['data'] = pd.to_datetime(df_chunk['data'])
+    for coluna, dtype in HISTORICO_DTYPES.items():
+        if coluna == 'parcelas' and df_chunk[coluna].isna().any():
+            dtype = 'Int32'
+        df_chunk[coluna] = df_chunk[coluna].astype(dtype)
+    return df_chunk
+
+def iter_historical_data(dat_start_filter='2024-01-01', chunksize=100_000, engine=None):
+    """
+    Versão em streaming de 'get_historical_data': lê o histórico por um cursor
+    do lado do servidor (stream_results) e entrega blocos de 'chunksize' linhas,
+    já no schema compacto (HISTORICO_DTYPES).
+
+    Assim a FASE 2 pode ir acumulando os blocos sem manter o histórico inteiro
+    em memória.
+
+    Args:
+        dat_start_filter (str): Data de início para o filtro (formato YYYY-MM-DD).
+        chunksize (int): Quantidade de linhas por bloco.
+        engine (sqlalchemy.Engine, opcional): Engine a usar (ex: um SQLite local
+                                              para testes). Se não for passado,
+                                              usa o engine compartilhado
+                                              (data/database.py).
+
+    Yields:
+        pd.DataFrame: Blocos do histórico, na ordem (id_cliente, data).
+    """
+    engine = engine or get_engine()
+    if engine is None:
+        return
+
+    print(f"Buscando dados históricos em streaming (blocos de {chunksize} linhas)...")
+
+    total_linhas = 0
+    inicio = time.perf_counter()
+
+    # stream_results=True usa um cursor do lado do servidor: o banco entrega
+    # as linhas aos poucos em vez de materializar o resultado inteiro no cliente
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as connection:
+        blocos = pd.read_sql_query(
+            sqlalchemy.text(QUERY_HISTORICO),
+            connection,
+            params={'dat_start_filter': dat_start_filter},
+            chunksize=chunksize
+        )
+        for df_chunk in blocos:
+            total_linhas += len(df_chunk)
+            yield _apply_historico_schema(df_chunk)
+
+    duracao = time.perf_counter() - inicio
+    print(
+        f"Sucesso! {total_linhas} registros históricos lidos em {duracao:.1f}s "
+        f"({total_linhas / max(duracao, 1e-9):,.0f} linhas/s)."
+    )
+
 if __name__ == '__main__':    
     print("--- Testando o módulo make_dataset ---")
     
@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from data.artifacts import content_hash, is_up_to_date, read_artifact, write_artifact
+from benchmarks.synthetic import make_synthetic_churn_features
+
+# Benchmark dos artefatos entre fases (data/artifacts.py): tamanho em disco e
+# tempo de gravação/leitura da tabela de treino do churn em CSV (como os
+# notebooks gravavam), Parquet e Feather (memory map, o formato dos artefatos).
+
+def _medir(funcao, repeticoes):
+    """Melhor tempo (s) de 'repeticoes' chamadas e o último resultado."""
+    melhor, resultado = float('inf'), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+def run_benchmark(n_clientes, repeticoes=3):
+    df = make_synthetic_churn_features(n_clientes)
+    print(f"{n_clientes} clientes x {df.shape[1]} colunas ({df.memory_usage(deep=True).sum() / 1024 ** 2:.0f} MB em memória)")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        paths = {formato: os.path.join(pasta, f'features_churn_clientes.{formato}')
+                 for formato in ('csv', 'parquet', 'feather')}
+
+        gravacao = {
+            'csv': lambda: df.to_csv(paths['csv']),
+            'parquet': lambda: df.to_parquet(paths['parquet']),
+            'feather': lambda: write_artifact(df, paths['feather'], upstream={'teste': 1}),
+        }
+        leitura = {
+            'csv': lambda: pd.read_csv(paths['csv'], index_col='id_cliente'),
+            'parquet': lambda: pd.read_parquet(paths['parquet']),
+            'feather': lambda: read_artifact(paths['feather']),
+        }
+
+        print(f"\n{'formato':<8} {'tamanho':>10} {'gravação':>10} {'leitura':>10}  dtypes preservados")
+        for formato in ('csv', 'parquet', 'feather'):
+            tempo_gravacao, _ = _medir(gravacao[formato], 1)
+            tempo_leitura, df_lido = _medir(leitura[formato], repeticoes)
+            tamanho = os.path.getsize(paths[formato]) / 1024 ** 2
+            dtypes_ok = df_lido.dtypes.equals(df.dtypes) and df_lido.index.dtype == df.index.dtype
+            print(f"{formato:<8} {tamanho:>8.1f}MB {tempo_gravacao:>9.2f}s {tempo_leitura:>9.3f}s  {dtypes_ok}")
+
+        # Custo de decidir se uma fase pode ser pulada (só lê o .meta.json) e
+        # de calcular o hash do conteúdo (feito uma vez, na gravação)
+        tempo_checagem, _ = _medir(lambda: is_up_to_date(paths['feather'], {'teste': 1}), repeticoes)
+        tempo_hash, _ = _medir(lambda: content_hash(df), 1)
+        print(f"\nchecagem 'is_up_to_date': {tempo_checagem * 1000:.2f} ms | hash do conteúdo: {tempo_hash:.2f}s")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_artifacts.py --clientes 1000000
+    parser = argparse.ArgumentParser(description="Benchmark CSV vs. Parquet vs. Feather nos artefatos entre fases.")
+    parser.add_argument('--clientes', type=int, default=1_000_000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.clientes, args.repeticoes)
@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from features.build_churn_labels import JANELAS_CHURN, create_churn_labels_grid
+from benchmarks.synthetic import make_synthetic_history
+
+# Benchmark dos labels de churn em uma grade de snapshots: um groupby por
+# snapshot (o jeito direto, a partir de 'create_churn_labels') vs.
+# 'create_churn_labels_grid' (um único searchsorted). Confere que as duas
+# tabelas são iguais.
+
+def labels_por_snapshot(df_historico, snapshots, janelas):
+    """Um filtro + groupby por snapshot e uma tabela por janela."""
+    tabelas = []
+    for snapshot in snapshots:
+        ultima = df_historico[df_historico['data'] <= snapshot].groupby('id_cliente')['data'].max()
+        dias_desde = (snapshot - ultima).dt.days.to_numpy()
+        for janela in janelas:
+            tabelas.append(pd.DataFrame({
+                'id_cliente': ultima.index,
+                'data_snapshot': snapshot,
+                'janela_dias': janela,
+                'ultima_transacao': ultima.to_numpy(),
+                'dias_desde_ultima_transacao': dias_desde,
+                'is_churn': (dias_desde > janela).astype(np.int8),
+            }))
+    return pd.concat(tabelas, ignore_index=True)
+
+def _ordenar(df):
+    df = df.assign(id_cliente=df['id_cliente'].astype(object))
+    return df.sort_values(['id_cliente', 'data_snapshot', 'janela_dias'], ignore_index=True)
+
+def run_benchmark(n_clientes, max_dias, freq):
+    # Histórico com buracos (40% dos dias sem transação)
+    df_historico = make_synthetic_history(n_clientes, max_dias=max_dias)
+    df_historico = df_historico.sample(frac=0.6, random_state=42).reset_index(drop=True)
+    snapshots = pd.date_range(df_historico['data'].min(), df_historico['data'].max(), freq=freq)
+    print(f"{len(df_historico)} linhas, {n_clientes} clientes, {len(snapshots)} snapshots x {len(JANELAS_CHURN)} janelas")
+
+    inicio = time.perf_counter()
+    df_loop = labels_por_snapshot(df_historico, snapshots, JANELAS_CHURN)
+    tempo_loop = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    df_grade = create_churn_labels_grid(df_historico, snapshots, JANELAS_CHURN)
+    tempo_grade = time.perf_counter() - inicio
+
+    pd.testing.assert_frame_equal(_ordenar(df_grade), _ordenar(df_loop), check_dtype=False)
+    print(f"groupby por snapshot: {tempo_loop:.2f}s | grade (searchsorted): {tempo_grade:.2f}s "
+          f"({tempo_loop / tempo_grade:.1f}x) | {len(df_grade)} linhas iguais")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_churn_labels.py
+    parser = argparse.ArgumentParser(description="Benchmark dos labels de churn em grade de snapshots.")
+    parser.add_argument('--clientes', type=int, default=50_000)
+    parser.add_argument('--max-dias', type=int, default=180)
+    parser.add_argument('--freq', default='7D', help="Espaçamento dos snapshots (pandas).")
+    args = parser.parse_args()
+
+    run_benchmark(args.clientes, args.max_dias, args.freq)
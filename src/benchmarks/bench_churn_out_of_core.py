@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import warnings
+
+import pandas as pd
+
+# Adiciona a pasta 'src' ao path para podermos importar os módulos do projeto
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from models.train_churn_out_of_core import (TOLERANCIA_AUC, LINHAS_POR_BLOCO, ARVORES_POR_BLOCO,
+                                            peak_rss_mb, train_churn_out_of_core)
+from benchmarks.synthetic import make_synthetic_churn_features
+
+# Benchmark do treino de churn fora da memória (train_churn_out_of_core.py)
+# contra o treino em memória de train_churn_model.py, na mesma tabela
+# sintética: ROC AUC / average precision no teste, tempo e pico de RSS.
+# Cada modo roda em um processo separado para o pico de RSS ser comparável.
+
+def run_in_memory(path):
+    """Mesmo caminho de 'train_and_save_churn_model': read_csv inteiro + train_test_split."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import average_precision_score, roc_auc_score
+    from sklearn.model_selection import train_test_split
+    from models.train_churn_model import FEATURES_EXCLUIDAS
+
+    inicio = time.perf_counter()
+    df_churn_treino = pd.read_csv(path, index_col='id_cliente')
+    y = df_churn_treino['is_churn']
+    X = df_churn_treino[[col for col in df_churn_treino.columns if col not in FEATURES_EXCLUIDAS]].fillna(0)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+
+    model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=8, class_weight='balanced')
+    model.fit(X_train, y_train)
+    tempo_treino = time.perf_counter() - inicio
+
+    proba = model.predict_proba(X_test)[:, 1]
+    return {
+        'clientes_treino': len(X_train),
+        'arvores': model.n_estimators,
+        'roc_auc': round(float(roc_auc_score(y_test, proba)), 4),
+        'average_precision': round(float(average_precision_score(y_test, proba)), 4),
+        'tempo_treino_s': round(tempo_treino, 2),
+        'tempo_total_s': round(time.perf_counter() - inicio, 2),
+        'pico_memoria_mb': round(peak_rss_mb(), 1),
+    }
+
+def run_mode(path, modo, linhas_por_bloco, arvores_por_bloco):
+    if modo == 'memoria':
+        return run_in_memory(path)
+    _, metricas = train_churn_out_of_core(path, linhas_por_bloco, arvores_por_bloco)
+    return {k: v for k, v in metricas.items() if k not in ('relatorio', 'matriz_confusao')}
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_churn_out_of_core.py --clientes 1000000
+    parser = argparse.ArgumentParser(description="Benchmark do treino de churn fora da memória.")
+    parser.add_argument('--clientes', type=int, default=400_000)
+    parser.add_argument('--blocos', type=int, default=LINHAS_POR_BLOCO)
+    parser.add_argument('--arvores-por-bloco', type=int, default=ARVORES_POR_BLOCO)
+    parser.add_argument('--csv', default=os.path.join(PROJECT_ROOT, 'dados', 'bench_features_churn.csv'))
+    parser.add_argument('--modo', choices=['memoria', 'out-of-core'])
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    if args.modo:
+        # Processo filho: imprime as métricas em JSON na última linha
+        print(json.dumps(run_mode(args.csv, args.modo, args.blocos, args.arvores_por_bloco)))
+    else:
+        os.makedirs(os.path.dirname(args.csv), exist_ok=True)
+        make_synthetic_churn_features(args.clientes).to_csv(args.csv)
+        print(f"Tabela sintética de churn criada em {args.csv} ({args.clientes} clientes).")
+
+        resultados = {}
+        for modo in ('memoria', 'out-of-core'):
+            saida = subprocess.run(
+                [sys.executable, __file__, '--csv', args.csv, '--modo', modo, '--blocos', str(args.blocos),
+                 '--arvores-por-bloco', str(args.arvores_por_bloco)],
+                check=True, capture_output=True, text=True,
+            )
+            resultados[modo] = json.loads(saida.stdout.strip().splitlines()[-1])
+            print(f"[{modo}] {resultados[modo]}")
+
+        diferenca = resultados['out-of-core']['roc_auc'] - resultados['memoria']['roc_auc']
+        situacao = 'OK' if abs(diferenca) <= TOLERANCIA_AUC else 'FORA DA TOLERÂNCIA'
+        print(f"\nROC AUC fora da memória - em memória: {diferenca:+.4f} "
+              f"(tolerância: ±{TOLERANCIA_AUC}) -> {situacao}")
+        print(f"Pico de RSS: {resultados['memoria']['pico_memoria_mb']} MB (em memória) vs. "
+              f"{resultados['out-of-core']['pico_memoria_mb']} MB (fora da memória)")
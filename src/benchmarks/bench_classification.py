@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Adiciona a pasta 'src' ao path para podermos importar os módulos do projeto
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from models.classification_rules import classify_attainment
+
+# Benchmark da classificação por regras (FASE 3): if-chain por linha com
+# '.apply' (implementação original) vs. 'classify_attainment' (searchsorted).
+
+def get_class(atingimento):
+    # Regra original de 'apply_classification_rules', linha a linha
+    if atingimento >= 1.0:
+        return 'Alta Performance'
+    if atingimento >= 0.8:
+        return 'Boa Performance'
+    if atingimento >= 0.5:
+        return 'Performance Regular'
+    if atingimento >= 0.1:
+        return 'Baixa Performance'
+    return 'Critico'
+
+def make_attainment(n_linhas, seed=42):
+    """Atingimentos entre 0 e 1.5, com NaN, infinitos e valores exatamente nos limites."""
+    rng = np.random.default_rng(seed)
+    valores = rng.uniform(-0.1, 1.5, n_linhas)
+    especiais = np.array([np.nan, np.inf, -np.inf, 0.1, 0.5, 0.8, 1.0, 0.0, np.nextafter(1.0, 0)])
+    posicoes = rng.choice(n_linhas, size=min(n_linhas, 100_000), replace=False)
+    valores[posicoes] = especiais[rng.integers(0, len(especiais), len(posicoes))]
+    return pd.Series(valores, name='atingimento_meta_tpv')
+
+def run_benchmark(escalas):
+    for n_linhas in escalas:
+        atingimento = make_attainment(n_linhas)
+        print(f"\n--- {n_linhas} linhas ---")
+
+        inicio = time.perf_counter()
+        classes = classify_attainment(atingimento)
+        tempo_vetorizado = time.perf_counter() - inicio
+        print(f"searchsorted: {tempo_vetorizado:.3f}s ({n_linhas / tempo_vetorizado / 1e6:.1f} M linhas/s)")
+
+        inicio = time.perf_counter()
+        classes_apply = atingimento.apply(get_class)
+        tempo_apply = time.perf_counter() - inicio
+        print(f".apply(get_class): {tempo_apply:.3f}s ({tempo_apply / tempo_vetorizado:.0f}x mais lento)")
+
+        # Mesmos rótulos da regra original, inclusive NaN -> 'Critico'
+        assert (classes.astype(object).to_numpy() == classes_apply.to_numpy()).all()
+        print(f"Memória da coluna: categórica {classes.memory_usage(deep=True) / 1e6:.0f} MB vs. "
+              f"texto {classes_apply.memory_usage(deep=True) / 1e6:.0f} MB")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_classification.py
+    parser = argparse.ArgumentParser(description="Benchmark da classificação por regras de atingimento.")
+    parser.add_argument('--linhas', type=int, nargs='+', default=[1_000, 1_000_000, 10_000_000])
+    args = parser.parse_args()
+
+    run_benchmark(args.linhas)
@@ -0,0 +1,102 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from app.dashboard import CUBOS, DashboardCubes, refresh_cubes
+from benchmarks.synthetic import make_synthetic_churn_features, make_synthetic_history
+from models.classification_rules import CLASSES, classify_attainment
+
+# Benchmark do backend do dashboard (app/dashboard.py): tempo do refresh dos
+# cubos para uma carteira grande (histórico lido em blocos) e latência das
+# consultas interativas (meta: < 100 ms com 1M de clientes).
+
+CLIENTES_POR_BLOCO = 100_000
+
+def make_clientes(n_clientes, seed=42):
+    """Tabela de clientes do refresh: features sintéticas + classe e probabilidade de churn."""
+    rng = np.random.default_rng(seed)
+    df = make_synthetic_churn_features(n_clientes, seed)[['atingimento_meta_tpv', 'tpv_total', 'tpv_meta']]
+    # Classe prevista = classe da regra, com ~10% de erro do modelo; ~2% sem score
+    classe = classify_attainment(df['atingimento_meta_tpv']).to_numpy(dtype=object)
+    trocar = rng.random(n_clientes) < 0.1
+    classe[trocar] = rng.choice(CLASSES, trocar.sum())
+    df['classificacao'] = classe
+    # Em %, como 'predict_churn_batch' grava na tabela de scores
+    df['probabilidade_churn'] = np.round(rng.beta(1.5, 6, n_clientes) * 100, 2)
+    sem_score = rng.random(n_clientes) < 0.02
+    df.loc[sem_score, ['classificacao', 'probabilidade_churn']] = None
+    return df
+
+def iter_historico(n_clientes, max_dias, tempo_geracao):
+    """Histórico sintético em blocos de clientes (ids 'CLI0'.. como em 'make_clientes')."""
+    for c0 in range(0, n_clientes, CLIENTES_POR_BLOCO):
+        inicio = time.perf_counter()
+        df = make_synthetic_history(min(CLIENTES_POR_BLOCO, n_clientes - c0), max_dias=max_dias, seed=c0)
+        codigos = df['id_cliente'].str[3:].astype(np.int64) + c0
+        df['id_cliente'] = 'CLI' + codigos.astype(str)
+        tempo_geracao[0] += time.perf_counter() - inicio
+        yield df
+
+def run_benchmark(n_clientes, max_dias, n_consultas, seed=42):
+    df_clientes = make_clientes(n_clientes, seed)
+    rng = np.random.default_rng(seed)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        # 1. Refresh (o tempo de gerar o histórico sintético é descontado)
+        tempo_geracao = [0.0]
+        inicio = time.perf_counter()
+        metadata = refresh_cubes(df_clientes, iter_historico(n_clientes, max_dias, tempo_geracao), pasta)
+        tempo_refresh = time.perf_counter() - inicio - tempo_geracao[0]
+        print(f"Refresh: {tempo_refresh:.2f}s para {n_clientes} clientes e {metadata['linhas_historico']} linhas "
+              f"(cubos com {metadata['celulas']} células, "
+              f"{os.path.getsize(os.path.join(pasta, 'cubos.npz')) / 1024 ** 2:.1f} MB)")
+
+        # 2. Consultas interativas: agrupamentos e filtros aleatórios
+        cubos = DashboardCubes(pasta)
+        inicio = time.perf_counter()
+        cubos.summary()
+        print(f"Carga dos cubos no servidor: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+        rotulos = metadata['rotulos']
+        latencias = []
+        for _ in range(n_consultas):
+            cubo = rng.choice(list(CUBOS))
+            dimensoes = list(CUBOS[cubo]['dimensoes'])
+            por = list(rng.choice(dimensoes, size=rng.integers(1, 3), replace=False))
+            filtros = {}
+            for dimensao in rng.choice(dimensoes, size=rng.integers(0, 3), replace=False):
+                filtros[dimensao] = list(rng.choice(rotulos[dimensao], size=rng.integers(1, len(rotulos[dimensao]) + 1),
+                                                    replace=False))
+            inicio = time.perf_counter()
+            cubos.query(cubo, por, filtros)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+        p50, p99 = np.percentile(latencias, [50, 99])
+        print(f"{n_consultas} consultas: p50 {p50:.2f} ms | p99 {p99:.2f} ms | máx {max(latencias):.2f} ms "
+              f"-> {'OK' if p99 < 100 else 'ACIMA DE'} 100 ms")
+
+        # Conferência: total de TPV do cubo de transações = TPV do histórico
+        df_total = cubos.query('transacoes')
+        print(f"TPV total no cubo: {df_total['tpv'].iloc[0]:,.2f} | transações: {int(df_total['n_transacoes'].iloc[0])}")
+        print(cubos.query('clientes', por=['classe', 'risco_churn']).head(8).to_string())
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_dashboard.py --clientes 1000000
+    parser = argparse.ArgumentParser(description="Benchmark do backend do dashboard (cubos pré-agregados).")
+    parser.add_argument('--clientes', type=int, default=1_000_000)
+    parser.add_argument('--dias', type=int, default=30)
+    parser.add_argument('--consultas', type=int, default=500)
+    args = parser.parse_args()
+
+    run_benchmark(args.clientes, args.dias, args.consultas)
@@ -0,0 +1,132 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import sqlalchemy
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from data import database
+from data.database import apply_statement_timeout, run_query, set_engine
+from data.make_dataset import fetch_all, get_historical_data, get_metas_from_redshift
+from benchmarks.bench_streaming import build_sqlite_standin
+from benchmarks.synthetic import make_synthetic_targets
+
+# Benchmark (e teste) da camada de acesso ao banco (data/database.py e
+# 'fetch_all') contra um SQLite local no lugar do Redshift, com latência
+# injetada em cada consulta (simula a rede e o tempo de fila do cluster):
+#
+# 1. Histórico + metas em sequência (como nos notebooks 02 e 04) vs. 'fetch_all':
+#    a latência deve ficar perto da maior consulta, não da soma.
+# 2. Histórico dividido em fatias de datas: mesmo resultado da consulta única.
+# 3. Statement timeout: uma consulta que nunca termina é interrompida no prazo
+#    (e não é repetida).
+# 4. Retentativas: falhas de conexão passageiras não derrubam a busca.
+
+def create_standin_engine(db_path, latencia_s=0.0, timeout_s=None):
+    """
+    Engine SQLite com os schemas do Redshift ('hackathon_dax' e 'hacka03')
+    anexados e 'latencia_s' segundos de espera antes de cada consulta.
+    """
+    engine = sqlalchemy.create_engine(f"sqlite:///{db_path}")
+
+    @sqlalchemy.event.listens_for(engine, 'connect')
+    def _attach_schemas(dbapi_connection, _):
+        for schema in ('hackathon_dax', 'hacka03'):
+            dbapi_connection.execute(f"ATTACH DATABASE '{db_path}' AS {schema}")
+
+    if latencia_s:
+        @sqlalchemy.event.listens_for(engine, 'before_cursor_execute')
+        def _latencia(*_):
+            time.sleep(latencia_s)
+
+    return apply_statement_timeout(engine, timeout_s)
+
+def build_standin(db_path, n_clientes, max_dias):
+    """Histórico sintético (bench_streaming.py) e metas no mesmo arquivo SQLite."""
+    n_linhas = build_sqlite_standin(db_path, n_clientes, max_dias)
+    df_metas = make_synthetic_targets(n_clientes, max_dias).reset_index()
+    df_metas = df_metas.rename(columns={'id_cliente': 'idt_safepay_creditor', 'tpv_meta': 'num_total_contract_tpv'})
+    df_metas.to_sql('tpv_target_client', sqlalchemy.create_engine(f"sqlite:///{db_path}"),
+                    if_exists='replace', index=False)
+    return n_linhas
+
+def _medir(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+def run_benchmark(n_clientes, max_dias, latencia_s, fatias):
+    with tempfile.TemporaryDirectory() as pasta:
+        db_path = os.path.join(pasta, 'standin.sqlite')
+        n_linhas = build_standin(db_path, n_clientes, max_dias)
+        print(f"SQLite de teste: {n_linhas} linhas de histórico, {n_clientes} metas, "
+              f"latência injetada de {latencia_s:.1f}s por consulta\n")
+        set_engine(create_standin_engine(db_path, latencia_s))
+
+        # 1. Em sequência vs. concorrente
+        tempo_sequencial, (df_historico, df_metas) = _medir(
+            lambda: (get_historical_data('2024-01-01'), get_metas_from_redshift()))
+        tempo_concorrente, (df_historico_2, df_metas_2) = _medir(lambda: fetch_all('2024-01-01'))
+        pd.testing.assert_frame_equal(df_historico_2, df_historico)
+        pd.testing.assert_frame_equal(df_metas_2, df_metas)
+
+        # 2. Histórico em fatias de datas (cada uma em uma conexão do pool)
+        fim = (pd.Timestamp('2024-01-01') + pd.Timedelta(days=max_dias)).strftime('%Y-%m-%d')
+        tempo_fatias, (df_historico_3, _) = _medir(lambda: fetch_all('2024-01-01', fim, fatias=fatias))
+        pd.testing.assert_frame_equal(df_historico_3, df_historico)
+
+        print(f"\nHistórico + metas em sequência: {tempo_sequencial:.2f}s")
+        print(f"fetch_all (concorrente):        {tempo_concorrente:.2f}s - mesmos dados")
+        print(f"fetch_all ({fatias} fatias de datas):  {tempo_fatias:.2f}s - mesmos dados")
+
+        # 3. Statement timeout: consulta infinita interrompida pelo banco
+        engine_timeout = create_standin_engine(db_path, timeout_s=1.0)
+        consulta_infinita = ("WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r) "
+                             "SELECT COUNT(*) FROM r")
+        inicio = time.perf_counter()
+        try:
+            run_query(consulta_infinita, engine=engine_timeout)
+            print("\nErro: a consulta infinita terminou?")
+        except sqlalchemy.exc.OperationalError as e:
+            print(f"\nConsulta travada interrompida pelo statement timeout (1s, sem nova tentativa) em "
+                  f"{time.perf_counter() - inicio:.1f}s: {e.orig}")
+
+        # Prazo de espera do 'fetch_all': o que não chegou volta como None, sem bloquear
+        tempo_prazo, (df_historico_4, df_metas_4) = _medir(lambda: fetch_all('2024-01-01', timeout_s=latencia_s / 2))
+        print(f"fetch_all com prazo de {latencia_s / 2:.1f}s: retornou em {tempo_prazo:.2f}s "
+              f"(histórico: {'None' if df_historico_4 is None else 'ok'}, metas: {'None' if df_metas_4 is None else 'ok'})")
+
+        # 4. Retentativas: as 2 primeiras consultas falham como uma conexão caída
+        engine_instavel = create_standin_engine(db_path)
+        falhas = [2]
+
+        @sqlalchemy.event.listens_for(engine_instavel, 'do_execute')
+        def _falha_passageira(*_):
+            if falhas[0] > 0:
+                falhas[0] -= 1
+                raise sqlite3.OperationalError("server closed the connection unexpectedly")
+
+        df = run_query("SELECT COUNT(*) AS n FROM hacka03.tpv_target_client", engine=engine_instavel)
+        print(f"Consulta com 2 falhas passageiras concluída na 3ª tentativa: {int(df['n'].iloc[0])} metas")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_fetch_all.py --latencia 1.0 --fatias 4
+    parser = argparse.ArgumentParser(description="Benchmark da busca concorrente de histórico e metas.")
+    parser.add_argument('--clientes', type=int, default=20_000)
+    parser.add_argument('--max-dias', type=int, default=60)
+    parser.add_argument('--latencia', type=float, default=1.0)
+    parser.add_argument('--fatias', type=int, default=4)
+    args = parser.parse_args()
+
+    database.DB_ESPERA_TENTATIVA_S = 0.1
+    run_benchmark(args.clientes, args.max_dias, args.latencia, args.fatias)
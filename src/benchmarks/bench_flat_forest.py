@@ -0,0 +1,87 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Adiciona a pasta 'src' ao path para podermos importar os módulos do projeto
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from models.flat_forest import FlatForest, export_forest
+from benchmarks.synthetic import train_synthetic_health_model
+
+# Benchmark da floresta achatada (flat_forest.py) vs. RandomForestClassifier:
+# igualdade das probabilidades, latência por tamanho de lote e tempo de
+# partida de um processo que só avalia o '.npz' (sem importar o scikit-learn).
+
+CODIGO_PARTIDA = """
+import sys, time
+inicio = time.perf_counter()
+sys.path.append({src!r})
+import numpy as np
+from models.flat_forest import FlatForest
+model = FlatForest.load({path!r})
+model.predict_proba(np.zeros((1, model.n_features_in_)))
+print(time.perf_counter() - inicio, 'sklearn' in sys.modules)
+"""
+
+def _tempo_medio(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes
+
+def run_benchmark(lotes, n_clientes_treino=20_000):
+    """
+    Args:
+        lotes (list[int]): Tamanhos de lote (clientes por chamada) a medir.
+        n_clientes_treino (int): Clientes sintéticos usados no treino.
+    """
+    model, encoder, df_base = train_synthetic_health_model(n_clientes_treino)
+    model.set_params(n_jobs=1)  # mesmo cenário de um worker da API
+    df_base = df_base[model.feature_names_in_]
+
+    with tempfile.TemporaryDirectory() as pasta:
+        path = os.path.join(pasta, 'health_score_classifier.npz')
+        export_forest(model, path, encoder=encoder)
+        flat = FlatForest.load(path)
+        print(f"'.npz': {os.path.getsize(path) / 1e6:.1f} MB, {len(flat.limiar)} nós, profundidade {flat.profundidade}")
+
+        # 1. Igualdade exata das probabilidades (com NaN nas entradas também)
+        df_teste = df_base.sample(min(len(df_base), 50_000), replace=True, random_state=0)
+        df_teste.iloc[::7, 0] = np.nan
+        iguais = np.array_equal(model.predict_proba(df_teste), flat.predict_proba(df_teste))
+        print(f"predict_proba idêntico ao scikit-learn: {iguais}")
+        assert iguais
+        assert (encoder.inverse_transform(model.predict(df_teste)) == flat.rotulos[
+            np.argmax(flat.predict_proba(df_teste), axis=1)]).all()
+
+        # 2. Latência por tamanho de lote
+        for n_linhas in lotes:
+            df_lote = df_base.sample(n_linhas, replace=True, random_state=1)
+            repeticoes = max(1, 2_000 // n_linhas)
+            tempo_sklearn = _tempo_medio(lambda: model.predict_proba(df_lote), repeticoes)
+            tempo_flat = _tempo_medio(lambda: flat.predict_proba(df_lote), repeticoes)
+            print(f"{n_linhas:>9} clientes: scikit-learn {tempo_sklearn * 1e3:9.3f} ms | "
+                  f"flat {tempo_flat * 1e3:9.3f} ms | {tempo_sklearn / tempo_flat:5.1f}x")
+
+        # 3. Partida a frio de um processo que só usa o '.npz'
+        saida = subprocess.run([sys.executable, '-c', CODIGO_PARTIDA.format(src=SRC_PATH, path=path)],
+                               capture_output=True, text=True, check=True).stdout.split()
+        print(f"Partida (import + load + 1ª predição): {float(saida[0]) * 1e3:.1f} ms, "
+              f"scikit-learn importado: {saida[1]}")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_flat_forest.py
+    parser = argparse.ArgumentParser(description="Benchmark da floresta achatada vs. RandomForestClassifier.")
+    parser.add_argument('--lotes', type=int, nargs='+', default=[1, 10, 100, 1_000, 100_000])
+    parser.add_argument('--clientes-treino', type=int, default=20_000)
+    args = parser.parse_args()
+
+    run_benchmark(args.lotes, args.clientes_treino)
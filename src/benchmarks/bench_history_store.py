@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from data.history_store import HistoryStore
+from benchmarks.synthetic import make_synthetic_history
+from features.build_features import aggregate_client_features, aggregate_store_features
+from models.sarimax_engine import build_indicator_series
+
+# Benchmark do histórico denso (data/history_store.py) contra o histórico
+# longo da FASE 1: atributos por cliente ('aggregate_store_features' x
+# 'aggregate_client_features'), séries diárias da previsão
+# ('indicator_series' x 'build_indicator_series') e a carga de um dia.
+
+def _medir(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+def run_benchmark(n_clientes, max_dias, n_series=1000):
+    df_historico = make_synthetic_history(n_clientes, max_dias=max_dias)
+    ultimo_dia = df_historico['data'].max()
+    print(f"{len(df_historico)} linhas, {n_clientes} clientes, até {max_dias} dias "
+          f"({df_historico.memory_usage(deep=True).sum() / 1024 ** 2:.0f} MB em memória)")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        # 1. Criação do store (sem o último dia) e carga do último dia
+        tempo_build, _ = _medir(lambda: HistoryStore.build(df_historico[df_historico['data'] < ultimo_dia], pasta))
+        df_dia = df_historico[df_historico['data'] == ultimo_dia]
+        tempo_dia, _ = _medir(lambda: HistoryStore(pasta).append_days(df_dia))
+        tamanho = sum(os.path.getsize(os.path.join(pasta, nome)) for nome in os.listdir(pasta)) / 1024 ** 2
+        store = HistoryStore(pasta, modo='r')
+        print(f"Store: {len(store)} clientes x {store.n_dias} dias x {len(store.meios)} meios, "
+              f"{tamanho:.0f} MB em disco (com a folga de capacidade)")
+        print(f"  criação: {tempo_build:.2f}s | append de 1 dia ({len(df_dia)} linhas): {tempo_dia:.3f}s")
+
+        # 2. Atributos por cliente (FASE 2)
+        tempo_longo, df_longo = _medir(lambda: aggregate_client_features(df_historico))
+        tempo_denso, df_denso = _medir(lambda: aggregate_store_features(store))
+        # O store guarda float32: mesmas features até ~7 dígitos do TPV diário
+        for coluna in df_denso.columns:
+            np.testing.assert_allclose(df_denso[coluna].to_numpy(), df_longo[coluna].to_numpy(),
+                                       rtol=1e-4, atol=1e-2, err_msg=coluna)
+        print(f"\nAtributos por cliente: histórico longo {tempo_longo:.2f}s | store {tempo_denso:.2f}s "
+              f"({tempo_longo / tempo_denso:.1f}x) - mesmos valores (precisão float32)")
+
+        # 3. Séries diárias de TPV para a previsão (amostra de clientes)
+        ids = store.clientes[np.linspace(0, len(store) - 1, min(n_series, len(store))).astype(int)]
+        tempo_series_longo, df_series = _medir(
+            lambda: build_indicator_series(df_historico[df_historico['id_cliente'].isin(ids)], 'cliente', 'tpv'))
+        tempo_series_denso, df_series_store = _medir(lambda: store.indicator_series('tpv', clientes=ids))
+        np.testing.assert_allclose(df_series_store[df_series.columns].to_numpy(), df_series.to_numpy(), rtol=1e-6)
+        print(f"Séries diárias ({len(ids)} clientes): histórico longo {tempo_series_longo:.2f}s | "
+              f"store {tempo_series_denso:.3f}s - mesmos valores")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_history_store.py --clientes 200000 --dias 365
+    parser = argparse.ArgumentParser(description="Benchmark do histórico denso em memory map.")
+    parser.add_argument('--clientes', type=int, default=100_000)
+    parser.add_argument('--dias', type=int, default=180)
+    parser.add_argument('--series', type=int, default=1000)
+    args = parser.parse_args()
+
+    run_benchmark(args.clientes, args.dias, args.series)
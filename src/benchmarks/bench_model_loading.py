@@ -0,0 +1,94 @@
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+
+import joblib
+import psutil
+
+# Adiciona a pasta 'src' ao path para podermos importar os módulos do projeto
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from benchmarks.synthetic import train_synthetic_health_model
+
+# Benchmark do carregamento dos modelos:
+# 1. Tempo de import de 'predict_model' antes (carga na importação) e depois
+#    (carga preguiçosa pelo registro).
+# 2. Memória por worker (RSS, USS e PSS) com N workers criados por fork:
+#    cada worker carregando os modelos ('eager') vs. carga única no processo
+#    mestre antes do fork ('preload', como o gunicorn --preload).
+
+CODIGO_IMPORT = """
+import sys, time
+sys.path.append({src!r})
+inicio = time.perf_counter()
+from models import predict_model
+if {carregar}:
+    predict_model.registry.preload(['health_score', 'label_encoder'])
+print(time.perf_counter() - inicio)
+"""
+
+def medir_import(model_dir, carregar):
+    ambiente = dict(os.environ, MODELOS_DIR=model_dir)
+    codigo = CODIGO_IMPORT.format(src=SRC_PATH, carregar=carregar)
+    saida = subprocess.run([sys.executable, '-c', codigo], env=ambiente,
+                           capture_output=True, text=True, check=True).stdout
+    return float(saida.strip().splitlines()[-1])
+
+def _worker(modo, df_features, fila, fim):
+    from models import predict_model
+    if modo == 'eager':
+        predict_model.registry.preload(['health_score', 'label_encoder'])
+    predict_model.predict_health_score_batch(df_features)
+
+    memoria = psutil.Process().memory_full_info()
+    fila.put((memoria.rss, memoria.uss, getattr(memoria, 'pss', float('nan'))))
+    fim.wait()  # mantém todos os workers vivos durante a medição do PSS
+
+def medir_workers(model_dir, modo, n_workers, df_features):
+    from models import predict_model
+    predict_model.registry.model_dir = model_dir
+    predict_model.registry.reload()
+    if modo == 'preload':
+        predict_model.registry.preload(['health_score', 'label_encoder'])
+
+    contexto = multiprocessing.get_context('fork')
+    fila, fim = contexto.Queue(), contexto.Event()
+    workers = [contexto.Process(target=_worker, args=(modo, df_features, fila, fim)) for _ in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    medidas = [fila.get() for _ in workers]
+    fim.set()
+    for worker in workers:
+        worker.join()
+
+    mb = 1024 ** 2
+    rss, uss, pss = (sum(m[i] for m in medidas) / len(medidas) / mb for i in range(3))
+    print(f"[{modo}] média por worker: RSS {rss:.0f} MB, USS {uss:.0f} MB, PSS {pss:.0f} MB")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_model_loading.py
+    parser = argparse.ArgumentParser(description="Benchmark do carregamento dos modelos.")
+    parser.add_argument('--clientes', type=int, default=50_000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    model, encoder, df_features = train_synthetic_health_model(args.clientes)
+    model.set_params(n_jobs=1)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        joblib.dump(model, os.path.join(model_dir, 'health_score_classifier.joblib'))
+        joblib.dump(encoder, os.path.join(model_dir, 'label_encoder.joblib'))
+        del model
+
+        print(f"Import de predict_model com carga dos modelos (antes): {medir_import(model_dir, True):.2f}s")
+        print(f"Import de predict_model com carga preguiçosa (depois): {medir_import(model_dir, False):.2f}s")
+
+        amostra = df_features.head(1_000)
+        for modo in ('eager', 'preload'):
+            medir_workers(model_dir, modo, args.workers, amostra)
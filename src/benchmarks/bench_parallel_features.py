@@ -0,0 +1,71 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from benchmarks.synthetic import read_synthetic_history, write_synthetic_dataset
+from data import instrumentation
+from features.build_features import aggregate_client_features, aggregate_client_features_parallel
+
+# Benchmark da agregação por cliente particionada em processos
+# ('aggregate_client_features_parallel') contra a versão serial, no mesmo
+# histórico sintético: tempo por número de processos, speedup e conferência
+# de que o resultado é idêntico (mesma ordem, colunas e valores).
+#
+# O tempo do particionamento (no processo principal) é a parte serial: o
+# speedup máximo com N processos é limitado por ela (lei de Amdahl).
+
+def _medir(funcao, repeticoes):
+    melhor, resultado = None, None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        duracao = time.perf_counter() - inicio
+        melhor = duracao if melhor is None else min(melhor, duracao)
+    return melhor, resultado
+
+def run_benchmark(n_clientes, n_dias, lista_workers, repeticoes=1):
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as pasta:
+        dataset = write_synthetic_dataset(pasta, n_clientes, n_dias)
+        df_historico = read_synthetic_history(dataset['historico'])
+    print(f"{len(df_historico)} linhas, {n_clientes} clientes x {n_dias} dias, {os.cpu_count()} núcleos")
+
+    tempo_serial, df_serial = _medir(lambda: aggregate_client_features(df_historico), repeticoes)
+    print(f"Serial: {tempo_serial:.2f}s")
+
+    # Spans só em memória: separam o particionamento (serial) do pool
+    instrumentation.configure(path=None, memoria=False)
+    for n_workers in lista_workers:
+        tempo, df_paralelo = _medir(lambda: aggregate_client_features_parallel(df_historico, n_workers), repeticoes)
+        pd.testing.assert_frame_equal(df_paralelo, df_serial, check_exact=True)
+        metricas = instrumentation.metrics_summary()
+        particionamento = metricas['agregacao_paralela/particionamento']
+        pool = metricas['agregacao_paralela/pool']
+        print(f"{n_workers:>2} processos: {tempo:.2f}s -> speedup {tempo_serial / tempo:.2f}x "
+              f"(particionamento {particionamento['tempo_s'] / particionamento['chamadas']:.2f}s, "
+              f"pool {pool['tempo_s'] / pool['chamadas']:.2f}s) - resultado idêntico")
+        instrumentation.reset_metrics()
+    instrumentation.configure(ativo=False)
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_parallel_features.py --clientes 200000 --workers 1 2 4 8
+    parser = argparse.ArgumentParser(description="Benchmark da agregação de features particionada por cliente.")
+    parser.add_argument('--clientes', type=int, default=100_000)
+    parser.add_argument('--dias', type=int, default=180)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--repeticoes', type=int, default=1)
+    args = parser.parse_args()
+
+    run_benchmark(args.clientes, args.dias, args.workers, args.repeticoes)
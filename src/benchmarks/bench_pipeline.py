@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from benchmarks.synthetic import read_synthetic_history, write_synthetic_dataset
+from data.artifacts import is_up_to_date
+from models import predict_model, train_churn_model, train_model
+from pipeline import run_pipeline as pipeline
+
+# Benchmark (e teste) do pipeline em DAG (src/pipeline/run_pipeline.py) sobre
+# o histórico sintético, com artefatos e modelos em uma pasta temporária:
+#
+# 1. Primeira execução, uma fase por vez (como o encadeamento dos notebooks).
+# 2. Todas as fases refeitas ('forcar'), com os ramos e os treinos em paralelo.
+# 3. Nada mudou: só a carga roda, o resto é pulado.
+# 4. 'days_for_churn' mudou: só labels -> tabela de churn -> treino de churn.
+# 5. Mesmo parâmetro de novo: tudo pulado outra vez.
+# 6. Os scripts de treino veem os modelos do pipeline como atualizados e,
+#    treinados de novo pelos scripts, os modelos continuam valendo para o pipeline.
+
+def _use_temp_paths(pasta):
+    # Mesmo esquema de suite.py: nada em 'dados/processed' nem em 'modelos/' é tocado
+    train_model.PROCESSED_DATA_PATH = os.path.join(pasta, 'features_clientes.feather')
+    train_model.MODEL_OUTPUT_PATH = os.path.join(pasta, 'modelos')
+    train_model.MODEL_PATH = os.path.join(pasta, 'modelos', 'health_score_classifier.joblib')
+    train_churn_model.PROCESSED_DATA_PATH = os.path.join(pasta, 'features_churn_clientes.feather')
+    train_churn_model.MODEL_OUTPUT_PATH = os.path.join(pasta, 'modelos')
+    train_churn_model.MODEL_PATH = os.path.join(pasta, 'modelos', 'churn_predictor.joblib')
+    predict_model.registry.model_dir = os.path.join(pasta, 'modelos')
+    pipeline.LABELS_CHURN_PATH = os.path.join(pasta, 'labels_churn.feather')
+
+def _executadas(resultados):
+    return {nome for nome, resultado in resultados.items() if resultado['status'] == 'executada'}
+
+def run_benchmark(n_clientes, n_dias, days_for_churn, novo_days_for_churn):
+    with tempfile.TemporaryDirectory() as pasta:
+        _use_temp_paths(pasta)
+        dataset = write_synthetic_dataset(os.path.join(pasta, 'sintetico'), n_clientes, n_dias)
+        parametros = {
+            'carregar_historico': lambda dat_start_filter: read_synthetic_history(dataset['historico']),
+            'carregar_metas': lambda: read_synthetic_history(dataset['metas']),
+        }
+        carga = {'historico', 'metas'}
+        execucoes = []
+
+        def executar(titulo, esperadas, **extras):
+            inicio = time.perf_counter()
+            resultados = pipeline.run_pipeline(**parametros, **extras)
+            execucoes.append((titulo, time.perf_counter() - inicio, resultados))
+            if _executadas(resultados) != esperadas:
+                raise AssertionError(f"{titulo}: executadas {sorted(_executadas(resultados))}, "
+                                     f"esperadas {sorted(esperadas)}")
+
+        todas = {fase.nome for fase in pipeline.build_pipeline()}
+        executar("1. Primeira execução, em série", todas, max_paralelas=1, days_for_churn=days_for_churn)
+        executar("2. Tudo refeito, em paralelo", todas, forcar=todas, days_for_churn=days_for_churn)
+        executar("3. Sem mudanças", carga, days_for_churn=days_for_churn)
+        executar(f"4. days_for_churn {days_for_churn} -> {novo_days_for_churn}",
+                 carga | {'labels_churn', 'features_churn_clientes', 'treino_churn'},
+                 days_for_churn=novo_days_for_churn)
+        executar("5. Mesmo parâmetro de novo", carga, days_for_churn=novo_days_for_churn)
+
+        for script in (train_model, train_churn_model):
+            if not is_up_to_date(script.MODEL_PATH, script.training_upstream()):
+                raise AssertionError(f"{script.__name__}: modelo do pipeline não reconhecido pelo script")
+        train_model.train_and_save_model(force=True)
+        train_churn_model.train_and_save_churn_model(force=True)
+        executar("6. Depois dos scripts de treino", carga, days_for_churn=novo_days_for_churn)
+
+    print(f"\n=== {dataset['linhas']} linhas, {n_clientes} clientes x {n_dias} dias, {os.cpu_count()} núcleos ===")
+    for titulo, tempo, resultados in execucoes:
+        rodadas = sorted(_executadas(resultados) - carga) or ['só a carga']
+        print(f"{titulo:<32} {tempo:>7.2f}s | executadas: {', '.join(rodadas)}")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_pipeline.py --clientes 50000 --dias 180
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline em DAG com cache por hash.")
+    parser.add_argument('--clientes', type=int, default=20_000)
+    parser.add_argument('--dias', type=int, default=180)
+    parser.add_argument('--dias-churn', type=int, default=45)
+    parser.add_argument('--novo-dias-churn', type=int, default=30)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    run_benchmark(args.clientes, args.dias, args.dias_churn, args.novo_dias_churn)
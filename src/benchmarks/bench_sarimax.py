@@ -0,0 +1,63 @@
+import argparse
+import copy
+import os
+import sys
+import warnings
+
+# Adiciona a pasta 'src' ao path para podermos importar os módulos do projeto
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from models.sarimax_engine import SarimaxEngine
+from benchmarks.synthetic import make_synthetic_series
+
+# Benchmark do motor SARIMAX (sarimax_engine.py): ajustes por segundo por
+# núcleo com 1..N processos, ajuste a frio vs. re-ajuste com warm start, e o
+# custo de incorporar um dia novo só com o filtro (sem MLE).
+
+def _taxa(resumo, acao, n_workers):
+    n = resumo[acao]
+    por_s = n / resumo['tempo_s'] if resumo['tempo_s'] > 0 else float('inf')
+    return f"{n:>6} {acao:<8} {resumo['tempo_s']:>8.2f}s  {por_s:>9.1f}/s  {por_s / n_workers:>9.1f}/s/núcleo"
+
+def run_benchmark(n_series, n_dias, lista_workers):
+    """
+    Args:
+        n_series (int): Quantidade de séries (clientes).
+        n_dias (int): Dias de histórico de cada série.
+        lista_workers (list[int]): Quantidades de processos a medir.
+    """
+    df_series = make_synthetic_series(n_series, n_dias + 1)
+    df_historico, dia_novo = df_series.iloc[:n_dias], df_series.iloc[n_dias:]
+    print(f"{n_series} séries x {n_dias} dias (núcleos disponíveis: {os.cpu_count()})")
+
+    for n_workers in lista_workers:
+        print(f"\n--- {n_workers} processo(s) ---")
+
+        # 1. Ajuste a frio de todas as séries
+        engine = SarimaxEngine(n_workers=n_workers)
+        resumo = engine.update(df_historico)
+        print(f"ajuste a frio:  {_taxa(resumo, 'ajustes', n_workers)}  (iterações médias: {resumo['iteracoes_media']})")
+
+        # 2. Dia novo só com o filtro (parâmetros fixos)
+        engine_filtro = copy.deepcopy(engine)
+        resumo = engine_filtro.update(dia_novo)
+        print(f"dia novo:       {_taxa(resumo, 'filtros', n_workers)}")
+
+        # 3. Dia novo com re-ajuste partindo dos parâmetros anteriores (warm start)
+        engine.refit_a_cada = 1
+        resumo = engine.update(df_series)
+        print(f"re-ajuste warm: {_taxa(resumo, 'ajustes', n_workers)}  (iterações médias: {resumo['iteracoes_media']})")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_sarimax.py
+    parser = argparse.ArgumentParser(description="Benchmark do motor SARIMAX por série.")
+    parser.add_argument('--series', type=int, default=200)
+    parser.add_argument('--dias', type=int, default=180)
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, os.cpu_count()}))
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    run_benchmark(args.series, args.dias, args.workers)
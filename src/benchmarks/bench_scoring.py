@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Adiciona a pasta 'src' ao path para podermos importar os módulos do projeto
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from models import predict_model
+from models.model_registry import registry
+from benchmarks.synthetic import train_synthetic_health_model
+
+# Benchmark do scoring de Health Score: custo por cliente de
+# 'predict_health_score' (um cliente por chamada) vs. 'predict_health_score_batch'.
+
+def run_benchmark(escalas, max_linhas_loop=1_000):
+    """
+    Args:
+        escalas (list[int]): Quantidades de clientes a pontuar.
+        max_linhas_loop (int): Acima disso o loop cliente a cliente é pulado.
+    """
+    model, encoder, df_base = train_synthetic_health_model()
+    registry.register('health_score', model)
+    registry.register('label_encoder', encoder)
+    model.set_params(n_jobs=1)  # mesmo cenário de um worker da API
+
+    for n_linhas in escalas:
+        df_features = df_base.sample(n_linhas, replace=True, random_state=0)
+        print(f"\n--- {n_linhas} clientes ---")
+
+        inicio = time.perf_counter()
+        df_scores = predict_model.predict_health_score_batch(df_features)
+        tempo_lote = time.perf_counter() - inicio
+        print(f"predict_health_score_batch: {tempo_lote:.3f}s ({tempo_lote / n_linhas * 1e6:.1f} µs/cliente)")
+
+        if n_linhas > max_linhas_loop:
+            print("predict_health_score (loop): pulado")
+            continue
+
+        inicio = time.perf_counter()
+        resultados = [predict_model.predict_health_score(df_features.iloc[[i]]) for i in range(n_linhas)]
+        tempo_loop = time.perf_counter() - inicio
+        print(f"predict_health_score (loop): {tempo_loop:.3f}s ({tempo_loop / n_linhas * 1e6:.1f} µs/cliente)")
+
+        # Confere que o lote devolve o mesmo que a versão de um cliente
+        df_loop = pd.DataFrame(resultados, index=df_features.index)
+        assert (df_loop["Classificação"] == df_scores["Classificação"]).all()
+        assert np.allclose(df_loop["Health Score (Calculado)"], df_scores["Health Score (Calculado)"])
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_scoring.py
+    parser = argparse.ArgumentParser(description="Benchmark do scoring de Health Score em lote.")
+    parser.add_argument('--clientes', type=int, nargs='+', default=[1, 1_000, 1_000_000])
+    parser.add_argument('--max-linhas-loop', type=int, default=1_000)
+    args = parser.parse_args()
+
+    run_benchmark(args.clientes, max_linhas_loop=args.max_linhas_loop)
@@ -0,0 +1,104 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+import sqlalchemy
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from data.make_dataset import QUERY_HISTORICO, iter_historical_data
+from benchmarks.synthetic import make_synthetic_history
+
+# Benchmark da leitura do histórico contra um SQLite local (stand-in do Redshift):
+# 'read_sql_query' de uma vez vs. 'iter_historical_data' em blocos.
+# Cada modo roda em um processo separado para o pico de RSS ser comparável.
+
+def create_sqlite_engine(db_path):
+    """
+    Engine SQLite com o schema 'hackathon_dax' anexado, para a mesma query
+    do Redshift (hackathon_dax.dax_ent_margin_summary) rodar sem alterações.
+    """
+    engine = sqlalchemy.create_engine(f"sqlite:///{db_path}")
+
+    @sqlalchemy.event.listens_for(engine, 'connect')
+    def _attach_schema(dbapi_connection, _):
+        dbapi_connection.execute(f"ATTACH DATABASE '{db_path}' AS hackathon_dax")
+
+    return engine
+
+def build_sqlite_standin(db_path, n_clientes, max_dias):
+    """Grava um histórico sintético com as colunas originais da tabela do Redshift."""
+    df = make_synthetic_history(n_clientes, max_dias=max_dias)
+    df = df.rename(columns={
+        'data': 'dat_reference',
+        'id_cliente': 'idt_safepay_creditor',
+        'tpv_dia': 'num_tpv_value',
+        'margem_op_dia': 'num_contribution_margin',
+        'meio_pagamento': 'idt_main_payment_method',
+        'parcelas': 'num_installment_qty',
+    })
+    df['dat_reference'] = df['dat_reference'].dt.strftime('%Y-%m-%d')
+
+    engine = sqlalchemy.create_engine(f"sqlite:///{db_path}")
+    df.to_sql('dax_ent_margin_summary', engine, if_exists='replace', index=False, chunksize=100_000)
+    return len(df)
+
+def peak_rss_mb():
+    """Pico de memória residente do processo atual (em MB)."""
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+def run_mode(db_path, modo, chunksize):
+    """Lê o histórico inteiro em um dos modos e acumula o TPV por cliente."""
+    engine = create_sqlite_engine(db_path)
+    inicio = time.perf_counter()
+
+    if modo == 'completo':
+        with engine.connect() as connection:
+            df = pd.read_sql_query(
+                sqlalchemy.text(QUERY_HISTORICO), connection,
+                params={'dat_start_filter': '2024-01-01'}
+            )
+        total_linhas = len(df)
+        tpv_por_cliente = df.groupby('id_cliente')['tpv_dia'].sum()
+    else:
+        total_linhas = 0
+        tpv_por_cliente = None
+        for df_chunk in iter_historical_data('2024-01-01', chunksize=chunksize, engine=engine):
+            total_linhas += len(df_chunk)
+            parcial = df_chunk.groupby('id_cliente')['tpv_dia'].sum()
+            tpv_por_cliente = parcial if tpv_por_cliente is None else tpv_por_cliente.add(parcial, fill_value=0)
+
+    duracao = time.perf_counter() - inicio
+    print(f"[{modo}] {total_linhas} linhas, {len(tpv_por_cliente)} clientes em {duracao:.2f}s "
+          f"({total_linhas / duracao:,.0f} linhas/s), pico de RSS: {peak_rss_mb():.0f} MB")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_streaming.py
+    parser = argparse.ArgumentParser(description="Benchmark da leitura em streaming do histórico.")
+    parser.add_argument('--clientes', type=int, default=100_000)
+    parser.add_argument('--max-dias', type=int, default=30)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--db', default=os.path.join(PROJECT_ROOT, 'dados', 'bench_historico.sqlite'))
+    parser.add_argument('--modo', choices=['completo', 'streaming'])
+    args = parser.parse_args()
+
+    if args.modo:
+        run_mode(args.db, args.modo, args.chunksize)
+    else:
+        os.makedirs(os.path.dirname(args.db), exist_ok=True)
+        n_linhas = build_sqlite_standin(args.db, args.clientes, args.max_dias)
+        print(f"SQLite de teste criado em {args.db} ({n_linhas} linhas).")
+        for modo in ('completo', 'streaming'):
+            subprocess.run([sys.executable, __file__, '--db', args.db, '--modo', modo,
+                            '--chunksize', str(args.chunksize)], check=True)
@@ -0,0 +1,65 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Adiciona a pasta 'src' ao path para podermos importar os módulos do projeto
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from features.build_features import calculate_trend, calculate_trend_grouped
+from benchmarks.synthetic import make_synthetic_history
+
+# Benchmark da tendência (Cliente Vagalume):
+# 'groupby().apply(calculate_trend)' (um linregress por cliente) vs.
+# 'calculate_trend_grouped' (somas agrupadas, uma única passada).
+
+def run_benchmark(escalas, max_dias=30, max_clientes_apply=100_000):
+    """
+    Compara os dois caminhos de cálculo da tendência em várias escalas.
+
+    Args:
+        escalas (list[int]): Quantidades de clientes a testar.
+        max_dias (int): Máximo de dias de histórico por cliente.
+        max_clientes_apply (int): Acima deste número de clientes o caminho
+                                  com 'apply' é pulado (leva minutos).
+                                  Use 0 para rodar sempre.
+    """
+    for n_clientes in escalas:
+        df = make_synthetic_history(n_clientes, max_dias=max_dias)
+        df = df.sort_values(by=['id_cliente', 'data'])
+        print(f"\n--- {n_clientes} clientes ({len(df)} linhas) ---")
+
+        inicio = time.perf_counter()
+        vetorizado = calculate_trend_grouped(df, 'id_cliente', 'tpv_dia')
+        tempo_vetorizado = time.perf_counter() - inicio
+        print(f"calculate_trend_grouped: {tempo_vetorizado:.3f}s")
+
+        if max_clientes_apply and n_clientes > max_clientes_apply:
+            print("groupby().apply(calculate_trend): pulado (use --max-clientes-apply 0 para rodar)")
+            continue
+
+        inicio = time.perf_counter()
+        original = df.groupby('id_cliente')['tpv_dia'].apply(calculate_trend)
+        tempo_apply = time.perf_counter() - inicio
+        print(f"groupby().apply(calculate_trend): {tempo_apply:.3f}s "
+              f"(speedup: {tempo_apply / tempo_vetorizado:.1f}x)")
+
+        # Confere que os dois caminhos devolvem os mesmos valores
+        diferenca = np.abs(vetorizado.loc[original.index].to_numpy() - original.to_numpy(dtype=float))
+        print(f"Maior diferença absoluta entre os resultados: {diferenca.max():.3e}")
+        assert np.allclose(vetorizado.loc[original.index], original.astype(float), rtol=1e-9, atol=1e-9)
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/bench_trend.py
+    parser = argparse.ArgumentParser(description="Benchmark do cálculo de tendência por cliente.")
+    parser.add_argument('--clientes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--max-dias', type=int, default=30)
+    parser.add_argument('--max-clientes-apply', type=int, default=100_000)
+    args = parser.parse_args()
+
+    run_benchmark(args.clientes, max_dias=args.max_dias, max_clientes_apply=args.max_clientes_apply)
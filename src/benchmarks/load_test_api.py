@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+# Adiciona a pasta 'src' ao path para podermos importar os módulos do projeto
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from benchmarks.synthetic import make_synthetic_history, make_synthetic_metas
+
+# Teste de carga da API de inferência (app/main.py) rodando localmente.
+# Dispara requisições concorrentes com clientes sintéticos e reporta vazão e
+# latência do ponto de vista do cliente, mais as métricas do servidor (/metrics).
+#
+# Ex: gunicorn --preload -w 2 -k gthread --threads 32 -b 127.0.0.1:5000 app.main:app
+#     python src/benchmarks/load_test_api.py --url http://127.0.0.1:5000 --concorrencia 64
+
+def make_payloads(n_clientes, clientes_por_requisicao):
+    import contextlib
+    import io
+    from features.build_features import engineer_features
+
+    df_historico = make_synthetic_history(n_clientes)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_features = engineer_features(df_historico, make_synthetic_metas(df_historico))
+    registros = df_features.reset_index().to_dict(orient='records')
+    return [
+        {"clientes": registros[i:i + clientes_por_requisicao]}
+        for i in range(0, len(registros), clientes_por_requisicao)
+    ]
+
+def run_load_test(url, rota, payloads, n_requisicoes, concorrencia):
+    sessao_local = threading.local()
+    latencias, status = [], []
+
+    def enviar(i):
+        sessao = getattr(sessao_local, 'sessao', None)
+        if sessao is None:
+            sessao = sessao_local.sessao = requests.Session()
+        inicio = time.perf_counter()
+        resposta = sessao.post(f"{url}{rota}", json=payloads[i % len(payloads)])
+        latencias.append(time.perf_counter() - inicio)
+        status.append(resposta.status_code)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(enviar, range(n_requisicoes)))
+    duracao = time.perf_counter() - inicio
+
+    latencias_ms = np.array(latencias) * 1000
+    codigos, contagens = np.unique(status, return_counts=True)
+    print(f"\n--- {rota}: {n_requisicoes} requisições, concorrência {concorrencia} ---")
+    print(f"Vazão: {n_requisicoes / duracao:,.0f} req/s")
+    print(f"Latência p50: {np.percentile(latencias_ms, 50):.1f} ms | p99: {np.percentile(latencias_ms, 99):.1f} ms")
+    print(f"Status HTTP: {dict(zip(codigos.tolist(), contagens.tolist()))}")
+    print(f"Métricas do servidor (um worker): {requests.get(f'{url}/metrics').json()}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Teste de carga da API de inferência.")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--rota', default='/predict/health-score')
+    parser.add_argument('--requisicoes', type=int, default=5_000)
+    parser.add_argument('--concorrencia', type=int, default=32)
+    parser.add_argument('--clientes-por-requisicao', type=int, default=1)
+    args = parser.parse_args()
+
+    payloads = make_payloads(2_000, args.clientes_por_requisicao)
+    run_load_test(args.url, args.rota, payloads, args.requisicoes, args.concorrencia)
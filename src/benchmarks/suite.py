@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from datetime import datetime
+
+import psutil
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from benchmarks.synthetic import read_synthetic_history, write_synthetic_dataset
+
+# Suíte de benchmark ponta a ponta do pipeline sobre o histórico sintético
+# (synthetic.py): para cada escala (clientes x dias), tempo e memória de cada
+# fase - geração, carga, 'engineer_features', 'create_churn_labels', os dois
+# treinos e o scoring em lote. Cada escala roda em um processo separado (o
+# pico de RSS de uma não contamina a outra), com artefatos e modelos em uma
+# pasta temporária (nada em 'dados/processed' nem em 'modelos/' é tocado).
+#
+# Os resultados vão para 'dados/benchmarks/resultados.jsonl' (uma linha por
+# escala e execução, com o commit) e cada execução é comparada com a
+# anterior da mesma escala: fases mais lentas ou com mais memória além da
+# tolerância aparecem como REGRESSÃO.
+
+RESULTADOS_PATH = os.path.join(PROJECT_ROOT, 'dados', 'benchmarks', 'resultados.jsonl')
+ESCALAS_PADRAO = ['10000x180', '50000x180', '200000x180']
+TOLERANCIA_REGRESSAO = 0.2  # +20% de tempo ou de pico de memória
+TEMPO_MINIMO_S = 0.5        # fases mais rápidas que isso não são comparadas (ruído)
+
+class MemorySampler:
+    """
+    Mede uma fase em uma thread de fundo: amostra o RSS do processo a cada
+    'intervalo' segundos e guarda o pico. O pico da fase é relativo a ela
+    (não ao processo todo, como o 'ru_maxrss').
+    """
+
+    def __init__(self, intervalo=0.01):
+        self.intervalo = intervalo
+        self._processo = psutil.Process()
+        self._parar = threading.Event()
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, self._processo.memory_info().rss)
+
+    def __enter__(self):
+        self.inicio_rss = self.pico = self._processo.memory_info().rss
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tempo = time.perf_counter() - self._inicio
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, self._processo.memory_info().rss)
+
+    def resultado(self, **extras):
+        return {
+            'tempo_s': round(self.tempo, 3),
+            'rss_pico_mb': round(self.pico / 1024 ** 2, 1),
+            'rss_delta_mb': round((self.pico - self.inicio_rss) / 1024 ** 2, 1),
+            **extras,
+        }
+
+def run_scale(n_clientes, n_dias, seed=42, n_workers=None):
+    """
+    Roda todas as fases do pipeline em uma escala (no processo atual).
+
+    Returns:
+        dict: Fase -> {tempo_s, rss_pico_mb, rss_delta_mb, ...}.
+    """
+    from data.artifacts import write_artifact
+    from features.build_churn_labels import create_churn_labels
+    from features.build_features import engineer_features
+    from models import predict_model, train_churn_model, train_model
+
+    fases = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        # Artefatos e modelos da execução ficam na pasta temporária
+        train_model.PROCESSED_DATA_PATH = os.path.join(pasta, 'features_clientes.feather')
+        train_model.MODEL_OUTPUT_PATH = os.path.join(pasta, 'modelos')
+        train_model.MODEL_PATH = os.path.join(pasta, 'modelos', 'health_score_classifier.joblib')
+        train_churn_model.PROCESSED_DATA_PATH = os.path.join(pasta, 'features_churn_clientes.feather')
+        train_churn_model.MODEL_OUTPUT_PATH = os.path.join(pasta, 'modelos')
+        train_churn_model.MODEL_PATH = os.path.join(pasta, 'modelos', 'churn_predictor.joblib')
+        predict_model.registry.model_dir = os.path.join(pasta, 'modelos')
+
+        # 1. Geração do histórico sintético (Parquet)
+        with MemorySampler() as medida:
+            dataset = write_synthetic_dataset(os.path.join(pasta, 'sintetico'), n_clientes, n_dias,
+                                              n_workers=n_workers, seed=seed)
+        fases['geracao'] = medida.resultado(linhas=dataset['linhas'],
+                                            linhas_por_s=round(dataset['linhas'] / medida.tempo))
+
+        # 2. Carga (no formato de 'get_historical_data' / 'get_metas_from_redshift')
+        with MemorySampler() as medida:
+            df_historico = read_synthetic_history(dataset['historico'])
+            df_metas = read_synthetic_history(dataset['metas'])
+        fases['carga'] = medida.resultado(linhas=len(df_historico))
+
+        # 3. FASE 2: features por cliente
+        with MemorySampler() as medida:
+            df_features = engineer_features(df_historico, df_metas)
+        fases['engineer_features'] = medida.resultado(clientes=len(df_features))
+        write_artifact(df_features, train_model.PROCESSED_DATA_PATH)
+
+        # 4. FASE 5: labels de churn e tabela de treino
+        with MemorySampler() as medida:
+            df_labels = create_churn_labels(df_historico[['data', 'id_cliente']], days_for_churn=45)
+        fases['create_churn_labels'] = medida.resultado(taxa_churn=round(float(df_labels['is_churn'].mean()), 4))
+        df_churn_treino = df_features.join(df_labels).dropna(subset=['is_churn'])
+        write_artifact(df_churn_treino, train_churn_model.PROCESSED_DATA_PATH)
+        del df_historico, df_labels, df_churn_treino
+
+        # 5. Treinos (FASE 3 e FASE 5)
+        with MemorySampler() as medida:
+            train_model.train_and_save_model(force=True)
+        fases['treino_health_score'] = medida.resultado()
+        with MemorySampler() as medida:
+            train_churn_model.train_and_save_churn_model(force=True)
+        fases['treino_churn'] = medida.resultado()
+
+        # 6. Scoring em lote de toda a carteira (modelos recém-treinados)
+        predict_model.registry.reload()
+        with MemorySampler() as medida:
+            df_scores = predict_model.predict_health_score_batch(df_features)
+            df_churn = predict_model.predict_churn_batch(df_features)
+        if df_scores is None or df_churn is None:
+            raise RuntimeError("Scoring falhou (modelos não carregados).")
+        fases['scoring'] = medida.resultado(clientes_por_s=round(len(df_features) / medida.tempo))
+
+    return fases
+
+def _git_commit():
+    try:
+        saida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                               check=True, capture_output=True, text=True)
+        return saida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_results(path=RESULTADOS_PATH):
+    """Registros já gravados (um por escala e execução), do mais antigo ao mais novo."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as arquivo:
+        return [json.loads(linha) for linha in arquivo if linha.strip()]
+
+def compare_results(atual, anterior, tolerancia=TOLERANCIA_REGRESSAO):
+    """
+    Compara duas execuções da mesma escala, fase a fase.
+
+    Returns:
+        list: Mensagens das regressões (tempo ou pico de memória acima da tolerância).
+    """
+    regressoes = []
+    for fase, medida in atual['fases'].items():
+        base = anterior['fases'].get(fase)
+        if base is None:
+            continue
+        if medida['tempo_s'] >= TEMPO_MINIMO_S and medida['tempo_s'] > base['tempo_s'] * (1 + tolerancia):
+            regressoes.append(f"{fase}: tempo {base['tempo_s']:.2f}s -> {medida['tempo_s']:.2f}s")
+        if medida['rss_pico_mb'] > base['rss_pico_mb'] * (1 + tolerancia):
+            regressoes.append(f"{fase}: pico de RSS {base['rss_pico_mb']:.0f} MB -> {medida['rss_pico_mb']:.0f} MB")
+    return regressoes
+
+def run_suite(escalas, seed=42, n_workers=None, path=RESULTADOS_PATH):
+    historico = load_results(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    commit = _git_commit()
+
+    for escala in escalas:
+        n_clientes, n_dias = (int(valor) for valor in escala.split('x'))
+        comando = [sys.executable, __file__, '--filho', escala, '--seed', str(seed)]
+        if n_workers:
+            comando += ['--workers', str(n_workers)]
+        saida = subprocess.run(comando, capture_output=True, text=True)
+        if saida.returncode != 0:
+            print(f"Erro na escala {escala}:\n{saida.stderr[-2000:]}")
+            continue
+
+        registro = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'clientes': n_clientes,
+            'dias': n_dias,
+            'seed': seed,
+            'fases': json.loads(saida.stdout.strip().splitlines()[-1]),
+        }
+        with open(path, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps(registro) + '\n')
+
+        print(f"\n=== {n_clientes} clientes x {n_dias} dias ===")
+        for fase, medida in registro['fases'].items():
+            extras = ', '.join(f"{chave}={valor}" for chave, valor in medida.items()
+                               if chave not in ('tempo_s', 'rss_pico_mb', 'rss_delta_mb'))
+            print(f"{fase:<22} {medida['tempo_s']:>8.2f}s | pico {medida['rss_pico_mb']:>7.0f} MB "
+                  f"(+{medida['rss_delta_mb']:.0f}) | {extras}")
+
+        anteriores = [r for r in historico if (r['clientes'], r['dias'], r.get('seed')) == (n_clientes, n_dias, seed)]
+        if not anteriores:
+            print("Sem execução anterior desta escala para comparar.")
+            continue
+        regressoes = compare_results(registro, anteriores[-1])
+        referencia = f"{anteriores[-1]['timestamp']}, commit {anteriores[-1]['commit']}"
+        if regressoes:
+            print(f"REGRESSÃO em relação a {referencia}:")
+            for mensagem in regressoes:
+                print(f"  - {mensagem}")
+        else:
+            print(f"Sem regressões em relação a {referencia} (tolerância: {TOLERANCIA_REGRESSAO:.0%}).")
+
+if __name__ == '__main__':
+    # Rode com: python src/benchmarks/suite.py --escalas 10000x180 50000x180 200000x365
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta do pipeline em várias escalas.")
+    parser.add_argument('--escalas', nargs='+', default=ESCALAS_PADRAO, help="Escalas no formato CLIENTESxDIAS.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None, help="Threads da geração (default: núcleos).")
+    parser.add_argument('--resultados', default=RESULTADOS_PATH)
+    parser.add_argument('--filho', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    if args.filho:
+        # Processo filho: imprime as medidas em JSON na última linha
+        n_clientes, n_dias = (int(valor) for valor in args.filho.split('x'))
+        print(json.dumps(run_scale(n_clientes, n_dias, args.seed, args.workers)))
+    else:
+        run_suite(args.escalas, args.seed, args.workers, args.resultados)
@@ -0,0 +1,382 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Gerador de histórico sintético no formato da FASE 1 (make_dataset.py).
+# Como o Redshift não é acessível fora do ambiente do hacka, os benchmarks
+# usam estes dados para medir o pipeline em escalas maiores.
+
+MEIOS_PAGAMENTO = np.array(['CREDIT', 'DEBIT', 'PIX', 'BOLETO'])
+
+def make_synthetic_history(n_clientes, max_dias=30, data_inicio='2024-01-01', seed=42):
+    """
+    Gera um histórico sintético (várias linhas por cliente) com as mesmas
+    colunas de 'get_historical_data'.
+
+    Cada cliente recebe entre 1 e 'max_dias' dias consecutivos de transações,
+    então o resultado inclui casos de borda como clientes com 1 único ponto.
+
+    Args:
+        n_clientes (int): Quantidade de clientes.
+        max_dias (int): Máximo de dias de histórico por cliente.
+        data_inicio (str): Primeira data do histórico (YYYY-MM-DD).
+        seed (int): Semente do gerador aleatório.
+
+    Returns:
+        pd.DataFrame: [data, id_cliente, tpv_dia, margem_op_dia, meio_pagamento, parcelas]
+    """
+    rng = np.random.default_rng(seed)
+
+    dias_por_cliente = rng.integers(1, max_dias + 1, size=n_clientes)
+    n_linhas = int(dias_por_cliente.sum())
+
+    cliente = np.repeat(np.arange(n_clientes), dias_por_cliente)
+    inicio_cliente = np.concatenate(([0], np.cumsum(dias_por_cliente)[:-1]))
+    dia = np.arange(n_linhas) - np.repeat(inicio_cliente, dias_por_cliente)
+
+    # TPV com nível e tendência próprios de cada cliente
+    nivel = rng.lognormal(mean=9, sigma=1, size=n_clientes)
+    tendencia = rng.normal(0, 0.02, size=n_clientes) * nivel
+    tpv = nivel[cliente] + tendencia[cliente] * dia + rng.normal(0, 0.1, n_linhas) * nivel[cliente]
+    tpv = np.clip(tpv, 0, None).round(2)
+
+    return pd.DataFrame({
+        'data': pd.Timestamp(data_inicio) + pd.to_timedelta(dia, unit='D'),
+        'id_cliente': np.char.add('CLI', cliente.astype(str)),
+        'tpv_dia': tpv,
+        'margem_op_dia': (tpv * rng.uniform(0.005, 0.05, n_linhas)).round(2),
+        'meio_pagamento': MEIOS_PAGAMENTO[rng.integers(0, len(MEIOS_PAGAMENTO), n_linhas)],
+        'parcelas': rng.integers(1, 13, n_linhas),
+    })
+
+def make_synthetic_series(n_series, n_dias=180, data_inicio='2024-01-01', seed=42):
+    """
+    Gera séries diárias de TPV (uma coluna por cliente) com nível próprio,
+    sazonalidade semanal e ruído autocorrelacionado, no formato de
+    'build_indicator_series' (sarimax_engine.py).
+
+    Returns:
+        pd.DataFrame: Índice diário e colunas 'cliente:CLI{n}:tpv'.
+    """
+    rng = np.random.default_rng(seed)
+
+    nivel = rng.lognormal(mean=9, sigma=1, size=n_series)
+    amplitude = rng.uniform(0.05, 0.3, size=n_series) * nivel
+    fase = rng.integers(0, 7, size=n_series)
+    dia = np.arange(n_dias)[:, np.newaxis]
+
+    # Ruído AR(1) por série
+    choques = rng.normal(0, 0.05, size=(n_dias, n_series)) * nivel
+    ruido = np.empty_like(choques)
+    ruido[0] = choques[0]
+    for t in range(1, n_dias):
+        ruido[t] = 0.6 * ruido[t - 1] + choques[t]
+
+    tpv = nivel + amplitude * np.sin(2 * np.pi * (dia + fase) / 7) + ruido
+    return pd.DataFrame(
+        np.clip(tpv, 0, None).round(2),
+        index=pd.date_range(data_inicio, periods=n_dias, freq='D', name='data'),
+        columns=[f'cliente:CLI{i}:tpv' for i in range(n_series)],
+    )
+
+def make_synthetic_metas(df_historico, seed=42):
+    """
+    Gera metas de TPV ('tpv_meta') por cliente em torno do TPV realizado,
+    para que todas as classes de atingimento apareçam.
+
+    Returns:
+        pd.DataFrame: 'id_cliente' como índice e a coluna 'tpv_meta'.
+    """
+    rng = np.random.default_rng(seed)
+    tpv_total = df_historico.groupby('id_cliente')['tpv_dia'].sum()
+    # atingimento entre ~5% e ~150% da meta
+    fator = rng.uniform(0.05, 1.5, size=len(tpv_total))
+    return (tpv_total / fator).round(2).to_frame('tpv_meta')
+
+def train_synthetic_health_model(n_clientes=20_000, seed=42):
+    """
+    Treina o classificador de Health Score (mesmos parâmetros da FASE 3) sobre
+    features sintéticas, para benchmarks que precisam de um modelo em memória.
+
+    Returns:
+        tuple: (model, encoder, df_features)
+    """
+    import contextlib
+    import io
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import LabelEncoder
+    from features.build_features import engineer_features
+    from models.train_model import apply_classification_rules
+
+    df_historico = make_synthetic_history(n_clientes, seed=seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_features = engineer_features(df_historico, make_synthetic_metas(df_historico, seed))
+    df_features = apply_classification_rules(df_features)
+
+    features_list = [
+        'atingimento_meta_tpv', 'margem_op_media', 'tendencia_tpv', 'volatilidade_tpv'
+    ] + [col for col in df_features.columns if 'mix_pct_' in col]
+
+    encoder = LabelEncoder()
+    y = encoder.fit_transform(df_features['Classificacao'])
+    model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10, n_jobs=-1)
+    model.fit(df_features[features_list], y)
+    return model, encoder, df_features.drop(columns='Classificacao')
+
+def make_synthetic_churn_features(n_clientes, seed=42):
+    """
+    Gera a tabela de treino do churn (features + 'is_churn', como
+    'features_churn_clientes' do notebook 04) direto por cliente, sem
+    passar pelo histórico diário: serve para benchmarks com milhões de clientes.
+
+    O churn é mais provável para clientes com tendência negativa, TPV baixo e
+    alta volatilidade (~15% de churn no total).
+
+    Returns:
+        pd.DataFrame: 'id_cliente' como índice, as colunas de 'engineer_features'
+                      e 'is_churn' (0 ou 1).
+    """
+    rng = np.random.default_rng(seed)
+
+    tpv_total = rng.lognormal(mean=12, sigma=1.2, size=n_clientes)
+    margem_media = rng.uniform(0.005, 0.05, n_clientes) * tpv_total / 30
+    volatilidade = rng.uniform(0.05, 0.6, n_clientes) * tpv_total / 30
+    tendencia = rng.normal(0, 0.02, n_clientes) * tpv_total / 30
+    mix = rng.dirichlet(np.ones(len(MEIOS_PAGAMENTO)), size=n_clientes)
+    tpv_meta = tpv_total / rng.uniform(0.05, 1.5, n_clientes)
+
+    # Log-odds do churn a partir das features (com ruído)
+    log_odds = (
+        -2.2
+        - 40 * tendencia / (tpv_total / 30)
+        - 0.6 * (np.log(tpv_total) - 12)
+        + 3 * (volatilidade / (tpv_total / 30) - 0.3)
+        + rng.normal(0, 0.8, n_clientes)
+    )
+    is_churn = (rng.random(n_clientes) < 1 / (1 + np.exp(-log_odds))).astype(np.int8)
+
+    df = pd.DataFrame({
+        'tpv_total': tpv_total.round(2),
+        'margem_op_media': margem_media.round(2),
+        'margem_op_total': (margem_media * 30).round(2),
+        'volatilidade_tpv': volatilidade.round(2),
+        'tendencia_tpv': tendencia.round(4),
+    }, index=pd.Index(np.char.add('CLI', np.arange(n_clientes).astype(str)), name='id_cliente'))
+    for i, meio in enumerate(MEIOS_PAGAMENTO):
+        df[f'mix_pct_{meio}'] = mix[:, i].round(4)
+    df['tpv_meta'] = tpv_meta.round(2)
+    df['atingimento_meta_tpv'] = (tpv_total / tpv_meta).round(4)
+    df['is_churn'] = is_churn
+    return df
+
+# --- Gerador em escala (ent_margin_summary + tpv_target_client) em Parquet ---
+#
+# Diferente de 'make_synthetic_history', gera o histórico com o formato e os
+# padrões da tabela real, em blocos de clientes (a memória não depende do
+# tamanho da carteira) e direto para Parquet:
+#
+# - clientes entram ao longo do período (70% já existem no primeiro dia);
+# - cada cliente transaciona em ~80% dos dias (dias sem linha, como na tabela);
+# - sazonalidade semanal (sexta forte, domingo fraco) e de início de mês;
+# - mix de meios de pagamento próprio de cada cliente, em torno de 'mix_meios';
+# - parcelas só no crédito; margem = TPV x take rate do meio;
+# - churners: o TPV cai nos 30 dias anteriores ao churn e as linhas param.
+#
+# Tudo é feito em matrizes densas cliente x dia por bloco (sem loops em
+# Python por cliente ou por dia); só as células com transação viram linhas.
+
+MIX_MEIOS_PADRAO = {'CREDIT': 0.45, 'DEBIT': 0.25, 'PIX': 0.25, 'BOLETO': 0.05}
+TAKE_RATE_MEIOS = {'CREDIT': 0.025, 'DEBIT': 0.012, 'PIX': 0.005, 'BOLETO': 0.010}
+FATOR_DIA_SEMANA = np.array([1.0, 0.95, 1.0, 1.05, 1.25, 0.85, 0.55])  # segunda..domingo
+CELULAS_POR_BLOCO = 4_000_000
+
+def _ids_clientes(codigos):
+    return np.char.add('CLI', codigos.astype(str))
+
+def _synthetic_block(c0, n_bloco, n_dias, data_inicio, mix_meios, sazonalidade, taxa_churn, seed):
+    """Um bloco de clientes (c0 .. c0 + n_bloco - 1) de 'iter_synthetic_transactions'."""
+    import pyarrow as pa
+
+    mix_meios = dict(mix_meios or MIX_MEIOS_PADRAO)
+    meios = np.array(list(mix_meios))
+    mix_base = np.array(list(mix_meios.values()), dtype=np.float64)
+    mix_base = mix_base / mix_base.sum()
+    take_rate = np.array([TAKE_RATE_MEIOS.get(meio, 0.01) for meio in meios])
+    credito = int(np.flatnonzero(meios == 'CREDIT')[0]) if 'CREDIT' in mix_meios else -1
+    dicionario_meios = pa.array(meios)
+
+    # Fatores do dia (iguais para todos os clientes)
+    dia_inicial = np.datetime64(data_inicio, 'D').astype(np.int64)
+    dias = np.arange(n_dias)
+    dia_semana = (dia_inicial + dias + 3) % 7  # 1970-01-01 foi uma quinta
+    dia_mes = pd.DatetimeIndex(pd.Timestamp(data_inicio) + pd.to_timedelta(dias, unit='D')).day.to_numpy()
+    fator_dia = 1 + sazonalidade * ((FATOR_DIA_SEMANA[dia_semana] - 1) + 0.15 * (dia_mes <= 5))
+    fator_dia = fator_dia.astype(np.float32)
+
+    rng = np.random.default_rng([seed, c0])
+
+    # 1. Parâmetros de cada cliente
+    nivel = rng.lognormal(9, 1, n_bloco).astype(np.float32)
+    tendencia = rng.normal(0, 0.5 / n_dias, n_bloco).astype(np.float32)  # variação relativa por dia
+    entrada = np.where(rng.random(n_bloco) < 0.7, 0, rng.integers(0, n_dias, n_bloco))
+    # Dia do churn: pelo menos 14 dias depois da entrada (depois do fim = não churnou)
+    dia_churn = entrada + 14 + (rng.random(n_bloco) * (n_dias - entrada - 14).clip(0)).astype(np.int64)
+    churn = np.where(rng.random(n_bloco) < taxa_churn, dia_churn, n_dias + 30)
+    p_ativo = rng.beta(8, 2, n_bloco).astype(np.float32)
+    mix_acumulado = np.cumsum(rng.dirichlet(mix_base * 20, n_bloco), axis=1).astype(np.float32)
+    fator_margem = rng.uniform(0.7, 1.3, n_bloco).astype(np.float32)
+
+    # 2. Matriz cliente x dia: quais células têm transação
+    ativo = rng.random((n_bloco, n_dias), dtype=np.float32) < p_ativo[:, None]
+    ativo &= (dias >= entrada[:, None]) & (dias < churn[:, None])
+    linhas_cliente = ativo.sum(axis=1)
+    linha_cliente = np.repeat(np.arange(n_bloco, dtype=np.int32), linhas_cliente)  # ordem (cliente, dia)
+    linha_dia = np.flatnonzero(ativo) - linha_cliente.astype(np.int64) * n_dias
+    n_linhas = len(linha_cliente)
+
+    def por_linha(valores):
+        # Valor do cliente em cada linha (as linhas estão agrupadas por cliente)
+        return np.repeat(valores, linhas_cliente)
+
+    # 3. Valores só das células ativas (ruído multiplicativo de até ±50%)
+    t = linha_dia.astype(np.float32)
+    queda = np.clip((por_linha(churn) - linha_dia) / np.float32(30), 0.3, 1.0, dtype=np.float32)
+    tpv = por_linha(nivel) * (1 + por_linha(tendencia) * t).clip(0.05) * fator_dia[linha_dia] * queda
+    tpv *= 1 + np.float32(0.5) * (rng.random(n_linhas, dtype=np.float32) - rng.random(n_linhas, dtype=np.float32))
+
+    # Meio do dia: sorteio contra o mix acumulado do cliente
+    sorteio = rng.random(n_linhas, dtype=np.float32)
+    meio = np.zeros(n_linhas, dtype=np.int8)
+    for i in range(len(meios) - 1):
+        meio += sorteio > por_linha(mix_acumulado[:, i])
+    parcelas = np.ones(n_linhas, dtype=np.int32)
+    if credito >= 0:
+        no_credito = meio == credito
+        parcelas[no_credito] = np.minimum(rng.geometric(0.35, no_credito.sum()), 12)
+
+    tpv = np.round(tpv.astype(np.float64), 2)
+    margem = np.round(tpv * (take_rate[meio] * por_linha(fator_margem)), 2)
+
+    return pa.table({
+        'data': pa.array((dia_inicial + linha_dia).astype(np.int32), type=pa.date32()),
+        'id_cliente': pa.DictionaryArray.from_arrays(linha_cliente, _ids_clientes(np.arange(c0, c0 + n_bloco))),
+        'tpv_dia': tpv,
+        'margem_op_dia': margem,
+        'meio_pagamento': pa.DictionaryArray.from_arrays(meio, dicionario_meios),
+        'parcelas': parcelas,
+    })
+
+def iter_synthetic_transactions(n_clientes, n_dias=365, data_inicio='2024-01-01', mix_meios=None,
+                                sazonalidade=1.0, taxa_churn=0.1, seed=42):
+    """
+    Gera o histórico no formato de 'dax_ent_margin_summary' em blocos de clientes.
+
+    Args:
+        n_clientes (int): Quantidade de clientes ('CLI0', 'CLI1', ...).
+        n_dias (int): Dias do período.
+        data_inicio (str): Primeiro dia (YYYY-MM-DD).
+        mix_meios (dict, opcional): Participação média de cada meio (default: MIX_MEIOS_PADRAO).
+        sazonalidade (float): Intensidade da sazonalidade (0 = sem sazonalidade).
+        taxa_churn (float): Fração dos clientes que param de transacionar no período.
+        seed (int): Semente do gerador aleatório (cada bloco tem a sua, derivada dela).
+
+    Yields:
+        pa.Table: [data (date32), id_cliente, tpv_dia, margem_op_dia,
+                   meio_pagamento, parcelas (int32)] na ordem (id_cliente, data).
+                   'id_cliente' e 'meio_pagamento' vêm com dicionário (Arrow).
+    """
+    clientes_por_bloco = max(1, CELULAS_POR_BLOCO // n_dias)
+    for c0 in range(0, n_clientes, clientes_por_bloco):
+        yield _synthetic_block(c0, min(clientes_por_bloco, n_clientes - c0), n_dias, data_inicio,
+                               mix_meios, sazonalidade, taxa_churn, seed)
+
+def make_synthetic_targets(n_clientes, n_dias=365, seed=42):
+    """
+    Metas no formato de 'tpv_target_client' (uma por cliente), em torno do
+    TPV esperado do cliente no período, para todas as classes de
+    atingimento aparecerem. Usa os mesmos níveis de 'iter_synthetic_transactions'.
+
+    Returns:
+        pd.DataFrame: 'id_cliente' como índice e a coluna 'tpv_meta'.
+    """
+    clientes_por_bloco = max(1, CELULAS_POR_BLOCO // n_dias)
+    metas = []
+    for c0 in range(0, n_clientes, clientes_por_bloco):
+        n_bloco = min(clientes_por_bloco, n_clientes - c0)
+        nivel = np.random.default_rng([seed, c0]).lognormal(9, 1, n_bloco)
+        fator = np.random.default_rng([seed, c0, 1]).uniform(0.5, 2.5, n_bloco)
+        metas.append(nivel * n_dias * 0.8 * fator)
+    return pd.DataFrame(
+        {'tpv_meta': np.round(np.concatenate(metas), 2)},
+        index=pd.Index(_ids_clientes(np.arange(n_clientes)), name='id_cliente'),
+    )
+
+def write_synthetic_dataset(pasta, n_clientes, n_dias=365, n_workers=None, compression='snappy', **parametros):
+    """
+    Grava o histórico (ver 'iter_synthetic_transactions') em 'pasta/historico/'
+    (um Parquet por bloco de clientes) e 'metas.parquet' (ver
+    'make_synthetic_targets'). Os blocos são gerados e gravados em paralelo:
+    NumPy e Arrow liberam o GIL, então as threads escalam com os núcleos.
+
+    Args:
+        pasta (str): Pasta de saída.
+        n_clientes (int): Quantidade de clientes.
+        n_dias (int): Dias do período.
+        n_workers (int, opcional): Threads de geração (default: núcleos da máquina).
+        compression (str): Compressão do Parquet ('snappy', 'zstd', 'none', ...).
+        **parametros: Demais parâmetros de 'iter_synthetic_transactions'.
+
+    Returns:
+        dict: Caminhos, linhas, tempo e linhas por segundo da geração.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    import pyarrow.parquet as pq
+
+    paths = {'historico': os.path.join(pasta, 'historico'), 'metas': os.path.join(pasta, 'metas.parquet')}
+    os.makedirs(paths['historico'], exist_ok=True)
+    for nome in os.listdir(paths['historico']):
+        if nome.startswith('part-'):
+            os.remove(os.path.join(paths['historico'], nome))
+
+    clientes_por_bloco = max(1, CELULAS_POR_BLOCO // n_dias)
+    argumentos = {
+        'n_dias': n_dias,
+        'data_inicio': parametros.get('data_inicio', '2024-01-01'),
+        'mix_meios': parametros.get('mix_meios'),
+        'sazonalidade': parametros.get('sazonalidade', 1.0),
+        'taxa_churn': parametros.get('taxa_churn', 0.1),
+        'seed': parametros.get('seed', 42),
+    }
+
+    def gravar_bloco(c0):
+        tabela = _synthetic_block(c0, min(clientes_por_bloco, n_clientes - c0), **argumentos)
+        pq.write_table(tabela, os.path.join(paths['historico'], f'part-{c0 // clientes_por_bloco:05d}.parquet'),
+                       compression=compression, use_dictionary=['id_cliente', 'meio_pagamento'])
+        return tabela.num_rows
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_workers or os.cpu_count() or 1) as executor:
+        n_linhas = sum(executor.map(gravar_bloco, range(0, n_clientes, clientes_por_bloco)))
+    make_synthetic_targets(n_clientes, n_dias, argumentos['seed']).to_parquet(paths['metas'])
+    duracao = time.perf_counter() - inicio
+
+    return {**paths, 'linhas': n_linhas, 'tempo_s': round(duracao, 2),
+            'linhas_por_s': round(n_linhas / duracao) if duracao else None}
+
+def read_synthetic_history(path, columns=None):
+    """
+    Lê o histórico de 'write_synthetic_dataset' (a pasta ou um Parquet dela) no
+    formato de 'get_historical_data' (datas datetime64 e ids/meios como texto,
+    como vêm do Redshift).
+    """
+    import pyarrow.parquet as pq
+
+    df = pq.read_table(path, columns=columns).to_pandas(date_as_object=False)
+    if 'data' in df.columns:
+        df['data'] = df['data'].astype('datetime64[ns]')
+    for coluna in ('id_cliente', 'meio_pagamento'):
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype(str)
+    return df
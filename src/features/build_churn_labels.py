@@ -1,15 +1,106 @@
+import numpy as np
 import pandas as pd
 import os
 import sys
 
-# Adiciona a raiz do projeto ao path para podermos importar 'make_dataset'
+# Adiciona a raiz do projeto ao path para podermos importar 'history_cache' e 'instrumentation'
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
-if SRC_PATH not in sys.path:
-    sys.path.append(SRC_PATH)
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
 
-from data.make_dataset import get_historical_data
+from data.history_cache import get_cached_historical_data
+from data.instrumentation import instrumented
 
+# Janelas de churn (dias sem transação) usadas nos conjuntos de treino
+JANELAS_CHURN = (30, 45, 60, 90)
+
+def _dias(datas):
+    """Datas -> número do dia (int64, dias desde 1970-01-01) e máscara das válidas, sem alterar a entrada."""
+    dias = pd.to_datetime(pd.Series(datas)).to_numpy('datetime64[D]')
+    return dias.astype(np.int64), ~np.isnat(dias)
+
+@instrumented('churn_labels_grid')
+def create_churn_labels_grid(df_historico, snapshots, janelas=JANELAS_CHURN):
+    """
+    Labels de churn "point-in-time" para uma grade de datas de corte
+    (snapshots) e várias janelas, de uma vez.
+
+    Em cada snapshot vale a regra de 'create_churn_labels', usando só o que
+    já tinha acontecido até ali: o cliente é churn na janela 'w' se a última
+    transação até o snapshot (inclusive) foi há mais de 'w' dias. Clientes
+    sem nenhuma transação até o snapshot ainda não existiam e ficam de fora.
+
+    Os pares (cliente, dia) viram chaves int64 ordenadas
+    (cliente * span + dia); a última transação de todos os clientes em todos
+    os snapshots sai de um único 'np.searchsorted' sobre essas chaves, sem
+    um groupby por snapshot.
+
+    Args:
+        df_historico (pd.DataFrame): Histórico da FASE 1 (precisa de 'data' e 'id_cliente').
+        snapshots (list-like): Datas de corte.
+        janelas (tuple): Janelas de churn em dias.
+
+    Returns:
+        pd.DataFrame: Tabela longa, uma linha por (cliente, snapshot, janela):
+                      [id_cliente (categórico), data_snapshot, janela_dias,
+                       ultima_transacao, dias_desde_ultima_transacao, is_churn (0 ou 1)]
+    """
+    if 'data' not in df_historico.columns or 'id_cliente' not in df_historico.columns:
+        print("Erro: df_historico deve conter 'data' e 'id_cliente'.")
+        return None
+
+    # 1. Datas como números de dia e clientes como códigos (ordem alfabética).
+    #    Linhas sem data ou sem cliente (e snapshots nulos) ficam de fora: o
+    #    NaT viraria o menor int64 e estouraria 'base' e 'span'
+    dias, validas = _dias(df_historico['data'])
+    codigos, clientes = pd.factorize(df_historico['id_cliente'], sort=True)
+    validas &= codigos >= 0
+    dias, codigos = dias[validas], codigos[validas]
+    dias_snapshot, snapshots_validos = _dias(snapshots)
+    dias_snapshot = np.unique(dias_snapshot[snapshots_validos])
+    janelas = np.asarray(janelas, dtype=np.int64)
+    base, span = 0, 1  # sem datas válidas: nenhuma consulta encontra chave
+    if len(dias) and len(dias_snapshot):
+        base = min(dias.min(), dias_snapshot.min())
+        span = max(dias.max(), dias_snapshot.max()) - base + 1
+
+    # 2. Chaves (cliente, dia) ordenadas (repetidas não atrapalham a busca)
+    chaves = np.sort(codigos.astype(np.int64) * span + (dias - base))
+
+    # 3. Uma consulta por (cliente, snapshot), já em ordem: a posição da
+    #    última chave <= consulta é a última transação até o snapshot
+    n_clientes, n_snapshots = len(clientes), len(dias_snapshot)
+    consultas = (np.arange(n_clientes, dtype=np.int64)[:, np.newaxis] * span
+                 + (dias_snapshot - base)[np.newaxis, :]).ravel()
+    posicoes = np.searchsorted(chaves, consultas, side='right') - 1
+
+    # A chave encontrada precisa ser do mesmo cliente (senão ele ainda não
+    # tinha transações até o snapshot)
+    cliente = np.repeat(np.arange(n_clientes), n_snapshots)
+    validos = posicoes >= 0
+    validos[validos] = chaves[posicoes[validos]] // span == cliente[validos]
+
+    cliente = cliente[validos]
+    dia_snapshot = np.tile(dias_snapshot, n_clientes)[validos]
+    ultima = chaves[posicoes[validos]] % span + base
+    dias_desde = dia_snapshot - ultima
+
+    # 4. Uma linha por janela
+    n_janelas = len(janelas)
+    janela = np.tile(janelas, len(cliente))
+    dias_desde = np.repeat(dias_desde, n_janelas)
+    return pd.DataFrame({
+        'id_cliente': pd.Categorical.from_codes(np.repeat(cliente, n_janelas), categories=clientes),
+        'data_snapshot': np.repeat(dia_snapshot, n_janelas).astype('datetime64[D]').astype('datetime64[ns]'),
+        'janela_dias': janela,
+        'ultima_transacao': np.repeat(ultima, n_janelas).astype('datetime64[D]').astype('datetime64[ns]'),
+        'dias_desde_ultima_transacao': dias_desde,
+        'is_churn': (dias_desde > janela).astype(np.int8),
+    })
+
+@instrumented('create_churn_labels')
 def create_churn_labels(df_historico, days_for_churn=45):
     """
     Define o "label" de churn (1 ou 0) para cada cliente.
@@ -32,26 +123,17 @@ def create_churn_labels(df_historico, days_for_churn=45):
         print("Erro: df_historico deve conter 'data' e 'id_cliente'.")
         return None
         
-    # 1. Converter 'data' para datetime (crucial)
-    df_historico['data'] = pd.to_datetime(df_historico['data'])
-
-    # 2. Encontrar a data mais recente EM TODO o dataset
-    data_mais_recente_global = df_historico['data'].max()
+    # 1. Encontrar a data mais recente EM TODO o dataset
+    # (sem converter 'data' no próprio df_historico)
+    data_mais_recente_global = pd.to_datetime(df_historico['data']).max()
     print(f"Data mais recente no dataset: {data_mais_recente_global.date()}")
 
-    # 3. Encontrar a última data de transação PARA CADA cliente
-    df_ultima_transacao = df_historico.groupby('id_cliente')['data'].max().to_frame('ultima_transacao')
-
-    # 4. Calcular há quantos dias foi a última transação
-    df_ultima_transacao['dias_desde_ultima_transacao'] = (
-        data_mais_recente_global - df_ultima_transacao['ultima_transacao']
-    ).dt.days
-
-    # 5. Aplicar a Regra de Churn
+    # 2. É a grade com um único snapshot (a data mais recente) e uma janela:
+    # a última transação de cada cliente é a última até essa data
     # Se 'dias_desde_ultima_transacao' > 45, então 'is_churn' = 1
-    df_ultima_transacao['is_churn'] = (
-        df_ultima_transacao['dias_desde_ultima_transacao'] > days_for_churn
-    ).astype(int)
+    df_labels = create_churn_labels_grid(df_historico, [data_mais_recente_global], janelas=(days_for_churn,))
+    df_ultima_transacao = df_labels.set_index(df_labels['id_cliente'].astype(object).rename('id_cliente'))
+    df_ultima_transacao['is_churn'] = df_ultima_transacao['is_churn'].astype(int)
     
     print("Labels de churn definidos.")
     
@@ -63,8 +145,8 @@ if __name__ == '__main__':
     
     print("--- Testando módulo build_churn_labels ---")
     
-    # 1. Busca os dados brutos
-    df_raw = get_historical_data(dat_start_filter='2024-01-01') # Use um período longo
+    # 1. Busca os dados brutos (do cache local, só as datas novas vêm do Redshift)
+    df_raw = get_cached_historical_data(dat_start_filter='2024-01-01', columns=['data', 'id_cliente']) # Use um período longo
     
     if df_raw is not None and not df_raw.empty:
         # 2. Gera os labels
@@ -75,5 +157,11 @@ if __name__ == '__main__':
             print(df_labels.head())
             print("\nDistribuição de Churn:")
             print(df_labels['is_churn'].value_counts(normalize=True))
+
+        # 3. Labels em uma grade de snapshots (semanal) e várias janelas
+        snapshots = pd.date_range(df_raw['data'].min(), df_raw['data'].max(), freq='7D')
+        df_grade = create_churn_labels_grid(df_raw, snapshots)
+        print(f"\nGrade: {len(snapshots)} snapshots x {len(JANELAS_CHURN)} janelas -> {len(df_grade)} linhas")
+        print(df_grade.groupby(['data_snapshot', 'janela_dias'])['is_churn'].mean().unstack().tail())
     else:
         print("Falha ao carregar dados históricos para o teste.")
\ No newline at end of file
@@ -1,7 +1,17 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 from scipy.stats import linregress
 
+# Adiciona a raiz do projeto ao path para podermos importar 'data.instrumentation'
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from data.instrumentation import instrumented, span
+
 def calculate_trend(series):
     """
     Calcula a inclinação (tendência) de uma série temporal.
@@ -22,32 +32,340 @@ def calculate_trend(series):
     # Retorna 0 se a inclinação for NaN (acontece com dados constantes)
     return slope if not np.isnan(slope) else 0
 
-def engineer_features(df_historico, df_metas=None):
+def _grouped_slope(codes, y, n_grupos):
     """
-    Transforma o DataFrame histórico (várias linhas por cliente)
-    em um DataFrame de features (uma linha por cliente).
-    
+    Inclinação OLS de cada grupo a partir dos códigos de grupo (0..n_grupos-1)
+    e dos valores 'y', que devem estar em ordem temporal dentro de cada grupo.
+    """
+    # 1. Tamanho de cada grupo e posição (x) de cada linha dentro dele
+    n = np.bincount(codes, minlength=n_grupos)
+    ordem = np.argsort(codes, kind='stable')
+    inicio_grupo = np.concatenate(([0], np.cumsum(n)[:-1]))
+    x = np.empty(len(codes), dtype=np.float64)
+    x[ordem] = np.arange(len(codes)) - inicio_grupo[codes[ordem]]
+
+    # 2. Somas agrupadas: Σx e Σy viram as médias, Σ(dx²) e Σ(dx*dy) o OLS
+    n_float = n.astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_media = np.bincount(codes, weights=x, minlength=n_grupos) / n_float
+        y_media = np.bincount(codes, weights=y, minlength=n_grupos) / n_float
+        dx = x - x_media[codes]
+        dy = y - y_media[codes]
+        sxx = np.bincount(codes, weights=dx * dx, minlength=n_grupos)
+        sxy = np.bincount(codes, weights=dx * dy, minlength=n_grupos)
+        slope = sxy / sxx
+
+    # 3. Mesmo fallback de 'calculate_trend' (1 ponto, NaN, etc.)
+    slope[(n < 2) | np.isnan(slope)] = 0.0
+    return slope
+
+def calculate_trend_grouped(df, group_col='id_cliente', value_col='tpv_dia'):
+    """
+    Versão vetorizada de 'calculate_trend': calcula a inclinação de TODOS os
+    grupos (clientes) de uma só vez, sem chamar 'linregress' cliente a cliente.
+
+    Usa a fórmula fechada do OLS sobre somas agrupadas (Σx, Σy, Σxy, Σx²),
+    onde x é a posição da linha dentro do seu grupo (0, 1, 2, ...). As somas
+    são feitas já centradas na média do grupo, como o 'np.cov' do linregress,
+    para não perder precisão com valores de TPV grandes.
+
+    Mantém as mesmas regras de 'calculate_trend': grupos com 1 ponto, séries
+    constantes ou com NaN retornam 0.
+
+    Args:
+        df (pd.DataFrame): Histórico JÁ ORDENADO por [group_col, data].
+        group_col (str): Coluna que identifica o grupo (cliente).
+        value_col (str): Coluna com os valores da série.
+
+    Returns:
+        pd.Series: Inclinação por grupo, com 'group_col' como índice.
+    """
+    codes, uniques = pd.factorize(df[group_col], sort=True)
+    y = df[value_col].to_numpy(dtype=np.float64)
+    slope = _grouped_slope(codes, y, len(uniques))
+
+    return pd.Series(slope, index=pd.Index(uniques, name=group_col), name=value_col)
+
+def _grouped_sum_count(codes, valores, n_grupos):
+    """Soma e contagem por grupo ignorando NaN (como o groupby do pandas)."""
+    validos = ~np.isnan(valores)
+    soma = np.bincount(codes, weights=np.where(validos, valores, 0.0), minlength=n_grupos)
+    contagem = np.bincount(codes, weights=validos, minlength=n_grupos)
+    return soma, contagem, validos
+
+def _payment_method_codes(meio_pagamento):
+    """
+    Códigos dos meios de pagamento na mesma ordem das colunas do 'pivot_table'
+    (todas as categorias, se a coluna for categórica; senão os valores ordenados).
+    """
+    if isinstance(meio_pagamento.dtype, pd.CategoricalDtype):
+        return meio_pagamento.cat.codes.to_numpy(), meio_pagamento.cat.categories
+    return pd.factorize(meio_pagamento, sort=True)
+
+@instrumented('agregacao')
+def aggregate_client_features(df_historico):
+    """
+    Calcula TODOS os atributos por cliente do histórico em uma única redução
+    agrupada: 'id_cliente' e 'meio_pagamento' são fatorizados uma vez e cada
+    coluna vira um 'np.bincount' sobre esses códigos (o mix de pagamento é um
+    bincount sobre o par cliente x meio), sem 'groupby', 'pivot_table' ou 'join'.
+
+    Args:
+        df_historico (pd.DataFrame): O DataFrame da FASE 1 (make_dataset.py)
+
+    Returns:
+        pd.DataFrame: Uma linha por cliente (ordenado por 'id_cliente') com
+                      tpv_total, margem_op_media, margem_op_total,
+                      volatilidade_tpv, tendencia_tpv e as colunas mix_pct_*.
+    """
+    # 1. Fatoriza as chaves uma única vez
+    with span('fatorizacao'):
+        codes_cliente, clientes = pd.factorize(df_historico['id_cliente'], sort=True)
+        n_clientes = len(clientes)
+        codes_data, _ = pd.factorize(df_historico['data'], sort=True)
+        codes_meio, meios = _payment_method_codes(df_historico['meio_pagamento'])
+
+        # Linhas sem cliente são ignoradas, como no groupby
+        linhas = codes_cliente >= 0
+        if not linhas.all():
+            codes_cliente, codes_data, codes_meio = codes_cliente[linhas], codes_data[linhas], codes_meio[linhas]
+
+        # Ordem (cliente, data) para a tendência; datas nulas vão para o final
+        codes_data = np.where(codes_data < 0, codes_data.max(initial=-1) + 1, codes_data)
+        ordem = np.lexsort((codes_data, codes_cliente))
+        codes_cliente, codes_meio = codes_cliente[ordem], codes_meio[ordem]
+        tpv = df_historico['tpv_dia'].to_numpy(dtype=np.float64)[linhas][ordem]
+        margem = df_historico['margem_op_dia'].to_numpy(dtype=np.float64)[linhas][ordem]
+
+    # 2. Somas e contagens agrupadas (TPV e Margem)
+    with span('somas_agrupadas'):
+        tpv_total, tpv_n, tpv_validos = _grouped_sum_count(codes_cliente, tpv, n_clientes)
+        margem_total, margem_n, _ = _grouped_sum_count(codes_cliente, margem, n_clientes)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            margem_media = margem_total / margem_n
+
+            # Volatilidade: desvio padrão amostral (ddof=1), centrado na média do cliente
+            tpv_media = tpv_total / tpv_n
+            desvio = np.where(tpv_validos, tpv - tpv_media[codes_cliente], 0.0)
+            volatilidade = np.sqrt(
+                np.bincount(codes_cliente, weights=desvio * desvio, minlength=n_clientes) / (tpv_n - 1)
+            )
+        volatilidade[tpv_n < 2] = np.nan
+
+    # 3. Tendência (Cliente Vagalume)
+    with span('tendencia'):
+        tendencia = _grouped_slope(codes_cliente, tpv, n_clientes)
+
+    # 4. Mix de pagamento: TPV por (cliente, meio) via bincount no código combinado
+    with span('mix_pagamento'):
+        n_meios = len(meios)
+        com_meio = codes_meio >= 0
+        mix = np.bincount(
+            codes_cliente[com_meio] * n_meios + codes_meio[com_meio],
+            weights=np.where(tpv_validos, tpv, 0.0)[com_meio],
+            minlength=n_clientes * n_meios
+        ).reshape(n_clientes, n_meios)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mix_percent = mix / tpv_total[:, None]
+
+    colunas = {
+        'tpv_total': tpv_total,
+        'margem_op_media': margem_media,
+        'margem_op_total': margem_total,
+        'volatilidade_tpv': volatilidade,
+        'tendencia_tpv': tendencia,
+    }
+    # Renomeia colunas para ex: 'mix_pct_CREDIT', 'mix_pct_DEBIT'
+    for i, meio in enumerate(meios):
+        colunas[f'mix_pct_{meio.replace(" ", "_").upper()}'] = mix_percent[:, i]
+
+    return pd.DataFrame(colunas, index=pd.Index(clientes, name='id_cliente'))
+
+def aggregate_store_features(store, clientes_por_bloco=8192):
+    """
+    Mesmos atributos de 'aggregate_client_features', lidos do histórico
+    denso ('HistoryStore', data/history_store.py): para cada bloco de
+    clientes as matrizes dia x cliente já estão em ordem de data, então as
+    somas são reduções ao longo dos dias, sem fatorizar ids nem ordenar.
+
+    Uma célula do store é a soma do dia: o resultado é o mesmo de
+    'aggregate_client_features' quando o histórico tem uma linha por
+    cliente e dia (como a ent_margin_summary) e nenhum TPV nulo (lá, um
+    TPV nulo zera a tendência; aqui o dia só fica de fora).
+
+    Args:
+        store (HistoryStore): Histórico denso.
+        clientes_por_bloco (int): Clientes lidos por vez (limita a memória).
+
+    Returns:
+        pd.DataFrame: Uma linha por cliente (na ordem do store), com as
+                      mesmas colunas de 'aggregate_client_features'.
+    """
+    n_clientes = len(store)
+    colunas = {nome: np.empty(n_clientes) for nome in
+               ('tpv_total', 'margem_op_media', 'margem_op_total', 'volatilidade_tpv', 'tendencia_tpv')}
+    mix_percent = np.empty((n_clientes, len(store.meios)))
+
+    for c0 in range(0, n_clientes, clientes_por_bloco):
+        bloco = slice(c0, min(c0 + clientes_por_bloco, n_clientes))
+        tpv = store.slice('tpv', bloco).astype(np.float64)
+        margem = store.slice('margem', bloco).astype(np.float64)
+
+        # 1. TPV e margem: reduções ao longo dos dias (NaN = sem valor no dia)
+        tpv_validos = ~np.isnan(tpv)
+        tpv_n = tpv_validos.sum(axis=0)
+        tpv_total = np.nansum(tpv, axis=0)
+        margem_n = (~np.isnan(margem)).sum(axis=0)
+        margem_total = np.nansum(margem, axis=0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Volatilidade: desvio padrão amostral (ddof=1), centrado na média do cliente
+            tpv_media = tpv_total / tpv_n
+            desvio = np.where(tpv_validos, tpv - tpv_media, 0.0)
+            volatilidade = np.sqrt((desvio * desvio).sum(axis=0) / (tpv_n - 1))
+
+            # 2. Tendência: x é a posição do dia entre os dias com TPV do cliente
+            x = np.cumsum(tpv_validos, axis=0) - 1.0
+            dx = np.where(tpv_validos, x - (tpv_n - 1) / 2, 0.0)
+            sxx = (dx * dx).sum(axis=0)
+            tendencia = (dx * desvio).sum(axis=0) / sxx
+
+            # 3. Mix de pagamento
+            mix_percent[bloco] = store.slice('tpv_meio', bloco).sum(axis=0, dtype=np.float64) / tpv_total[:, None]
+            colunas['margem_op_media'][bloco] = margem_total / margem_n
+        volatilidade[tpv_n < 2] = np.nan
+        tendencia[(tpv_n < 2) | np.isnan(tendencia)] = 0.0
+
+        colunas['tpv_total'][bloco] = tpv_total
+        colunas['margem_op_total'][bloco] = margem_total
+        colunas['volatilidade_tpv'][bloco] = volatilidade
+        colunas['tendencia_tpv'][bloco] = tendencia
+
+    for i, meio in enumerate(store.meios):
+        colunas[f'mix_pct_{meio.replace(" ", "_").upper()}'] = mix_percent[:, i]
+
+    return pd.DataFrame(colunas, index=pd.Index(store.clientes, name='id_cliente'))
+
+def _aggregate_shard(path, shard, meios):
+    """
+    Atributos de uma partição de clientes (no processo do pool). O histórico
+    codificado chega como um arquivo Arrow IPC aberto por memory map (as
+    colunas viram arrays sem cópia); cada processo separa as suas linhas e o
+    cliente é o código local (0..n-1) dele na partição.
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(path) as origem:
+        tabela = pa.ipc.open_file(origem).read_all()
+    linhas = np.flatnonzero(tabela.column('shard').to_numpy() == shard)
+    df_shard = pd.DataFrame({
+        'id_cliente': tabela.column('id_cliente').to_numpy()[linhas],
+        'data': tabela.column('data').to_numpy()[linhas].view('datetime64[ns]'),
+        'tpv_dia': tabela.column('tpv_dia').to_numpy()[linhas],
+        'margem_op_dia': tabela.column('margem_op_dia').to_numpy()[linhas],
+        'meio_pagamento': pd.Categorical.from_codes(tabela.column('meio_pagamento').to_numpy()[linhas],
+                                                    categories=meios),
+    })
+    return aggregate_client_features(df_shard)
+
+@instrumented('agregacao_paralela')
+def aggregate_client_features_parallel(df_historico, n_workers=None, n_shards=None):
+    """
+    Versão paralela de 'aggregate_client_features': todos os atributos são
+    por cliente, então o histórico é particionado por hash do 'id_cliente' e
+    cada partição é agregada em um processo do pool.
+
+    O histórico vai para os processos como um arquivo Arrow IPC (em /dev/shm,
+    quando existe) com colunas só numéricas: partição, código do cliente, data
+    em int64, TPV, margem e código do meio. Nada de pickle do histórico nem de
+    strings, e cada processo separa as linhas da sua partição.
+    O resultado é idêntico ao da versão serial: mesma ordem de clientes, mesmas
+    colunas 'mix_pct_*' (os meios são fatorizados antes de particionar) e os
+    mesmos valores (as somas de cada cliente seguem a mesma ordem de linhas).
+
     Args:
         df_historico (pd.DataFrame): O DataFrame da FASE 1 (make_dataset.py)
+        n_workers (int, opcional): Processos do pool (None = todos os núcleos).
+        n_shards (int, opcional): Partições de clientes (default: uma por processo).
+
+    Returns:
+        pd.DataFrame: O mesmo DataFrame de 'aggregate_client_features'.
+    """
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    import pyarrow as pa
+
+    n_workers = n_workers or os.cpu_count() or 1
+    n_shards = n_shards or n_workers
+    # Sem linhas ou com uma partição só não há o que dividir
+    if len(df_historico) == 0 or n_shards == 1:
+        return aggregate_client_features(df_historico)
+
+    # 1. Chaves codificadas no processo principal (mesma ordem da versão serial)
+    with span('particionamento', linhas_entrada=len(df_historico)):
+        codes_cliente, clientes = pd.factorize(df_historico['id_cliente'], sort=True)
+        codes_meio, meios = _payment_method_codes(df_historico['meio_pagamento'])
+
+        # Partição de cada cliente = hash do id (só dos ids distintos, não das linhas)
+        shard_cliente = (pd.util.hash_array(np.asarray(clientes, dtype=object)) % n_shards).astype(np.int16)
+        # Código local do cliente dentro da sua partição (em ordem crescente do código global)
+        n_por_shard = np.bincount(shard_cliente, minlength=n_shards)
+        ordem_clientes = np.argsort(shard_cliente, kind='stable')
+        codigo_local = np.empty(len(clientes), dtype=np.int32)
+        codigo_local[ordem_clientes] = np.arange(len(clientes)) - np.repeat(np.cumsum(n_por_shard) - n_por_shard,
+                                                                            n_por_shard)
+        # Linhas sem cliente ficam fora de todas as partições, como no groupby
+        sem_cliente = codes_cliente < 0
+        tabela = pa.table({
+            'shard': np.where(sem_cliente, -1, shard_cliente[codes_cliente]).astype(np.int16),
+            'id_cliente': codigo_local[codes_cliente],
+            'data': pd.to_datetime(df_historico['data']).to_numpy('datetime64[ns]').view(np.int64),
+            'tpv_dia': df_historico['tpv_dia'].to_numpy(dtype=np.float64),
+            'margem_op_dia': df_historico['margem_op_dia'].to_numpy(dtype=np.float64),
+            'meio_pagamento': np.asarray(codes_meio, dtype=np.int32),
+        })
+
+    # 2. Um único arquivo IPC; cada processo lê por memory map só a sua partição
+    pasta_base = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    with tempfile.TemporaryDirectory(dir=pasta_base) as pasta:
+        path = os.path.join(pasta, 'historico.arrow')
+        with pa.OSFile(path, 'wb') as destino, pa.ipc.new_file(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        del tabela
+
+        shards = [shard for shard in range(n_shards) if n_por_shard[shard] > 0]
+        if len(shards) <= 1:
+            return aggregate_client_features(df_historico)
+        with span('pool', shards=len(shards), workers=n_workers):
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(shards))) as pool:
+                resultados = list(pool.map(_aggregate_shard, [path] * len(shards), shards, [meios] * len(shards)))
+
+    # 3. Volta para a ordem global dos clientes (a da versão serial)
+    df_agregado = pd.concat(resultados, ignore_index=True)
+    posicao = np.empty(len(clientes), dtype=np.int64)
+    posicao[ordem_clientes] = np.arange(len(clientes))
+    df_agregado = df_agregado.iloc[posicao]
+    df_agregado.index = pd.Index(clientes, name='id_cliente')
+    return df_agregado
+
+@instrumented('montagem')
+def assemble_features(df_agregado, df_metas=None):
+    """
+    Monta a tabela final de features a partir dos atributos agregados por
+    cliente (saída de 'aggregate_client_features'): junta a meta, calcula o
+    atingimento e aplica a limpeza final, na ordem de colunas do modelo.
+
+    Args:
+        df_agregado (pd.DataFrame): Atributos agregados por cliente.
         df_metas (pd.DataFrame, opcional): Um DataFrame com 'id_cliente' como índice
                                            e uma coluna 'tpv_meta'.
 
     Returns:
         pd.DataFrame: A tabela de features (uma linha por cliente).
     """
-    
-    print(f"Iniciando engenharia de atributos para {df_historico['id_cliente'].nunique()} clientes...")
-    
-    # 0. Garante a ordem dos dados para o cálculo de tendência
-    df_historico = df_historico.sort_values(by=['id_cliente', 'data'])
-
-    # 1. Carregar DataFrame (cria a base de features)
-    df_features = pd.DataFrame(index=df_historico['id_cliente'].unique())
-    df_features.index.name = 'id_cliente'
-    
-    # 2. Atributo 1: TPV (Peso 70%)
-    df_agregado = df_historico.groupby('id_cliente')['tpv_dia'].sum().to_frame('tpv_total')
-    df_features = df_features.join(df_agregado)
+    # 1. Cria a base de features com o Atributo 1: TPV (Peso 70%)
+    df_features = df_agregado[['tpv_total']]
 
     # --- PONTO CRÍTICO: Juntar com a Meta ---
     if df_metas is not None:
@@ -63,48 +381,46 @@ def engineer_features(df_historico, df_metas=None):
         )
     else:
         print("Aviso: 'df_metas' não fornecido. 'atingimento_meta_tpv' não será calculado.")
+        df_features = df_features.copy()
         df_features['atingimento_meta_tpv'] = np.nan
         df_features['tpv_meta'] = np.nan # Garante que a coluna exista
 
-    # 3. Atributo 2: Margem (Peso 20%)
-    df_features['margem_op_media'] = df_historico.groupby('id_cliente')['margem_op_dia'].mean()
-    df_features['margem_op_total'] = df_historico.groupby('id_cliente')['margem_op_dia'].sum()
+    # 2. Atributo 2: Margem (Peso 20%), Atributo 3: Comportamento Histórico
+    # (Peso 10%) e Mix de Pagamento (Feature Extra)
+    df_features = df_features.join(df_agregado.drop(columns='tpv_total'))
 
-    # 4. Atributo 3: Comportamento Histórico (Peso 10%)
-    print("Calculando atributos de comportamento (tendência, volatilidade)...")
-    
-    # Volatilidade (Desvio Padrão do TPV)
-    df_features['volatilidade_tpv'] = df_historico.groupby('id_cliente')['tpv_dia'].std()
-    
-    # Tendência (Cliente Vagalume)
-    # Aplicamos nossa função 'calculate_trend' a cada grupo de cliente
-    tendencia_series = df_historico.groupby('id_cliente')['tpv_dia'].apply(calculate_trend)
-    df_features['tendencia_tpv'] = tendencia_series
+    # 3. Limpeza Final
+    # Preenche NaNs (ex: volatilidade de cliente com 1 transação) com 0
+    return df_features.fillna(0)
 
-    # Mix de Pagamento (Feature Extra)
-    print("Calculando mix de pagamento...")
-    
-    # Cria a pivot table (total de TPV por cliente e meio de pagamento)
-    pivot_mix = df_historico.pivot_table(
-        index='id_cliente',
-        columns='meio_pagamento',
-        values='tpv_dia',
-        aggfunc='sum',
-        fill_value=0
-    )
+@instrumented('engineer_features')
+def engineer_features(df_historico, df_metas=None, n_workers=1):
+    """
+    Transforma o DataFrame histórico (várias linhas por cliente)
+    em um DataFrame de features (uma linha por cliente).
     
-    # Normaliza para percentual (divide o TPV de cada meio pelo TPV total)
-    pivot_percent = pivot_mix.div(df_features['tpv_total'], axis=0)
+    Args:
+        df_historico (pd.DataFrame): O DataFrame da FASE 1 (make_dataset.py)
+        df_metas (pd.DataFrame, opcional): Um DataFrame com 'id_cliente' como índice
+                                           e uma coluna 'tpv_meta'.
+        n_workers (int, opcional): Processos da agregação (1 = serial; None = todos
+                                   os núcleos, ver 'aggregate_client_features_parallel').
+
+    Returns:
+        pd.DataFrame: A tabela de features (uma linha por cliente).
+    """
     
-    # Renomeia colunas para ex: 'mix_pct_CREDIT', 'mix_pct_DEBIT'
-    pivot_percent.columns = [f'mix_pct_{col.replace(" ", "_").upper()}' for col in pivot_percent.columns]
+    print(f"Iniciando engenharia de atributos para {df_historico['id_cliente'].nunique()} clientes...")
     
-    # Junta as features de mix ao DataFrame principal
-    df_features = df_features.join(pivot_percent)
+    # 0. Todos os atributos por cliente (TPV, Margem, Comportamento e Mix)
+    # em uma única passada sobre o histórico
+    print("Calculando atributos de TPV, margem, comportamento (tendência, volatilidade) e mix de pagamento...")
+    if n_workers == 1:
+        df_agregado = aggregate_client_features(df_historico)
+    else:
+        df_agregado = aggregate_client_features_parallel(df_historico, n_workers)
 
-    # 5. Limpeza Final
-    # Preenche NaNs (ex: volatilidade de cliente com 1 transação) com 0
-    df_features = df_features.fillna(0)
+    df_features = assemble_features(df_agregado, df_metas)
     
     print("Engenharia de atributos concluída.")
     return df_features
\ No newline at end of file
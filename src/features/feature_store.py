@@ -0,0 +1,274 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Adiciona a pasta 'src' ao path para podermos importar 'build_features'
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from features.build_features import (
+    _grouped_sum_count, _payment_method_codes, assemble_features, engineer_features
+)
+
+FEATURE_STORE_PATH = os.path.join(PROJECT_ROOT, 'dados', 'feature_store')
+
+# Estado acumulado por cliente. Com ele as features da FASE 2 são recalculadas
+# sem reler o histórico:
+# - n_linhas / tpv_n / margem_n: linhas totais e linhas com valor válido
+# - tpv_soma / tpv_media / tpv_m2: soma e acumuladores de Welford da variância
+# - comomento_xy: Σ(x - x̄)(y - ȳ) da regressão do TPV contra a posição (x)
+# - tpv_tem_nan: o histórico tem TPV nulo (a tendência passa a ser 0)
+COLUNAS_ESTADO = [
+    'n_linhas', 'tpv_n', 'tpv_soma', 'tpv_media', 'tpv_m2',
+    'margem_n', 'margem_soma', 'comomento_xy', 'tpv_tem_nan', 'ultima_data'
+]
+
+class FeatureStore:
+    """
+    Feature store incremental: guarda estatísticas suficientes por cliente e
+    atualiza as features apenas com as linhas novas (ex: o dia de ontem),
+    em O(delta) em vez de O(histórico).
+
+    O resultado de 'update' é o mesmo de rodar 'engineer_features' sobre o
+    histórico completo, para os clientes afetados.
+
+    Uso:
+        store = FeatureStore.load()          # ou FeatureStore() na primeira carga
+        df_novas = store.update(df_ontem, df_metas)
+        store.save()
+    """
+
+    def __init__(self, estado=None, mix=None):
+        if estado is None:
+            estado = pd.DataFrame(columns=COLUNAS_ESTADO, index=pd.Index([], name='id_cliente'))
+            estado = estado.astype({
+                'n_linhas': 'int64', 'tpv_n': 'int64', 'margem_n': 'int64',
+                'tpv_soma': 'float64', 'tpv_media': 'float64', 'tpv_m2': 'float64',
+                'margem_soma': 'float64', 'comomento_xy': 'float64',
+                'tpv_tem_nan': 'bool', 'ultima_data': 'datetime64[ns]'
+            })
+        if mix is None:
+            # TPV acumulado por cliente (linhas) e meio de pagamento (colunas)
+            mix = pd.DataFrame(index=estado.index, dtype='float64')
+        self.estado = estado
+        self.mix = mix
+
+    def __len__(self):
+        return len(self.estado)
+
+    def _batch_stats(self, df_novo):
+        """Estatísticas do lote novo por cliente, no mesmo formato do estado."""
+        codes, clientes = pd.factorize(df_novo['id_cliente'], sort=True)
+        n_clientes = len(clientes)
+        datas = pd.to_datetime(df_novo['data']).to_numpy()
+
+        # Ordem (cliente, data), a mesma usada pela tendência em 'aggregate_client_features'
+        ordem = np.lexsort((datas, codes))
+        codes, datas = codes[ordem], datas[ordem]
+        tpv = df_novo['tpv_dia'].to_numpy(dtype=np.float64)[ordem]
+        margem = df_novo['margem_op_dia'].to_numpy(dtype=np.float64)[ordem]
+
+        n_linhas = np.bincount(codes, minlength=n_clientes)
+        tpv_soma, tpv_n, tpv_validos = _grouped_sum_count(codes, tpv, n_clientes)
+        margem_soma, margem_n, _ = _grouped_sum_count(codes, margem, n_clientes)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tpv_media = tpv_soma / tpv_n
+            desvio = np.where(tpv_validos, tpv - tpv_media[codes], 0.0)
+            tpv_m2 = np.bincount(codes, weights=desvio * desvio, minlength=n_clientes)
+
+            # Posição de cada linha dentro do lote e co-momento centrado no lote
+            inicio = np.concatenate(([0], np.cumsum(n_linhas)[:-1]))
+            x = np.arange(len(codes)) - inicio[codes]
+            dx = x - (n_linhas[codes] - 1) / 2
+            comomento = np.bincount(codes, weights=dx * desvio, minlength=n_clientes)
+
+        tem_nan = np.bincount(codes, weights=~tpv_validos, minlength=n_clientes) > 0
+
+        estado_lote = pd.DataFrame({
+            'n_linhas': n_linhas,
+            'tpv_n': tpv_n.astype(np.int64),
+            'tpv_soma': tpv_soma,
+            'tpv_media': tpv_media,
+            'tpv_m2': tpv_m2,
+            'margem_n': margem_n.astype(np.int64),
+            'margem_soma': margem_soma,
+            'comomento_xy': np.where(tem_nan, 0.0, comomento),
+            'tpv_tem_nan': tem_nan,
+            'ultima_data': pd.Series(datas).groupby(codes).max().to_numpy(),
+        }, index=pd.Index(clientes, name='id_cliente'))
+        primeira_data = pd.Series(datas).groupby(codes).min().to_numpy()
+
+        # TPV por (cliente, meio) do lote
+        codes_meio, meios = _payment_method_codes(df_novo['meio_pagamento'])
+        codes_meio = np.asarray(codes_meio)[ordem]
+        n_meios = len(meios)
+        com_meio = codes_meio >= 0
+        mix_lote = np.bincount(
+            codes[com_meio] * n_meios + codes_meio[com_meio],
+            weights=np.where(tpv_validos, tpv, 0.0)[com_meio],
+            minlength=n_clientes * n_meios
+        ).reshape(n_clientes, n_meios)
+        mix_lote = pd.DataFrame(mix_lote, index=estado_lote.index, columns=list(meios))
+
+        return estado_lote, mix_lote, primeira_data
+
+    def update(self, df_novo, df_metas=None):
+        """
+        Incorpora as linhas novas do histórico ao estado e retorna as features
+        atualizadas APENAS dos clientes presentes em 'df_novo'.
+
+        As linhas novas devem ser posteriores às já incorporadas para cada
+        cliente (ex: a carga diária); dados atrasados exigem reconstruir o
+        estado do zero.
+
+        Args:
+            df_novo (pd.DataFrame): Novas linhas no formato da FASE 1.
+            df_metas (pd.DataFrame, opcional): Metas ('tpv_meta') por cliente.
+
+        Returns:
+            pd.DataFrame: Features (mesmas colunas de 'engineer_features') dos
+                          clientes afetados.
+        """
+        estado_b, mix_b, primeira_data = self._batch_stats(df_novo)
+        clientes = estado_b.index
+
+        # 1. Clientes novos entram no estado zerados
+        novos = clientes.difference(self.estado.index)
+        if len(novos):
+            vazio = FeatureStore().estado.reindex(novos)
+            vazio[['n_linhas', 'tpv_n', 'margem_n']] = 0
+            vazio[['tpv_soma', 'tpv_m2', 'margem_soma', 'comomento_xy']] = 0.0
+            vazio['tpv_tem_nan'] = False
+            self.estado = pd.concat([self.estado, vazio]).sort_index()
+            self.mix = self.mix.reindex(self.estado.index, fill_value=0.0)
+
+        estado_a = self.estado.loc[clientes]
+        atrasados = primeira_data <= estado_a['ultima_data'].to_numpy()
+        if atrasados.any():
+            raise ValueError(
+                f"{atrasados.sum()} clientes com datas já incorporadas ao estado. "
+                "Reconstrua o FeatureStore a partir do histórico completo."
+            )
+
+        # 2. Combina estado anterior (a) e lote (b)
+        na, nb = estado_a['tpv_n'].to_numpy(), estado_b['tpv_n'].to_numpy()
+        ma, mb = estado_a['tpv_media'].to_numpy(), estado_b['tpv_media'].to_numpy()
+        La, Lb = estado_a['n_linhas'].to_numpy(), estado_b['n_linhas'].to_numpy()
+        n = na + nb
+        L = La + Lb
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Welford / Chan: média e M2 combinados
+            delta = np.where((na > 0) & (nb > 0), mb - ma, 0.0)
+            media = np.where(na > 0, np.where(nb > 0, ma + delta * nb / n, ma), mb)
+            m2 = estado_a['tpv_m2'].to_numpy() + estado_b['tpv_m2'].to_numpy() + delta ** 2 * na * nb / n
+
+            # Co-momento da regressão: o x do lote continua a partir de La, então
+            # a distância entre as médias de x é L / 2 e o termo cruzado
+            # (L / 2) * delta * La * Lb / L fica delta * La * Lb / 2
+            comomento = (
+                estado_a['comomento_xy'].to_numpy() + estado_b['comomento_xy'].to_numpy()
+                + delta * La * Lb / 2
+            )
+
+        tem_nan = estado_a['tpv_tem_nan'].to_numpy() | estado_b['tpv_tem_nan'].to_numpy()
+        self.estado.loc[clientes, 'n_linhas'] = L
+        self.estado.loc[clientes, 'tpv_n'] = n
+        self.estado.loc[clientes, 'tpv_soma'] = estado_a['tpv_soma'].to_numpy() + estado_b['tpv_soma'].to_numpy()
+        self.estado.loc[clientes, 'tpv_media'] = media
+        self.estado.loc[clientes, 'tpv_m2'] = np.where(n > 0, m2, 0.0)
+        self.estado.loc[clientes, 'margem_n'] = estado_a['margem_n'].to_numpy() + estado_b['margem_n'].to_numpy()
+        self.estado.loc[clientes, 'margem_soma'] = (
+            estado_a['margem_soma'].to_numpy() + estado_b['margem_soma'].to_numpy()
+        )
+        self.estado.loc[clientes, 'comomento_xy'] = np.where(tem_nan, 0.0, comomento)
+        self.estado.loc[clientes, 'tpv_tem_nan'] = tem_nan
+        self.estado.loc[clientes, 'ultima_data'] = estado_b['ultima_data'].to_numpy()
+
+        # 3. Mix: TPV acumulado por meio (meios novos viram colunas novas)
+        meios = sorted(set(self.mix.columns) | set(mix_b.columns))
+        self.mix = self.mix.reindex(columns=meios, fill_value=0.0)
+        self.mix.loc[clientes] += mix_b.reindex(columns=meios, fill_value=0.0)
+
+        return self.features(clientes, df_metas)
+
+    def _aggregate(self, clientes=None):
+        """Atributos agregados (formato de 'aggregate_client_features') a partir do estado."""
+        estado = self.estado if clientes is None else self.estado.loc[clientes]
+        mix = self.mix.loc[estado.index]
+
+        tpv_total = estado['tpv_soma'].to_numpy(dtype=np.float64)
+        tpv_n = estado['tpv_n'].to_numpy()
+        n_linhas = estado['n_linhas'].to_numpy(dtype=np.float64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            volatilidade = np.sqrt(estado['tpv_m2'].to_numpy(dtype=np.float64) / (tpv_n - 1))
+            # Σ(x - x̄)² das posições 0..n-1 tem forma fechada: n(n² - 1) / 12
+            tendencia = estado['comomento_xy'].to_numpy(dtype=np.float64) / (n_linhas * (n_linhas ** 2 - 1) / 12)
+            colunas = {
+                'tpv_total': tpv_total,
+                'margem_op_media': estado['margem_soma'].to_numpy(dtype=np.float64) / estado['margem_n'].to_numpy(),
+                'margem_op_total': estado['margem_soma'].to_numpy(dtype=np.float64),
+                'volatilidade_tpv': np.where(tpv_n < 2, np.nan, volatilidade),
+                'tendencia_tpv': np.where(
+                    (n_linhas < 2) | estado['tpv_tem_nan'].to_numpy(dtype=bool) | np.isnan(tendencia), 0.0, tendencia
+                ),
+            }
+            for meio in mix.columns:
+                colunas[f'mix_pct_{meio.replace(" ", "_").upper()}'] = mix[meio].to_numpy() / tpv_total
+
+        return pd.DataFrame(colunas, index=estado.index)
+
+    def features(self, clientes=None, df_metas=None):
+        """
+        Features atuais (mesmas colunas de 'engineer_features') de todos os
+        clientes, ou só dos clientes em 'clientes'.
+        """
+        return assemble_features(self._aggregate(clientes), df_metas)
+
+    def save(self, path=FEATURE_STORE_PATH):
+        """Persiste o estado em Parquet (estado.parquet e mix.parquet)."""
+        os.makedirs(path, exist_ok=True)
+        self.estado.to_parquet(os.path.join(path, 'estado.parquet'))
+        self.mix.to_parquet(os.path.join(path, 'mix.parquet'))
+        print(f"Feature store salvo em {path} ({len(self)} clientes).")
+
+    @classmethod
+    def load(cls, path=FEATURE_STORE_PATH):
+        """Carrega o estado salvo por 'save' (ou um store vazio, se não existir)."""
+        if not os.path.exists(os.path.join(path, 'estado.parquet')):
+            print(f"Aviso: feature store não encontrado em {path}. Iniciando vazio.")
+            return cls()
+        estado = pd.read_parquet(os.path.join(path, 'estado.parquet'))
+        mix = pd.read_parquet(os.path.join(path, 'mix.parquet'))
+        return cls(estado, mix)
+
+if __name__ == '__main__':
+    # Teste rápido do módulo (rode com: python src/features/feature_store.py)
+    # Confere que o estado incremental reproduz o 'engineer_features' completo.
+    from benchmarks.synthetic import make_synthetic_history
+
+    print("--- Testando módulo feature_store ---")
+
+    df_historico = make_synthetic_history(5_000, max_dias=40)
+    datas = np.sort(df_historico['data'].unique())
+    corte = datas[len(datas) // 2]
+
+    store = FeatureStore()
+    store.update(df_historico[df_historico['data'] <= corte])
+    for dia in datas[datas > corte]:
+        df_atualizadas = store.update(df_historico[df_historico['data'] == dia])
+
+    df_completo = engineer_features(df_historico)
+    df_incremental = store.features()
+
+    pd.testing.assert_frame_equal(df_incremental, df_completo, check_exact=False, rtol=1e-9, atol=1e-6)
+    pd.testing.assert_frame_equal(
+        df_atualizadas, df_completo.loc[df_atualizadas.index], check_exact=False, rtol=1e-9, atol=1e-6
+    )
+    print(f"OK: {len(store)} clientes, features incrementais iguais ao recálculo completo.")
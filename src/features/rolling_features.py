@@ -0,0 +1,287 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Adiciona a pasta 'src' ao path para podermos importar os módulos do projeto
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from features.build_features import _payment_method_codes
+
+# Features "point-in-time" em janelas móveis (7/30/90 dias) para cada cliente
+# em cada data de corte (snapshot), sem olhar para depois do snapshot.
+#
+# São os mesmos atributos de 'engineer_features' (TPV total, margem média,
+# volatilidade, tendência e mix de pagamento), só que calculados sobre a
+# janela (snapshot - w, snapshot] em vez do histórico inteiro:
+#
+# - Os clientes são processados em blocos. Para cada bloco, cada soma
+#   necessária (TPV, TPV², posição x TPV, margem, TPV por meio, contagens...)
+#   vira uma matriz densa cliente x dia (um 'np.bincount'), acumulada ao
+#   longo dos dias com 'np.cumsum'.
+# - A soma de qualquer janela é então a diferença de duas colunas da soma
+#   acumulada: C[snapshot] - C[snapshot - w]. Nenhuma janela é recalculada
+#   do zero, e todas as janelas de todos os snapshots saem do mesmo cumsum
+#   (que recomeça a cada max(janelas) dias, ver '_somas_janela').
+# - Média, desvio padrão (ddof=1) e inclinação OLS saem dessas somas. O TPV
+#   é centrado no primeiro valor de cada cliente antes dos quadrados, para a
+#   diferença das somas acumuladas não perder precisão.
+#
+# A memória fica limitada a um bloco: 'clientes_por_bloco' x dias x 8 bytes
+# por soma (ex: 4096 clientes x 730 dias = 24 MB). A saída sai bloco a bloco
+# ('iter_rolling_features'), no mesmo formato longo (cliente, snapshot) de
+# 'create_churn_labels_grid', para juntar features e labels do mesmo snapshot.
+
+JANELAS_ROLLING = (7, 30, 90)
+CLIENTES_POR_BLOCO = 4096
+
+def _preparar_historico(df_historico):
+    """
+    Ordena o histórico por (cliente, data) e guarda só o necessário para as
+    somas de cada bloco (os pesos são montados bloco a bloco, em '_pesos').
+    """
+    codes_cliente, clientes = pd.factorize(df_historico['id_cliente'], sort=True)
+    dias = pd.to_datetime(df_historico['data']).to_numpy('datetime64[D]')
+    codes_meio, meios = _payment_method_codes(df_historico['meio_pagamento'])
+
+    # Linhas sem cliente ou sem data são ignoradas, como no groupby
+    linhas = np.flatnonzero((codes_cliente >= 0) & ~np.isnat(dias))
+    dias = dias.astype(np.int64)
+
+    # Ordem (cliente, data) com uma única chave int64 (estável: empates
+    # ficam na ordem original, como no lexsort de 'aggregate_client_features')
+    dia_min = dias[linhas].min() if len(linhas) else 0
+    span = (dias[linhas].max() - dia_min + 1) if len(linhas) else 1
+    chave = codes_cliente[linhas].astype(np.int64) * span + (dias[linhas] - dia_min)
+    ordem = linhas[np.argsort(chave, kind='stable')]
+
+    cliente = codes_cliente[ordem]
+    tpv = df_historico['tpv_dia'].to_numpy(dtype=np.float64)[ordem]
+
+    # Linhas de cada cliente: [limites[c], limites[c + 1])
+    n_clientes = len(clientes)
+    limites = np.searchsorted(cliente, np.arange(n_clientes + 1))
+    inicio_cliente = limites[cliente]
+    com_linhas = limites[1:] > limites[:-1]
+    primeira_linha = limites[:-1][com_linhas]
+
+    # Posição da linha (entre as de TPV válido) dentro do cliente: o "x" da tendência
+    tpv_valido = ~np.isnan(tpv)
+    validos_acumulados = np.cumsum(tpv_valido)
+    posicao = validos_acumulados - validos_acumulados[inicio_cliente] + tpv_valido[inicio_cliente] - 1
+
+    # Primeiro TPV do cliente: origem do TPV centrado (só muda a origem, não o resultado)
+    referencia = np.zeros(n_clientes)
+    referencia[com_linhas] = np.nan_to_num(tpv[primeira_linha])
+
+    dia = dias[ordem]
+    primeiro_dia = np.full(n_clientes, np.iinfo(np.int64).max)
+    primeiro_dia[com_linhas] = dia[primeira_linha]
+
+    return {
+        'clientes': clientes,
+        'meios': meios,
+        'limites': limites,
+        'primeiro_dia': primeiro_dia,
+        'cliente': cliente,
+        'dia': dia,
+        'tpv': tpv,
+        'margem': df_historico['margem_op_dia'].to_numpy(dtype=np.float64)[ordem],
+        'meio': codes_meio[ordem],
+        'posicao': posicao.astype(np.float64),
+        'referencia': referencia,
+    }
+
+# Somas calculadas em cada janela (um peso de '_pesos' cada), mais o TPV de cada meio
+SOMAS = ('n', 'tpv', 'y', 'y2', 'x', 'x2', 'xy', 'margem', 'n_margem')
+
+def _pesos(dados, linhas):
+    """
+    Pesos de cada soma (na ordem de SOMAS + um por meio) para as linhas do
+    bloco. Linhas com TPV nulo ficam fora das somas de TPV.
+    """
+    tpv = dados['tpv'][linhas]
+    margem = dados['margem'][linhas]
+    meio = dados['meio'][linhas]
+    tpv_valido = ~np.isnan(tpv)
+    margem_valida = ~np.isnan(margem)
+
+    tpv_zero = np.where(tpv_valido, tpv, 0.0)
+    y = np.where(tpv_valido, tpv - dados['referencia'][dados['cliente'][linhas]], 0.0)
+    x = np.where(tpv_valido, dados['posicao'][linhas], 0.0)
+
+    pesos = [tpv_valido, tpv_zero, y, y * y, x, x * x, x * y,
+             np.where(margem_valida, margem, 0.0), margem_valida]
+    return pesos + [np.where(meio == i, tpv_zero, 0.0) for i in range(len(dados['meios']))]
+
+def _somas_janela(celula, pesos, n_bloco, n_segmentos, segmento, fim, inicio):
+    """
+    Soma de cada peso em cada janela (inicio, fim] (índices de dia) para
+    cada cliente do bloco: matriz densa soma x cliente x dia ->
+    cumsum ao longo dos dias -> duas colunas por janela.
+
+    O cumsum recomeça a cada 'segmento' dias (o tamanho da maior janela):
+    uma janela cobre no máximo dois segmentos, e as somas acumuladas ficam
+    na escala de uma janela, não do histórico inteiro (a diferença de duas
+    somas enormes perderia os dígitos do resultado).
+
+    Args:
+        celula (np.ndarray): Célula (cliente do bloco x dia) de cada linha.
+        pesos (list[np.ndarray]): Um peso por linha para cada soma.
+
+    Returns:
+        np.ndarray: (somas, n_bloco, len(fim))
+    """
+    # 1. Matriz densa (um bincount por soma; linhas do mesmo dia se somam)
+    n_celulas = n_bloco * n_segmentos * segmento
+    acumulado = np.empty((len(pesos), n_celulas))
+    for k, peso in enumerate(pesos):
+        acumulado[k] = np.bincount(celula, weights=peso, minlength=n_celulas)
+    acumulado = acumulado.reshape(len(pesos), n_bloco, n_segmentos, segmento)
+
+    # 2. Soma acumulada por segmento
+    np.cumsum(acumulado, axis=3, out=acumulado)
+
+    # 3. Duas colunas por janela
+    segmento_fim, posicao_fim = np.divmod(fim, segmento)
+    segmento_inicio, posicao_inicio = np.divmod(inicio, segmento)
+    soma = acumulado[:, :, segmento_fim, posicao_fim] - acumulado[:, :, segmento_inicio, posicao_inicio]
+    # Janela que começa no segmento anterior: soma também o resto dele
+    resto = acumulado[:, :, segmento_inicio, segmento - 1]
+    return soma + np.where(segmento_inicio != segmento_fim, resto, 0.0)
+
+def iter_rolling_features(df_historico, snapshots, janelas=JANELAS_ROLLING, clientes_por_bloco=CLIENTES_POR_BLOCO):
+    """
+    Calcula as features em janelas móveis bloco a bloco de clientes.
+
+    Args:
+        df_historico (pd.DataFrame): Histórico da FASE 1 (make_dataset.py).
+        snapshots (list-like): Datas de corte (cada janela termina no snapshot, inclusive).
+        janelas (tuple): Tamanhos das janelas em dias.
+        clientes_por_bloco (int): Clientes por bloco (limita a memória).
+
+    Yields:
+        pd.DataFrame: Uma linha por (cliente, snapshot) do bloco, só para
+                      clientes com alguma transação até o snapshot:
+                      [id_cliente (categórico), data_snapshot] + para cada
+                      janela w: tpv_total_{w}d, margem_op_media_{w}d,
+                      volatilidade_tpv_{w}d, tendencia_tpv_{w}d, mix_pct_*_{w}d
+                      (float32, NaN preenchido com 0 como em 'assemble_features').
+    """
+    dados = _preparar_historico(df_historico)
+    clientes, meios, limites = dados['clientes'], dados['meios'], dados['limites']
+    datas_snapshot = pd.DatetimeIndex(pd.to_datetime(pd.Series(snapshots)).unique()).sort_values()
+    dias_snapshot = datas_snapshot.to_numpy('datetime64[D]').astype(np.int64)
+    janelas = np.asarray(janelas, dtype=np.int64)
+    n_snapshots, n_janelas = len(dias_snapshot), len(janelas)
+    if len(dados['dia']) == 0 or n_snapshots == 0:
+        return
+
+    # Eixo de dias da matriz densa: do primeiro dia do histórico ao último
+    # snapshot, com um segmento vazio na frente (o início das janelas nunca
+    # fica antes do dia 0). Snapshots anteriores ao histórico não têm clientes.
+    segmento = int(janelas.max())
+    base = dados['dia'].min() - segmento
+    n_segmentos = int(max(dados['dia'].max(), dias_snapshot.max()) - base) // segmento + 1
+    n_dias = n_segmentos * segmento
+    fim = np.repeat(dias_snapshot - base, n_janelas).clip(min=segmento)  # (snapshot, janela) achatado
+    inicio = fim - np.tile(janelas, n_snapshots)
+
+    for c0 in range(0, len(clientes), clientes_por_bloco):
+        c1 = min(c0 + clientes_por_bloco, len(clientes))
+        n_bloco = c1 - c0
+        linhas = slice(limites[c0], limites[c1])
+        celula = (dados['cliente'][linhas] - c0) * n_dias + (dados['dia'][linhas] - base)
+
+        # 1. Somas de cada janela (n_bloco, snapshots, janelas) por nome
+        somas = _somas_janela(celula, _pesos(dados, linhas), n_bloco, n_segmentos, segmento, fim, inicio)
+        somas = somas.reshape(-1, n_bloco, n_snapshots, n_janelas)
+        s = dict(zip(SOMAS, somas))
+        for i in range(len(meios)):
+            s[f'meio_{i}'] = somas[len(SOMAS) + i]
+
+        # 2. Atributos a partir das somas
+        n = s['n']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            margem_media = s['margem'] / s['n_margem']
+            variancia = (s['y2'] - s['y'] * s['y'] / n) / (n - 1)
+            # Abaixo do arredondamento de Σy² (ex: janela constante) é zero
+            variancia[variancia <= 1e-10 * s['y2'] / n] = 0.0
+            volatilidade = np.sqrt(variancia)
+            sxx = s['x2'] - s['x'] * s['x'] / n
+            sxy = s['xy'] - s['x'] * s['y'] / n
+            tendencia = sxy / sxx
+            mix = [s[f'meio_{i}'] / s['tpv'] for i in range(len(meios))]
+        volatilidade[n < 2] = np.nan
+        # Mesmo fallback de 'calculate_trend' (1 ponto, NaN, etc.)
+        tendencia[(n < 2) | ~np.isfinite(tendencia)] = 0.0
+
+        # 3. Só os (cliente, snapshot) em que o cliente já existia
+        linha_cliente, linha_snapshot = np.nonzero(dados['primeiro_dia'][c0:c1, np.newaxis] <= dias_snapshot)
+        colunas = {
+            'id_cliente': pd.Categorical.from_codes(c0 + linha_cliente, categories=clientes),
+            'data_snapshot': datas_snapshot[linha_snapshot],
+        }
+        for j, janela in enumerate(janelas):
+            atributos = {
+                'tpv_total': s['tpv'],
+                'margem_op_media': margem_media,
+                'volatilidade_tpv': volatilidade,
+                'tendencia_tpv': tendencia,
+            }
+            for i, meio in enumerate(meios):
+                atributos[f'mix_pct_{meio.replace(" ", "_").upper()}'] = mix[i]
+            for nome, valores in atributos.items():
+                colunas[f'{nome}_{janela}d'] = np.nan_to_num(
+                    valores[linha_cliente, linha_snapshot, j], nan=0.0
+                ).astype(np.float32)
+
+        yield pd.DataFrame(colunas)
+
+def build_rolling_features(df_historico, snapshots, janelas=JANELAS_ROLLING, clientes_por_bloco=CLIENTES_POR_BLOCO):
+    """
+    Features em janelas móveis para todos os clientes e snapshots (todos os
+    blocos de 'iter_rolling_features' juntos). Para carteiras grandes, use
+    'iter_rolling_features' e grave cada bloco (ex: em Parquet).
+
+    Returns:
+        pd.DataFrame: Tabela longa (cliente, snapshot), ver 'iter_rolling_features'.
+    """
+    blocos = list(iter_rolling_features(df_historico, snapshots, janelas, clientes_por_bloco))
+    if not blocos:
+        return None
+    return pd.concat(blocos, ignore_index=True)
+
+if __name__ == '__main__':
+    # Teste rápido com histórico sintético (rode com: python src/features/rolling_features.py)
+    import contextlib
+    import io
+    from benchmarks.synthetic import make_synthetic_history
+    from features.build_churn_labels import create_churn_labels_grid
+    from features.build_features import aggregate_client_features
+
+    df_historico = make_synthetic_history(5_000, max_dias=120)
+    snapshots = pd.date_range('2024-01-07', '2024-04-28', freq='7D')
+    df_rolling = build_rolling_features(df_historico, snapshots)
+    print(f"{len(df_rolling)} linhas (cliente, snapshot) x {df_rolling.shape[1]} colunas")
+
+    # Com uma janela que cobre o histórico todo, no último dia, os atributos
+    # têm que ser os mesmos de 'aggregate_client_features'
+    ultimo_dia = df_historico['data'].max()
+    df_total = build_rolling_features(df_historico, [ultimo_dia], janelas=(365,)).set_index('id_cliente')
+    df_agregado = aggregate_client_features(df_historico).fillna(0)
+    for coluna in df_agregado.columns.drop('margem_op_total'):
+        np.testing.assert_allclose(df_total[f'{coluna}_365d'].to_numpy(), df_agregado[coluna].to_numpy(),
+                                   rtol=1e-4, atol=1e-3, err_msg=coluna)
+    print("Janela completa igual a 'aggregate_client_features'.")
+
+    # Junta com os labels do mesmo snapshot (sem lookahead nas features)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_labels = create_churn_labels_grid(df_historico, snapshots, janelas=(30,))
+    df_treino = df_rolling.merge(df_labels[['id_cliente', 'data_snapshot', 'is_churn']],
+                                 on=['id_cliente', 'data_snapshot'])
+    print(df_treino.head())
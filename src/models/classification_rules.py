@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+# Tabela única das regras de negócio (do saida.xlsx): faixa de atingimento
+# de meta -> classe -> regra de saída.
+#
+# Daqui saem tanto o "label" do treino (apply_classification_rules, FASE 3)
+# quanto a tabela de regras de saída da predição (REGRAS_SAIDA, FASE 4).
+# Para mudar uma faixa, altere apenas esta tabela.
+#
+# As faixas estão em ordem crescente de 'atingimento_min' (limite inferior,
+# inclusivo): um cliente pertence à última faixa cujo mínimo ele atinge.
+
+REGRAS_CLASSIFICACAO = [
+    {
+        'classe': 'Critico',
+        'atingimento_min': -np.inf,  # Menor que 0.1 (10%), e também NaN
+        "Atingimento de Meta (TPV)": "< 10%",
+        "Health Score": "0-24",
+        "Ação Recomendada": "renegociação imediata ou decrescimento"
+    },
+    {
+        'classe': 'Baixa Performance',
+        'atingimento_min': 0.1,
+        "Atingimento de Meta (TPV)": "10 a 49%",
+        "Health Score": "25-49",
+        "Ação Recomendada": "ações corretivas (renegociação, ajuste de taxa)"
+    },
+    {
+        'classe': 'Performance Regular',
+        'atingimento_min': 0.5,
+        "Atingimento de Meta (TPV)": "50 a 79%",
+        "Health Score": "50-74",
+        "Ação Recomendada": "revisão de condições + campanhas de engajamento"
+    },
+    {
+        'classe': 'Boa Performance',
+        'atingimento_min': 0.8,
+        "Atingimento de Meta (TPV)": "80 a 99%",
+        "Health Score": "75-89",
+        "Ação Recomendada": "manter condições + avaliar upsell"
+    },
+    {
+        'classe': 'Alta Performance',
+        'atingimento_min': 1.0,
+        "Atingimento de Meta (TPV)": ">= 100%",
+        "Health Score": "90-100",
+        "Ação Recomendada": "monitoria continua - oprotunidades de cross-sell"
+    },
+]
+
+# Classes da pior para a melhor (ordem das categorias)
+CLASSES = [regra['classe'] for regra in REGRAS_CLASSIFICACAO]
+
+# Limites entre faixas consecutivas (0.1, 0.5, 0.8, 1.0)
+LIMITES_ATINGIMENTO = np.array([regra['atingimento_min'] for regra in REGRAS_CLASSIFICACAO[1:]])
+
+TIPO_CLASSE = pd.CategoricalDtype(CLASSES, ordered=True)
+
+def classify_attainment(atingimento):
+    """
+    Classe de cada valor de atingimento de meta, de uma vez para a coluna toda.
+
+    Um único 'np.searchsorted' encontra a faixa de cada valor. NaN cai em
+    'Critico', como na regra original (todas as comparações com NaN são falsas).
+
+    Args:
+        atingimento (pd.Series): Atingimento de meta (ex: 1.12, 0.75).
+
+    Returns:
+        pd.Series: Classes (dtype categórico ordenado, ver TIPO_CLASSE), com o
+                   mesmo índice de 'atingimento'.
+    """
+    valores = atingimento.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    # Índice da faixa = quantos limites o valor atinge (>=)
+    codigos = np.searchsorted(LIMITES_ATINGIMENTO, valores, side='right').astype(np.int8)
+    codigos[np.isnan(valores)] = 0
+
+    return pd.Series(
+        pd.Categorical.from_codes(codigos, dtype=TIPO_CLASSE),
+        index=atingimento.index, name=atingimento.name
+    )
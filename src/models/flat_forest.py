@@ -0,0 +1,188 @@
+import os
+
+import numpy as np
+
+# Florestas "achatadas": as árvores de um RandomForestClassifier treinado
+# viram arrays NumPy contíguos (um único '.npz'), avaliados sem o scikit-learn.
+#
+# Os nós de todas as árvores ficam concatenados em um só array. A avaliação
+# desce todas as árvores ao mesmo tempo, nível a nível: a cada passo, para
+# cada par (árvore, cliente), compara a feature do nó com o limiar e vai para
+# o filho da esquerda ou da direita. Folhas apontam para si mesmas, então
+# 'profundidade' passos levam todos os pares até a sua folha.
+#
+# As probabilidades são IGUAIS (bit a bit) às de 'predict_proba':
+# - X é convertido para float32 e comparado com os limiares em float64,
+#   como no scikit-learn;
+# - as probabilidades das folhas são as mesmas de
+#   'DecisionTreeClassifier.predict_proba';
+# - as árvores são somadas na mesma ordem e a soma é dividida pelo número
+#   de árvores no final.
+#
+# O ganho está nos lotes pequenos (as requisições da API): em lotes de
+# milhares de linhas a implementação em Cython do scikit-learn volta a ser a
+# mais rápida (ver src/benchmarks/bench_flat_forest.py).
+#
+# Este módulo importa apenas numpy: um serviço que usa só os '.npz' sobe sem
+# carregar o scikit-learn.
+
+# Quantidade de pares (árvore, cliente) avaliados por vez (limita a memória)
+PARES_POR_BLOCO = 2 ** 18
+
+def export_forest(model, path, encoder=None):
+    """
+    Exporta um RandomForestClassifier treinado para um '.npz' (escrita atômica).
+
+    Args:
+        model (RandomForestClassifier): Floresta treinada (uma saída).
+        path (str): Caminho do arquivo '.npz'.
+        encoder (LabelEncoder, opcional): Se informado, grava também os rótulos
+                                          em texto das classes ('rotulos'),
+                                          para decodificar a classe sem o encoder.
+    """
+    n_classes = len(model.classes_)
+    arrays = {k: [] for k in ('feature', 'limiar', 'filho_esquerdo', 'filho_direito', 'nan_esquerda', 'valor')}
+    raizes = []
+    deslocamento = 0
+
+    for estimador in model.estimators_:
+        arvore = estimador.tree_
+        folha = arvore.children_left == -1
+        indices = np.arange(arvore.node_count) + deslocamento
+
+        # 1. Nós internos: filhos com índice global; folhas: apontam para si mesmas
+        # (feature 0 com limiar +inf e NaN à esquerda -> sempre "esquerda" = ela mesma)
+        arrays['feature'].append(np.where(folha, 0, arvore.feature))
+        arrays['limiar'].append(np.where(folha, np.inf, arvore.threshold))
+        arrays['filho_esquerdo'].append(np.where(folha, indices, arvore.children_left + deslocamento))
+        arrays['filho_direito'].append(np.where(folha, indices, arvore.children_right + deslocamento))
+        nan_esquerda = getattr(arvore, 'missing_go_to_left', np.zeros(arvore.node_count, dtype=np.uint8))
+        arrays['nan_esquerda'].append(folha | (nan_esquerda != 0))
+
+        # 2. Probabilidades das folhas como em DecisionTreeClassifier.predict_proba:
+        # o scikit-learn >= 1.4 já guarda frações em 'value' (usadas como estão);
+        # versões anteriores guardam contagens, normalizadas na predição
+        valor = arvore.value[:, 0, :n_classes].astype(np.float64)
+        normalizador = valor.sum(axis=1)[:, np.newaxis]
+        normalizador[np.isclose(normalizador, 1.0, rtol=0, atol=1e-9) | (normalizador == 0.0)] = 1.0
+        arrays['valor'].append(valor / normalizador)
+
+        raizes.append(deslocamento)
+        deslocamento += arvore.node_count
+
+    tipo_indice = np.int32 if 2 * deslocamento < np.iinfo(np.int32).max else np.int64
+    dados = {
+        'feature': np.concatenate(arrays['feature']).astype(tipo_indice),
+        'limiar': np.concatenate(arrays['limiar']).astype(np.float64),
+        # filhos[no] = (esquerda, direita)
+        'filhos': np.stack([np.concatenate(arrays['filho_esquerdo']),
+                            np.concatenate(arrays['filho_direito'])], axis=1).astype(tipo_indice),
+        'nan_esquerda': np.concatenate(arrays['nan_esquerda']).astype(bool),
+        'valor': np.ascontiguousarray(np.concatenate(arrays['valor'])),
+        'raizes': np.array(raizes, dtype=tipo_indice),
+        'profundidade': np.array(max(e.tree_.max_depth for e in model.estimators_)),
+        'classes_': np.asarray(model.classes_),
+        'feature_names_in_': np.asarray(model.feature_names_in_, dtype=str),
+    }
+    if encoder is not None:
+        dados['rotulos'] = np.asarray(encoder.inverse_transform(model.classes_), dtype=str)
+
+    # 3. Escrita atômica (mesma ideia de 'save_artifact'), para o hot-reload do registro
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    path_temporario = f"{path}.tmp-{os.getpid()}"
+    with open(path_temporario, 'wb') as arquivo:
+        np.savez(arquivo, **dados)
+    os.replace(path_temporario, path)
+
+class FlatForest:
+    """
+    Avaliador de uma floresta exportada por 'export_forest'.
+
+    Expõe a mesma interface usada do RandomForestClassifier no scoring
+    ('feature_names_in_', 'classes_', 'predict_proba', 'predict').
+    """
+
+    def __init__(self, dados):
+        self.feature = dados['feature']
+        self.limiar = dados['limiar']
+        self.filhos = dados['filhos']
+        self._filhos = self.filhos.ravel()  # filho de 'no' na direção d (0/1): _filhos[2 * no + d]
+        self.nan_esquerda = dados['nan_esquerda']
+        self.valor = dados['valor']
+        self.raizes = dados['raizes']
+        self.profundidade = int(dados['profundidade'])
+        self.classes_ = dados['classes_']
+        self.feature_names_in_ = dados['feature_names_in_'].astype(object)
+        self.n_features_in_ = len(self.feature_names_in_)
+        self.rotulos = dados.get('rotulos')
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arquivo:
+            return cls({nome: arquivo[nome] for nome in arquivo.files})
+
+    def _validar(self, X):
+        # Mesma ordem de colunas do treino e float32 (o dtype interno do scikit-learn)
+        if hasattr(X, 'columns'):
+            X = X[list(self.feature_names_in_)]
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X deve ter {self.n_features_in_} features (recebido: {X.shape}).")
+        return X
+
+    def apply(self, X):
+        """Índice (global) da folha de cada árvore para cada linha: array (n_arvores, n_linhas)."""
+        X = self._validar(X)
+        n_linhas, n_features = X.shape
+        X_plano = X.ravel()
+        inicio_linha = (np.arange(n_linhas, dtype=self.raizes.dtype) * n_features)[np.newaxis, :]
+        tem_nan = np.isnan(X_plano).any()
+        nos = np.repeat(self.raizes[:, np.newaxis], n_linhas, axis=1)
+
+        # Descida nível a nível de todas as árvores ao mesmo tempo
+        for _ in range(self.profundidade):
+            x = X_plano[inicio_linha + self.feature[nos]]
+            if tem_nan:
+                direita = ~((x <= self.limiar[nos]) | (np.isnan(x) & self.nan_esquerda[nos]))
+            else:
+                direita = x > self.limiar[nos]
+            nos = self._filhos[2 * nos + direita]
+        return nos
+
+    def predict_proba(self, X):
+        X = self._validar(X)
+        n_arvores = len(self.raizes)
+        probabilidades = np.empty((len(X), self.valor.shape[1]), dtype=np.float64)
+
+        bloco = max(1, PARES_POR_BLOCO // n_arvores)
+        for inicio in range(0, len(X), bloco):
+            folhas = self.apply(X[inicio:inicio + bloco])
+            # Soma árvore a árvore: a redução no eixo 0 acumula as árvores em
+            # sequência, na mesma ordem do scikit-learn
+            probabilidades[inicio:inicio + bloco] = self.valor[folhas].sum(axis=0)
+
+        probabilidades /= n_arvores
+        return probabilidades
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+if __name__ == '__main__':
+    # Exporta os modelos já treinados em 'modelos/' (rode com: python src/models/flat_forest.py)
+    import sys
+
+    PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+    if SRC_PATH not in sys.path:
+        sys.path.append(SRC_PATH)
+
+    from models.model_registry import registry
+
+    for nome, nome_achatado, nome_encoder in (('health_score', 'health_score_flat', 'label_encoder'),
+                                              ('churn', 'churn_flat', None)):
+        model = registry.get(nome)
+        if model is None:
+            continue
+        encoder = registry.get(nome_encoder) if nome_encoder else None
+        export_forest(model, registry.path(nome_achatado), encoder=encoder)
+        print(f"Floresta '{nome}' exportada para {registry.path(nome_achatado)}")
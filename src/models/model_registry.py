@@ -0,0 +1,164 @@
+import os
+import threading
+
+import joblib
+
+from models.flat_forest import FlatForest
+
+# Registro compartilhado dos modelos treinados (FASES 3 e 5).
+#
+# Os artefatos são carregados sob demanda (no primeiro uso), e não ao importar
+# o módulo. Com o gunicorn em modo '--preload', chame 'registry.preload()' no
+# processo mestre: os workers criados por fork herdam os modelos já carregados
+# e compartilham as mesmas páginas de memória (copy-on-write).
+#
+# Os arrays numpy dos artefatos são abertos com 'mmap_mode' (joblib): arrays
+# salvos sem compressão ficam mapeados do arquivo em vez de copiados para a
+# memória de cada processo. Estruturas que copiam os dados ao desserializar
+# (como as árvores do scikit-learn) continuam compartilhadas via preload + fork.
+#
+# As florestas também podem ser exportadas para '.npz' (ver flat_forest.py):
+# quando existe, a versão achatada é a usada no scoring ('get_forest'), e o
+# serviço não precisa importar o scikit-learn.
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+MODEL_DIR = os.environ.get('MODELOS_DIR', os.path.join(PROJECT_ROOT, 'modelos'))
+
+ARTEFATOS = {
+    'health_score': 'health_score_classifier.joblib',
+    'label_encoder': 'label_encoder.joblib',
+    'churn': 'churn_predictor.joblib',
+    'health_score_flat': 'health_score_classifier.npz',
+    'churn_flat': 'churn_predictor.npz',
+    'sarimax': 'sarimax_engine.joblib',
+}
+
+# Modelo -> versão achatada (FlatForest) equivalente
+FLORESTAS_ACHATADAS = {
+    'health_score': 'health_score_flat',
+    'churn': 'churn_flat',
+}
+
+class ModelRegistry:
+    """
+    Carrega os artefatos de 'modelos/' de forma preguiçosa e os mantém em cache.
+
+    Se o arquivo de um artefato for substituído (ex: um novo treino salvo com
+    'joblib.dump' + 'os.replace'), a próxima chamada a 'get' recarrega a nova
+    versão, sem reiniciar o serviço.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, mmap_mode='r', auto_reload=True):
+        self.model_dir = model_dir
+        self.mmap_mode = mmap_mode
+        self.auto_reload = auto_reload
+        self._cache = {}  # nome -> (mtime do arquivo, objeto)
+        self._lock = threading.Lock()
+
+    def path(self, nome):
+        return os.path.join(self.model_dir, ARTEFATOS[nome])
+
+    def get(self, nome):
+        """
+        Retorna o artefato 'nome' (ver ARTEFATOS), carregando-o se necessário.
+
+        Returns:
+            O objeto carregado, ou None se o arquivo não existir.
+        """
+        em_cache = self._cache.get(nome)
+        if em_cache is not None and not self.auto_reload:
+            return em_cache[1]
+
+        path = self.path(nome)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            if em_cache is not None and em_cache[0] is None:
+                # Artefato registrado em memória (sem arquivo)
+                return em_cache[1]
+            print(f"Erro: Modelo '{nome}' não encontrado em {path}")
+            print("Execute o treinamento (notebooks 03 e 05) para salvar os modelos.")
+            return None
+
+        if em_cache is not None and em_cache[0] in (mtime, None):
+            return em_cache[1]
+
+        with self._lock:
+            em_cache = self._cache.get(nome)
+            if em_cache is None or em_cache[0] not in (mtime, None):
+                if path.endswith('.npz'):
+                    objeto = FlatForest.load(path)
+                else:
+                    objeto = joblib.load(path, mmap_mode=self.mmap_mode)
+                self._cache[nome] = (mtime, objeto)
+                acao = "carregado" if em_cache is None else "recarregado (nova versão)"
+                print(f"Modelo '{nome}' {acao} de {path}")
+            return self._cache[nome][1]
+
+    def disponivel(self, nome):
+        """Indica se o artefato 'nome' existe (em disco ou registrado em memória), sem carregá-lo."""
+        return nome in self._cache or os.path.exists(self.path(nome))
+
+    def get_forest(self, nome):
+        """
+        Floresta usada no scoring: a versão achatada (FlatForest) se ela
+        existir, senão o RandomForestClassifier do scikit-learn.
+        """
+        achatada = FLORESTAS_ACHATADAS.get(nome)
+        if achatada is not None and self.disponivel(achatada):
+            return self.get(achatada)
+        return self.get(nome)
+
+    def version(self, nome):
+        """
+        Identificador da versão carregada de 'nome' (mtime do arquivo), para
+        invalidar resultados calculados com uma versão anterior do modelo.
+        Retorna None se o artefato não estiver disponível.
+        """
+        if self.get(nome) is None:
+            return None
+        mtime, objeto = self._cache[nome]
+        return str(mtime) if mtime is not None else f"memoria-{id(objeto)}"
+
+    def register(self, nome, objeto):
+        """Registra um artefato já em memória (ex: recém-treinado ou em testes)."""
+        with self._lock:
+            self._cache[nome] = (None, objeto)
+
+    def reload(self, nome=None):
+        """Descarta o cache (de um artefato ou de todos); o próximo 'get' relê do disco."""
+        with self._lock:
+            if nome is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(nome, None)
+
+    def preload(self, nomes=None):
+        """
+        Carrega os artefatos agora (ex: no processo mestre do gunicorn, antes do fork).
+        Por padrão, carrega as florestas usadas no scoring (achatadas, se existirem)
+        e o encoder apenas se o Health Score ainda depender dele.
+        """
+        if nomes is not None:
+            for nome in nomes:
+                self.get(nome)
+            return
+        for nome in FLORESTAS_ACHATADAS:
+            self.get_forest(nome)
+        if getattr(self.get_forest('health_score'), 'rotulos', None) is None:
+            self.get('label_encoder')
+
+# Instância única por processo, usada por predict_model e pela API
+registry = ModelRegistry()
+
+def save_artifact(objeto, path):
+    """
+    Salva um artefato com 'joblib.dump' de forma atômica (arquivo temporário +
+    'os.replace'), para que um serviço com o registro em uso nunca leia um
+    arquivo pela metade durante o hot-reload. Sem compressão, para que os
+    arrays possam ser mapeados com 'mmap_mode'.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    path_temporario = f"{path}.tmp-{os.getpid()}"
+    joblib.dump(objeto, path_temporario)
+    os.replace(path_temporario, path)
@@ -1,55 +1,40 @@
-import joblib
 import os
+import sys
 import numpy as np
+import pandas as pd
 
-# --- 1. Carregar os Artefatos (O "Cérebro" e o "Tradutor") ---
+# --- 1. Os Artefatos (O "Cérebro" e o "Tradutor") ---
 
 # Caminho para os modelos salvos na FASE 3
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-MODEL_PATH = os.path.join(PROJECT_ROOT, 'modelos', 'health_score_classifier.joblib')
-ENCODER_PATH = os.path.join(PROJECT_ROOT, 'modelos', 'label_encoder.joblib')
-
-# Carrega os arquivos
-try:
-    model = joblib.load(MODEL_PATH)
-    encoder = joblib.load(ENCODER_PATH)
-    print("Modelo de Health Score e Encoder carregados com sucesso.")
-except FileNotFoundError:
-    print(f"Erro: Modelos não encontrados em {PROJECT_ROOT}/modelos/")
-    print("Execute a FASE 3 (notebook 03) para treinar e salvar os modelos.")
-    model = None
-    encoder = None
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+# Os modelos NÃO são carregados ao importar este módulo: o registro carrega
+# o classificador e o encoder no primeiro uso (e recarrega se forem re-treinados)
+from models.model_registry import registry
+from models.classification_rules import REGRAS_CLASSIFICACAO
+from data.instrumentation import instrumented
 
 # --- 2. A "Tabela de Regras" de Saída (Baseada na sua imagem) ---
 
+# Derivada da tabela única de regras (classification_rules.py), a mesma
+# usada para gerar o "label" no treino
 REGRAS_SAIDA = {
-    'Alta Performance': {
-        "Atingimento de Meta (TPV)": ">= 100%",
-        "Health Score": "90-100",
-        "Ação Recomendada": "monitoria continua - oprotunidades de cross-sell"
-    },
-    'Boa Performance': {
-        "Atingimento de Meta (TPV)": "80 a 99%",
-        "Health Score": "75-89",
-        "Ação Recomendada": "manter condições + avaliar upsell"
-    },
-    'Performance Regular': {
-        "Atingimento de Meta (TPV)": "50 a 79%",
-        "Health Score": "50-74",
-        "Ação Recomendada": "revisão de condições + campanhas de engajamento"
-    },
-    'Baixa Performance': {
-        "Atingimento de Meta (TPV)": "10 a 49%",
-        "Health Score": "25-49",
-        "Ação Recomendada": "ações corretivas (renegociação, ajuste de taxa)"
-    },
-    'Critico': {
-        "Atingimento de Meta (TPV)": "< 10%",
-        "Health Score": "0-24",
-        "Ação Recomendada": "renegociação imediata ou decrescimento"
+    regra['classe']: {
+        "Atingimento de Meta (TPV)": regra["Atingimento de Meta (TPV)"],
+        "Health Score": regra["Health Score"],
+        "Ação Recomendada": regra["Ação Recomendada"]
     }
+    for regra in reversed(REGRAS_CLASSIFICACAO)
 }
 
+# Tabela de regras em formato de colunas (uma linha por classe), para o
+# mapeamento vetorizado classe -> regra em 'predict_health_score_batch'
+TABELA_REGRAS = pd.DataFrame.from_dict(REGRAS_SAIDA, orient='index')
+
 # --- 3. A Função de Predição (O "Motor") ---
 
 def predict_health_score(df_features_row):
@@ -64,7 +49,8 @@ def predict_health_score(df_features_row):
         dict: Um dicionário com a classificação e a ação recomendada.
     """
     
-    if model is None or encoder is None:
+    model = registry.get_forest('health_score')
+    if model is None:
         return {"erro": "Modelos não carregados."}
         
     # Garante que as colunas estejam na ordem correta que o modelo espera
@@ -75,31 +61,104 @@ def predict_health_score(df_features_row):
         return {"erro": f"Feature ausente nos dados de entrada: {e}"}
 
     # --- O CORAÇÃO DA IA ---
+    # (O mesmo cálculo do lote, para um único cliente)
+    df_resultado = predict_health_score_batch(features_para_prever)
+    if df_resultado is None:
+        # Ex: floresta carregada sem o 'label_encoder'
+        return {"erro": "Modelos não carregados."}
+    resultado = df_resultado.iloc[0].to_dict()
+    resultado["Health Score (Calculado)"] = float(resultado["Health Score (Calculado)"])
     
-    # 1. Prever a CLASSE (formato numérico, ex: 2)
-    predicao_numerica = model.predict(features_para_prever)
+    return resultado
+
+@instrumented('predict_health_score')
+def predict_health_score_batch(df_features):
+    """
+    Versão em lote de 'predict_health_score': classifica TODOS os clientes
+    de 'df_features' com uma única chamada ao modelo.
+
+    A classe vem do argmax de 'predict_proba' (é o que o 'model.predict'
+    do RandomForest faz internamente), então a floresta é avaliada uma vez só.
+    O mapeamento classe -> regra de saída também é feito de uma vez.
+
+    Args:
+        df_features (pd.DataFrame): Features da FASE 2 (uma linha por cliente).
+
+    Returns:
+        pd.DataFrame: Uma linha por cliente (mesmo índice de 'df_features') com
+                      as mesmas chaves do dicionário de 'predict_health_score',
+                      ou None se falhar.
+    """
     
-    # 2. Prever a PROBABILIDADE (o "Health Score" real)
-    # Retorna um array, ex: [[0.05, 0.15, 0.7, 0.05, 0.05]]
+    # Floresta achatada (flat_forest.py) se exportada; senão o modelo do scikit-learn
+    model = registry.get_forest('health_score')
+    rotulos = getattr(model, 'rotulos', None)
+    encoder = registry.get('label_encoder') if model is not None and rotulos is None else None
+    if model is None or (rotulos is None and encoder is None):
+        print("Erro: Modelos não carregados.")
+        return None
+        
+    try:
+        features_para_prever = df_features[model.feature_names_in_]
+    except KeyError as e:
+        print(f"Erro: Feature ausente nos dados de entrada: {e}")
+        return None
+
+    # 1. Uma única avaliação da floresta: probabilidades de todas as classes
     probabilidades = model.predict_proba(features_para_prever)
     
-    # Pega a probabilidade máxima (o 0.7) e transforma em Score (70)
-    score_real = np.max(probabilidades) * 100
+    # 2. Classe prevista = coluna de maior probabilidade (igual ao model.predict)
+    indice_classe = np.argmax(probabilidades, axis=1)
+    if rotulos is not None:
+        classe_texto = rotulos[indice_classe]
+    else:
+        classe_texto = encoder.inverse_transform(model.classes_[indice_classe])
     
-    # 3. "Traduzir" a classe numérica para texto
-    # ex: 2 -> 'Performance Regular'
-    classe_texto = encoder.inverse_transform(predicao_numerica)[0]
+    # 3. Health Score = probabilidade da classe prevista (0.7 -> 70)
+    score_real = np.round(probabilidades[np.arange(len(indice_classe)), indice_classe] * 100, 2)
     
-    # 4. Buscar a linha de classificação na nossa tabela de regras
-    linha_de_saida = REGRAS_SAIDA.get(classe_texto, {})
+    # 4. Linhas da tabela de regras de cada cliente (lookup vetorizado)
+    regras = TABELA_REGRAS.reindex(classe_texto)
     
-    # 5. Montar a resposta final
-    resultado = {
+    return pd.DataFrame({
         "Classificação": classe_texto,
-        "Health Score (Calculado)": round(score_real, 2),
-        "Range Score (Regra)": linha_de_saida.get("Health Score"),
-        "Ação Recomendada": linha_de_saida.get("Ação Recomendada"),
-        "Atingimento de Meta (Regra)": linha_de_saida.get("Atingimento de Meta (TPV)")
-    }
+        "Health Score (Calculado)": score_real,
+        "Range Score (Regra)": regras["Health Score"].to_numpy(),
+        "Ação Recomendada": regras["Ação Recomendada"].to_numpy(),
+        "Atingimento de Meta (Regra)": regras["Atingimento de Meta (TPV)"].to_numpy()
+    }, index=df_features.index)
+
+@instrumented('predict_churn')
+def predict_churn_batch(df_features):
+    """
+    Probabilidade de churn (modelo da FASE 5) para todos os clientes de
+    'df_features', com uma única chamada ao modelo.
+
+    Args:
+        df_features (pd.DataFrame): Features da FASE 2 (uma linha por cliente).
+
+    Returns:
+        pd.DataFrame: Uma linha por cliente (mesmo índice de 'df_features') com
+                      a probabilidade e a previsão de churn, ou None se falhar.
+    """
+    
+    model_churn = registry.get_forest('churn')
+    if model_churn is None:
+        print("Erro: Modelo de churn não carregado.")
+        return None
+        
+    try:
+        features_para_prever = df_features[model_churn.feature_names_in_]
+    except KeyError as e:
+        print(f"Erro: Feature ausente nos dados de entrada: {e}")
+        return None
+
+    # Probabilidade da classe 1 (Churn); a previsão é a classe de maior probabilidade
+    probabilidades = model_churn.predict_proba(features_para_prever.fillna(0))
+    indice_churn = list(model_churn.classes_).index(1)
+    prob_churn = probabilidades[:, indice_churn]
     
-    return resultado
\ No newline at end of file
+    return pd.DataFrame({
+        "Probabilidade de Churn": np.round(prob_churn * 100, 2),
+        "Churn Previsto": model_churn.classes_[np.argmax(probabilidades, axis=1)].astype(int)
+    }, index=df_features.index)
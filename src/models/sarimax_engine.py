@@ -0,0 +1,335 @@
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from models.model_registry import registry, save_artifact
+
+# Motor de previsão SARIMAX dos Indicadores Pais, com uma série por cliente
+# e por canal (meio de pagamento), em vez de um único 'modelo_sarimax.pkl'.
+#
+# Para cada série o motor guarda só o necessário para continuar o filtro de
+# Kalman: os parâmetros estimados e o estado previsto (média e covariância)
+# após a última observação. Assim:
+# - um dia novo é só um passo de FILTRO a partir do estado guardado, com os
+#   parâmetros fixos (milissegundos, sem re-estimar por máxima verossimilhança);
+# - a cada 'refit_a_cada' dias a série é re-AJUSTADA (MLE), começando dos
+#   parâmetros anteriores (warm start: poucas iterações do otimizador);
+# - a previsão parte do estado guardado, sem reprocessar o histórico.
+#
+# Os ajustes rodam em paralelo em um pool de processos (uma série é
+# independente das outras).
+
+SARIMAX_PATH = registry.path('sarimax')
+
+# Especificação padrão: dados diários com sazonalidade semanal
+ESPECIFICACAO_PADRAO = {
+    'order': (1, 0, 1),
+    'seasonal_order': (1, 0, 0, 7),
+    'trend': 'c',
+}
+
+MIN_OBSERVACOES = 28  # séries mais curtas não são ajustadas
+JANELA_AJUSTE = 365   # dias mais recentes usados no ajuste (MLE)
+REFIT_A_CADA = 28     # dias filtrados antes de re-ajustar a série
+MAX_ITERACOES = 50    # iterações do otimizador por ajuste
+
+# Abaixo deste custo (em "ajustes equivalentes"; um filtro custa ~1/50 de um
+# ajuste) subir o pool de processos custa mais do que rodar no próprio processo
+CUSTO_MINIMO_POOL = 8
+
+# Nível da série -> coluna do histórico
+NIVEIS = {
+    'cliente': 'id_cliente',
+    'canal': 'meio_pagamento',
+}
+
+INDICADORES = ('tpv', 'margem_op', 'take_rate')
+
+def build_indicator_series(df_historico, nivel='cliente', indicador='tpv'):
+    """
+    Monta as séries diárias de um Indicador Pai a partir do histórico
+    (saída de 'get_historical_data'): uma coluna por cliente ou canal.
+
+    Dias sem transação valem 0 para TPV e margem. A take rate (margem / TPV)
+    fica NaN nesses dias (o filtro de Kalman trata como observação ausente).
+
+    Args:
+        df_historico (pd.DataFrame): Histórico da FASE 1.
+        nivel (str): 'cliente' ou 'canal' (ver NIVEIS).
+        indicador (str): 'tpv', 'margem_op' ou 'take_rate'.
+
+    Returns:
+        pd.DataFrame: Índice diário ('data') e colunas '<nivel>:<id>:<indicador>',
+                      ou None se os argumentos forem inválidos.
+    """
+    if nivel not in NIVEIS or indicador not in INDICADORES:
+        print(f"Erro: nível '{nivel}' ou indicador '{indicador}' inválido.")
+        return None
+
+    # 1. Soma diária de TPV e margem por (data, cliente/canal)
+    df = df_historico[['data', NIVEIS[nivel], 'tpv_dia', 'margem_op_dia']].copy()
+    df['data'] = pd.to_datetime(df['data'])
+    somas = df.groupby(['data', NIVEIS[nivel]], observed=True)[['tpv_dia', 'margem_op_dia']].sum()
+
+    # 2. Matriz densa dia x série, com todos os dias do período
+    datas = pd.date_range(somas.index.levels[0].min(), somas.index.levels[0].max(), freq='D', name='data')
+    tpv = somas['tpv_dia'].unstack().reindex(datas).fillna(0.0)
+    margem = somas['margem_op_dia'].unstack().reindex(datas).fillna(0.0)
+
+    if indicador == 'tpv':
+        df_series = tpv
+    elif indicador == 'margem_op':
+        df_series = margem
+    else:
+        df_series = (margem / tpv.where(tpv > 0)).astype(float)
+
+    df_series.columns = [f'{nivel}:{id_serie}:{indicador}' for id_serie in df_series.columns]
+    return df_series.astype(np.float64)
+
+def _sarimax(endog, exog, especificacao):
+    return SARIMAX(endog, exog=exog, **especificacao)
+
+def _registro(resultado, ultima_data, dias_desde_ajuste, params=None):
+    return {
+        'params': np.asarray(resultado.params if params is None else params),
+        'estado': resultado.predicted_state[:, -1].copy(),
+        'cov_estado': resultado.predicted_state_cov[:, :, -1].copy(),
+        'ultima_data': ultima_data,
+        'dias_desde_ajuste': dias_desde_ajuste,
+    }
+
+def _ajustar(y, exog, especificacao, params_iniciais):
+    """Ajuste por máxima verossimilhança (warm start se houver 'params_iniciais')."""
+    modelo = _sarimax(y, exog, especificacao)
+    if params_iniciais is not None and len(params_iniciais) != len(modelo.start_params):
+        params_iniciais = None  # especificação mudou: começa do zero
+    resultado = modelo.fit(start_params=params_iniciais, disp=False, cov_type='none', maxiter=MAX_ITERACOES)
+    return resultado, resultado.mle_retvals.get('iterations') if resultado.mle_retvals else None
+
+def _filtrar(y_novos, exog_novos, especificacao, registro):
+    """Continua o filtro de Kalman a partir do estado guardado, com os parâmetros fixos."""
+    modelo = _sarimax(y_novos, exog_novos, especificacao)
+    modelo.initialize_known(registro['estado'], registro['cov_estado'])
+    return modelo.filter(registro['params'])
+
+def _processar_tarefas(tarefas, especificacao):
+    """
+    Executa um lote de tarefas (no processo do pool).
+
+    Cada tarefa é (chave, acao, y, exog, ultima_data, registro_anterior), com
+    'acao' em {'ajuste', 'filtro'}. Devolve (chave, acao, registro, erro, iteracoes).
+    """
+    saida = []
+    with warnings.catch_warnings():
+        # Avisos de convergência do statsmodels (um por série) poluiriam o log
+        warnings.simplefilter('ignore')
+        for chave, acao, y, exog, ultima_data, anterior in tarefas:
+            try:
+                if acao == 'ajuste':
+                    params_iniciais = anterior['params'] if anterior is not None else None
+                    resultado, iteracoes = _ajustar(y, exog, especificacao, params_iniciais)
+                    saida.append((chave, acao, _registro(resultado, ultima_data, 0), None, iteracoes))
+                else:
+                    resultado = _filtrar(y, exog, especificacao, anterior)
+                    registro = _registro(resultado, ultima_data, anterior['dias_desde_ajuste'] + len(y),
+                                         params=anterior['params'])
+                    saida.append((chave, acao, registro, None, None))
+            except Exception as e:
+                saida.append((chave, acao, None, str(e), None))
+    return saida
+
+def _inicializar_worker():
+    # Um processo por núcleo: a álgebra linear de cada um fica em 1 thread
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+class SarimaxEngine:
+    """
+    Conjunto de modelos SARIMAX (um por série), atualizados em lote.
+
+    Args:
+        especificacao (dict): Argumentos do SARIMAX (order, seasonal_order, trend).
+        refit_a_cada (int): Dias filtrados antes de re-ajustar (MLE) uma série.
+        janela_ajuste (int): Dias mais recentes usados em cada ajuste.
+        n_workers (int): Processos do pool (None = todos os núcleos; 1 = sem pool).
+        tarefas_por_lote (int): Séries enviadas juntas a cada processo.
+    """
+
+    def __init__(self, especificacao=None, refit_a_cada=REFIT_A_CADA, janela_ajuste=JANELA_AJUSTE,
+                 n_workers=None, tarefas_por_lote=16):
+        self.especificacao = dict(especificacao or ESPECIFICACAO_PADRAO)
+        self.refit_a_cada = refit_a_cada
+        self.janela_ajuste = janela_ajuste
+        self.n_workers = n_workers
+        self.tarefas_por_lote = tarefas_por_lote
+        self.colunas_exog = None
+        self.estados = {}  # chave da série -> registro (params, estado, cov_estado, ...)
+
+    def _planejar(self, df_series, exog):
+        """Decide, série a série, entre ajuste, filtro ou nada a fazer."""
+        tarefas, ignoradas = [], 0
+        datas = df_series.index
+        exog_valores = exog.reindex(datas).to_numpy(np.float64) if exog is not None else None
+
+        for posicao, chave in enumerate(df_series.columns):
+            y = df_series.iloc[:, posicao].to_numpy(np.float64)
+            anterior = self.estados.get(chave)
+            if anterior is not None and datas[-1] <= anterior['ultima_data']:
+                continue
+
+            # Janela de ajuste: começa na primeira observação não nula (cliente novo)
+            validos = np.flatnonzero(~np.isnan(y) & (y != 0))
+            inicio = max(validos[0], len(y) - self.janela_ajuste) if len(validos) else len(y)
+            pode_ajustar = len(y) - inicio >= MIN_OBSERVACOES
+
+            if anterior is not None:
+                # Dias desde a última observação (dias ausentes viram NaN)
+                datas_novas = pd.date_range(anterior['ultima_data'] + pd.Timedelta(days=1), datas[-1], freq='D')
+                refit = anterior['dias_desde_ajuste'] + len(datas_novas) >= self.refit_a_cada
+                if not (refit and pode_ajustar):
+                    y_novos = pd.Series(y, index=datas).reindex(datas_novas).to_numpy()
+                    exog_novos = exog.reindex(datas_novas).to_numpy(np.float64) if exog is not None else None
+                    tarefas.append((chave, 'filtro', y_novos, exog_novos, datas[-1], anterior))
+                    continue
+
+            if not pode_ajustar:
+                ignoradas += 1
+                continue
+            exog_ajuste = exog_valores[inicio:] if exog_valores is not None else None
+            tarefas.append((chave, 'ajuste', y[inicio:], exog_ajuste, datas[-1], anterior))
+
+        return tarefas, ignoradas
+
+    def update(self, df_series, exog=None):
+        """
+        Incorpora as observações de 'df_series' (novas séries ou dias novos).
+
+        Séries novas (ou com 'refit_a_cada' dias desde o último ajuste) são
+        ajustadas por MLE, partindo dos parâmetros anteriores quando existem.
+        As demais só avançam o filtro com os dias posteriores a 'ultima_data'.
+
+        Args:
+            df_series (pd.DataFrame): Índice diário e uma coluna por série
+                                      (ver 'build_indicator_series').
+            exog (pd.DataFrame, opcional): Variáveis exógenas comuns a todas as
+                                           séries, indexadas pela data.
+
+        Returns:
+            dict: Resumo (ajustes, filtros, ignoradas, falhas, tempo_s, ajustes_por_s).
+        """
+        if exog is not None:
+            if self.colunas_exog is not None and list(exog.columns) != self.colunas_exog:
+                raise ValueError(f"Exógenas diferentes das usadas no ajuste: {self.colunas_exog}")
+            self.colunas_exog = list(exog.columns)
+
+        inicio = time.perf_counter()
+        tarefas, ignoradas = self._planejar(df_series, exog)
+        lotes = [tarefas[i:i + self.tarefas_por_lote] for i in range(0, len(tarefas), self.tarefas_por_lote)]
+
+        # 1. Ajustes/filtros em paralelo (ou no próprio processo, com 1 worker
+        # ou poucas tarefas)
+        n_ajustes = sum(tarefa[1] == 'ajuste' for tarefa in tarefas)
+        custo = n_ajustes + (len(tarefas) - n_ajustes) / 50
+        if self.n_workers == 1 or len(lotes) <= 1 or custo < CUSTO_MINIMO_POOL:
+            resultados = [_processar_tarefas(lote, self.especificacao) for lote in lotes]
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_inicializar_worker) as pool:
+                resultados = list(pool.map(_processar_tarefas, lotes, [self.especificacao] * len(lotes)))
+
+        # 2. Atualiza o cache de estados
+        resumo = {'ajustes': 0, 'filtros': 0, 'ignoradas': ignoradas, 'falhas': 0, 'iteracoes_media': None}
+        iteracoes = []
+        for lote in resultados:
+            for chave, acao, registro, erro, n_iteracoes in lote:
+                if erro is not None:
+                    resumo['falhas'] += 1
+                    continue
+                self.estados[chave] = registro
+                resumo['ajustes' if acao == 'ajuste' else 'filtros'] += 1
+                if n_iteracoes is not None:
+                    iteracoes.append(n_iteracoes)
+
+        resumo['tempo_s'] = round(time.perf_counter() - inicio, 3)
+        if iteracoes:
+            resumo['iteracoes_media'] = round(float(np.mean(iteracoes)), 1)
+        print(f"SARIMAX: {resumo['ajustes']} ajustes, {resumo['filtros']} filtros, "
+              f"{resumo['ignoradas']} séries ignoradas, {resumo['falhas']} falhas em {resumo['tempo_s']}s")
+        return resumo
+
+    def forecast(self, chave, steps, exog=None):
+        """
+        Previsão de 'steps' dias a partir da última observação da série.
+
+        Args:
+            chave (str): Série ('<nivel>:<id>:<indicador>').
+            steps (int): Horizonte, em dias.
+            exog (array-like, opcional): Exógenas futuras ('steps' linhas),
+                                         obrigatórias se o motor usa exógenas.
+
+        Returns:
+            pd.DataFrame: Índice com as datas previstas e as colunas
+                          'previsao' e 'variancia'.
+        """
+        registro = self.estados.get(chave)
+        if registro is None:
+            raise KeyError(f"Série '{chave}' não encontrada no motor SARIMAX.")
+        if steps < 1:
+            raise ValueError("'steps' deve ser >= 1.")
+
+        if self.colunas_exog:
+            if exog is None:
+                raise ValueError(f"Exógenas futuras obrigatórias: {self.colunas_exog}")
+            exog = np.asarray(exog, dtype=np.float64).reshape(steps, len(self.colunas_exog))
+        else:
+            exog = None
+
+        # Filtro sobre 'steps' observações ausentes: as previsões um passo à
+        # frente, sem observações para corrigir o estado, são a previsão
+        # de vários passos a partir do estado guardado
+        resultado = _filtrar(np.full(steps, np.nan), exog, self.especificacao, registro)
+        datas = pd.date_range(registro['ultima_data'] + pd.Timedelta(days=1), periods=steps, freq='D')
+        return pd.DataFrame({
+            'previsao': resultado.forecasts[0],
+            'variancia': resultado.forecasts_error_cov[0, 0],
+        }, index=datas)
+
+    def save(self, path=SARIMAX_PATH):
+        """Salva o motor (parâmetros e estados de todas as séries) de forma atômica."""
+        save_artifact(self, path)
+
+    @classmethod
+    def load(cls, path=SARIMAX_PATH):
+        """Carrega um motor salvo, ou retorna um motor vazio se o arquivo não existir."""
+        if not os.path.exists(path):
+            return cls()
+        import joblib
+        return joblib.load(path)
+
+if __name__ == '__main__':
+    # Job diário (rode com: python src/models/sarimax_engine.py)
+    from data.history_cache import get_cached_historical_data
+
+    print("--- Atualizando o motor SARIMAX (clientes e canais) ---")
+
+    df_historico = get_cached_historical_data(dat_start_filter='2024-01-01')
+    if df_historico is None:
+        print("Falha ao carregar o histórico.")
+    else:
+        engine = SarimaxEngine.load()
+        for nivel in NIVEIS:
+            engine.update(build_indicator_series(df_historico, nivel=nivel, indicador='tpv'))
+        engine.save()
+        print(f"Motor SARIMAX salvo em {SARIMAX_PATH} ({len(engine.estados)} séries).")
@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from models.model_registry import FLORESTAS_ACHATADAS, registry
+from models.predict_model import predict_churn_batch, predict_health_score_batch
+
+# Tabela de scores pré-calculados: uma linha por cliente, com chave primária
+# 'id_cliente', para que o consumidor (Price Health Scoring) leia o score com
+# uma única busca em vez de rodar a FASE 2 + o modelo a cada chamada.
+SCORES_DB_PATH = os.environ.get('SCORES_DB', os.path.join(PROJECT_ROOT, 'dados', 'scores.sqlite'))
+
+# Colunas do resultado de 'predict_health_score_batch' / 'predict_churn_batch'
+# -> colunas da tabela
+COLUNAS_SCORE = {
+    "Classificação": 'classificacao',
+    "Health Score (Calculado)": 'health_score',
+    "Range Score (Regra)": 'range_score',
+    "Ação Recomendada": 'acao_recomendada',
+    "Atingimento de Meta (Regra)": 'atingimento_meta_regra',
+    "Probabilidade de Churn": 'probabilidade_churn',
+    "Churn Previsto": 'churn_previsto',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id_cliente TEXT PRIMARY KEY,
+    hash_features INTEGER NOT NULL,
+    classificacao TEXT,
+    health_score REAL,
+    range_score TEXT,
+    acao_recomendada TEXT,
+    atingimento_meta_regra TEXT,
+    probabilidade_churn REAL,
+    churn_previsto INTEGER,
+    atualizado_em TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS materializacao (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+def hash_features(df_features):
+    """Hash (int64) de cada linha de features, para detectar clientes alterados."""
+    return pd.util.hash_pandas_object(df_features, index=False).to_numpy().view(np.int64)
+
+class ScoreStore:
+    """
+    Tabela SQLite de scores por cliente.
+
+    - 'materialize' pontua os clientes e grava o resultado, re-pontuando só
+      quem teve as features alteradas desde a última materialização (ou todos,
+      se a versão de algum modelo mudou).
+    - 'get' responde a leitura de um cliente com uma busca pela chave primária.
+    """
+
+    def __init__(self, db_path=SCORES_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with sqlite3.connect(db_path) as conexao:
+            conexao.execute('PRAGMA journal_mode=WAL')  # leituras não bloqueiam a escrita
+            conexao.executescript(SCHEMA)
+
+    def _conexao(self):
+        # Uma conexão por thread (as threads do servidor leem em paralelo)
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = self._local.conexao = sqlite3.connect(self.db_path, check_same_thread=False)
+            conexao.row_factory = sqlite3.Row
+        return conexao
+
+    def _versao_modelos(self):
+        # Versões dos artefatos usados no scoring (as florestas achatadas, se exportadas)
+        nomes = [achatada if registry.disponivel(achatada) else nome
+                 for nome, achatada in FLORESTAS_ACHATADAS.items()]
+        return "|".join(str(registry.version(nome)) for nome in nomes + ['label_encoder'])
+
+    def materialize(self, df_features):
+        """
+        Pontua e grava os clientes de 'df_features' cujas features mudaram.
+
+        Args:
+            df_features (pd.DataFrame): Saída de 'engineer_features' (índice 'id_cliente').
+
+        Returns:
+            int: Quantidade de clientes (re)pontuados.
+        """
+        conexao = self._conexao()
+        versao = self._versao_modelos()
+        versao_gravada = conexao.execute(
+            "SELECT valor FROM materializacao WHERE chave = 'versao_modelos'"
+        ).fetchone()
+
+        hashes = pd.Series(hash_features(df_features), index=df_features.index.astype(str))
+
+        # 1. Invalidação: só clientes novos ou com features diferentes
+        # (ou todos, se algum modelo mudou de versão)
+        if versao_gravada is None or versao_gravada[0] != versao:
+            print("Versão dos modelos mudou (ou primeira materialização): pontuando todos os clientes.")
+            alterados = hashes.index
+        else:
+            gravados = pd.read_sql_query("SELECT id_cliente, hash_features FROM scores", conexao)
+            gravados = gravados.set_index('id_cliente')['hash_features']
+            alterados = hashes.index[hashes.ne(gravados.reindex(hashes.index)).to_numpy()]
+
+        print(f"Materializando scores: {len(alterados)} de {len(hashes)} clientes alterados.")
+        if len(alterados) == 0:
+            return 0
+
+        # 2. Scoring em lote dos clientes alterados
+        df_alterados = df_features.loc[df_features.index.astype(str).isin(alterados)]
+        df_scores = predict_health_score_batch(df_alterados)
+        if df_scores is None:
+            return 0
+        if registry.get_forest('churn') is not None:
+            # Sem o resultado do churn (ex: feature ausente) as colunas de churn ficam nulas
+            df_churn = predict_churn_batch(df_alterados)
+            if df_churn is not None:
+                df_scores = df_scores.join(df_churn)
+
+        df_scores = df_scores.rename(columns=COLUNAS_SCORE)
+        df_scores = df_scores.reindex(columns=list(COLUNAS_SCORE.values()))
+        df_scores.index = df_scores.index.astype(str)
+        df_scores['hash_features'] = hashes.loc[df_scores.index].to_numpy()
+        df_scores['atualizado_em'] = pd.Timestamp.now().isoformat(timespec='seconds')
+
+        # 3. Upsert (uma transação só)
+        colunas = ['id_cliente'] + list(df_scores.columns)
+        registros = df_scores.reset_index().astype(object)
+        registros = registros.where(registros.notna(), None)
+        with conexao:
+            conexao.executemany(
+                f"INSERT OR REPLACE INTO scores ({', '.join(colunas)}) "
+                f"VALUES ({', '.join('?' * len(colunas))})",
+                registros[colunas].itertuples(index=False, name=None)
+            )
+            conexao.execute(
+                "INSERT OR REPLACE INTO materializacao VALUES ('versao_modelos', ?)", (versao,)
+            )
+        return len(df_scores)
+
+    def get(self, id_cliente):
+        """Score materializado de um cliente (dict), ou None se não existir."""
+        linha = self._conexao().execute(
+            "SELECT * FROM scores WHERE id_cliente = ?", (str(id_cliente),)
+        ).fetchone()
+        return dict(linha) if linha is not None else None
+
+if __name__ == '__main__':
+    # Job de materialização (rode com: python src/models/score_store.py)
+    from data.history_cache import get_cached_historical_data
+    from data.make_dataset import get_metas_from_redshift
+    from features.build_features import engineer_features
+
+    print("--- Materializando a tabela de scores ---")
+
+    df_historico = get_cached_historical_data(dat_start_filter='2024-01-01')
+    df_metas = get_metas_from_redshift()
+
+    if df_historico is not None and df_metas is not None:
+        df_features = engineer_features(df_historico, df_metas)
+        n_alterados = ScoreStore().materialize(df_features)
+        print(f"Tabela de scores atualizada em {SCORES_DB_PATH} ({n_alterados} clientes).")
+    else:
+        print("Falha ao carregar os dados para a materialização.")
@@ -1,6 +1,6 @@
-import pandas as pd
-import joblib
+import argparse
 import os
+import sys
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix
@@ -9,27 +9,73 @@ import warnings
 # Ignorar avisos futuros do scikit-learn
 warnings.filterwarnings('ignore', category=FutureWarning)
 
-# Caminhos
+# Adiciona a raiz do projeto e a pasta 'src' ao path para podermos importar
+# o 'model_registry' e os artefatos da FASE 5 ('data.artifacts')
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-PROCESSED_DATA_PATH = os.path.join(PROJECT_ROOT, 'dados', 'processed', 'features_churn_clientes.csv')
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from data.artifacts import FEATURES_CHURN_PATH, artifact_hash, code_hash, is_up_to_date, read_artifact, write_metadata
+from data.instrumentation import instrumented, span
+
+from models import flat_forest, tuning
+from models.flat_forest import export_forest
+from models.model_registry import save_artifact
+from models.tuning import ESPACO_CHURN, save_tuning_report, tune_forest
+
+# Caminhos
+PROCESSED_DATA_PATH = FEATURES_CHURN_PATH
 MODEL_OUTPUT_PATH = os.path.join(PROJECT_ROOT, 'modelos')
+MODEL_PATH = os.path.join(MODEL_OUTPUT_PATH, 'churn_predictor.joblib')
 
-def train_and_save_churn_model():
+# Código do treino: o hash entra nos metadados do modelo (mesmo esquema da
+# fase de treino em src/pipeline/run_pipeline.py, que lê e grava o mesmo arquivo)
+CODIGO_TREINO = [sys.modules[__name__], flat_forest, tuning]
+
+def training_upstream(tune=False):
+    """Entradas do modelo salvo: hash do código, 'tune' e hash da tabela de treino."""
+    return {'codigo': code_hash(CODIGO_TREINO), 'tune': tune,
+            'features_churn_clientes': artifact_hash(PROCESSED_DATA_PATH)}
+
+# Colunas fora do modelo de churn: 'atingimento_meta_tpv', 'tpv_meta',
+# 'tpv_total' e 'Classificacao' (se existir) são do Modelo 1 (Score), e
+# 'is_churn' é o próprio alvo.
+FEATURES_EXCLUIDAS = [
+    'atingimento_meta_tpv', 'tpv_meta', 'tpv_total',
+    'Classificacao', 'is_churn'
+]
+
+@instrumented('treino_churn')
+def train_and_save_churn_model(tune=False, n_workers=-1, force=False):
     """
     Função principal da FASE 5 (Modelagem).
     Carrega features+labels de churn, treina o modelo e salva o artefacto.
+
+    Args:
+        tune (bool): Se True, escolhe os parâmetros da floresta com a busca
+                     de tuning.py (successive halving + validação cruzada)
+                     em vez dos valores fixos.
+        n_workers (int): Processos usados na busca (-1 = todos os núcleos).
+        force (bool): Se True, treina mesmo que a tabela de treino não tenha mudado.
     """
     
     print("--- Iniciando FASE 5: Treinamento do Modelo de Churn ---")
+
+    # 0. Pula o treino se o modelo salvo já veio desta mesma tabela (e do mesmo código)
+    upstream = training_upstream(tune)
+    if not force and upstream['features_churn_clientes'] is not None and is_up_to_date(MODEL_PATH, upstream):
+        print(f"Tabela de treino sem mudanças desde o último treino ({upstream['features_churn_clientes']}). "
+              "Use --force para treinar de novo.")
+        return
     
     # 1. Carregar DataFrame (da FASE 5 - Preparação)
-    try:
-        df_churn_treino = pd.read_csv(PROCESSED_DATA_PATH, index_col='id_cliente')
-        print(f"DataFrame de treino de churn carregado: {df_churn_treino.shape}")
-    except FileNotFoundError:
-        print(f"Erro: Arquivo 'features_churn_clientes.csv' não encontrado em {PROCESSED_DATA_PATH}")
+    df_churn_treino = read_artifact(PROCESSED_DATA_PATH)
+    if df_churn_treino is None:
         print("Certifique-se que a FASE 5 (notebook 04) foi executada com sucesso.")
         return
+    print(f"DataFrame de treino de churn carregado: {df_churn_treino.shape}")
 
     # 2. Preparação para Treino
     
@@ -37,16 +83,10 @@ def train_and_save_churn_model():
     y = df_churn_treino['is_churn']
     
     # X = São todas as 'features' (atributos)
-    # IMPORTANTE: Excluímos 'atingimento_meta_tpv', 'tpv_meta', 'tpv_total'
-    # e 'Classificacao' (se existir), pois são do Modelo 1 (Score).
-    # Também excluímos o próprio 'is_churn' da lista de features.
+    # IMPORTANTE: Excluímos as colunas do Modelo 1 (Score) e o próprio
+    # 'is_churn' da lista de features (ver FEATURES_EXCLUIDAS).
     
-    features_para_excluir = [
-        'atingimento_meta_tpv', 'tpv_meta', 'tpv_total', 
-        'Classificacao', 'is_churn'
-    ]
-    
-    features_list = [col for col in df_churn_treino.columns if col not in features_para_excluir]
+    features_list = [col for col in df_churn_treino.columns if col not in FEATURES_EXCLUIDAS]
     
     X = df_churn_treino[features_list]
     
@@ -73,18 +113,28 @@ def train_and_save_churn_model():
     # class_weight='balanced' é fundamental.
     # Diz ao modelo: "Dê mais importância (peso) aos erros na classe '1' (churn),
     # porque ela é mais rara e mais importante de acertar."
-    model_churn = RandomForestClassifier(
-        n_estimators=100, 
-        random_state=42, 
-        max_depth=8,
-        class_weight='balanced' 
-    )
-    
-    model_churn.fit(X_train, y_train)
+    with span('fit', linhas_entrada=len(X_train)):
+        if tune:
+            # Busca dos parâmetros, mantendo o class_weight='balanced'.
+            # 'average_precision' avalia a ordenação da classe rara (churn)
+            model_churn, relatorio = tune_forest(X_train, y_train, ESPACO_CHURN, 'churn',
+                                                 params_fixos={'class_weight': 'balanced'},
+                                                 scoring='average_precision', n_workers=n_workers)
+            save_tuning_report(relatorio, MODEL_OUTPUT_PATH)
+        else:
+            model_churn = RandomForestClassifier(
+                n_estimators=100, 
+                random_state=42, 
+                max_depth=8,
+                class_weight='balanced' 
+            )
+        
+            model_churn.fit(X_train, y_train)
     print("Treinamento concluído.")
 
     # 5. Avaliação (Ver se o modelo é bom)
-    y_pred = model_churn.predict(X_test)
+    with span('predict', linhas_entrada=len(X_test)):
+        y_pred = model_churn.predict(X_test)
     
     print("\n--- Relatório de Classificação (Churn) ---")
     # Foco no 'recall' da classe '1':
@@ -98,14 +148,30 @@ def train_and_save_churn_model():
     
     # 6. Salvar Modelo
     os.makedirs(MODEL_OUTPUT_PATH, exist_ok=True)
-    model_path = os.path.join(MODEL_OUTPUT_PATH, 'churn_predictor.joblib')
+    model_path = MODEL_PATH
     
-    joblib.dump(model_churn, model_path)
+    # Escrita atômica: a API recarrega a nova versão sem ler arquivo pela metade
+    save_artifact(model_churn, model_path)
+
+    # Versão achatada da floresta (.npz), usada no scoring sem o scikit-learn
+    flat_path = os.path.join(MODEL_OUTPUT_PATH, 'churn_predictor.npz')
+    export_forest(model_churn, flat_path)
+
+    # Hash da tabela usada, para o próximo treino saber se pode ser pulado
+    write_metadata(model_path, upstream)
     
     print(f"\nModelo de CHURN salvo em: {model_path}")
+    print(f"Floresta achatada salva em: {flat_path}")
     print("--- FASE 5 (Modelagem) Concluída ---")
 
 if __name__ == '__main__':
     # Permite rodar este script diretamente do terminal
     # (com o venv ativado): python src/models/train_churn_model.py
-    train_and_save_churn_model()
\ No newline at end of file
+    # Modo tuning: python src/models/train_churn_model.py --tune --workers 8
+    parser = argparse.ArgumentParser(description="FASE 5: treino do modelo de churn.")
+    parser.add_argument('--tune', action='store_true', help="Busca os parâmetros da floresta (tuning.py).")
+    parser.add_argument('--workers', type=int, default=-1, help="Processos da busca (-1 = todos os núcleos).")
+    parser.add_argument('--force', action='store_true', help="Treina mesmo sem mudanças na tabela de treino.")
+    args = parser.parse_args()
+
+    train_and_save_churn_model(tune=args.tune, n_workers=args.workers, force=args.force)
\ No newline at end of file
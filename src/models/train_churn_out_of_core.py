@@ -0,0 +1,279 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import average_precision_score, classification_report, confusion_matrix, roc_auc_score
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from data.artifacts import artifact_hash, write_metadata
+from models.flat_forest import export_forest
+from models.model_registry import save_artifact
+from models.train_churn_model import FEATURES_EXCLUIDAS, MODEL_OUTPUT_PATH, MODEL_PATH, PROCESSED_DATA_PATH
+
+# Treino do modelo de churn (FASE 5) fora da memória, para carteiras cuja
+# tabela de features não cabe na RAM.
+#
+# - A tabela é lida em blocos já tipados (float32, só as colunas usadas):
+#   do artefato Feather por memory map, do CSV com 'read_csv(chunksize=...)'
+#   ou de um Parquet com 'iter_batches'.
+# - O split treino/teste é estratificado em streaming: dentro de cada classe,
+#   exatamente 'test_size' das linhas vai para o teste, espaçadas ao longo
+#   do arquivo (amostragem sistemática com início aleatório por classe).
+# - A floresta cresce por blocos: cada bloco de treino adiciona
+#   'arvores_por_bloco' árvores (warm_start), treinadas só com aquele bloco.
+# - As linhas de teste vão para um arquivo binário em disco e são avaliadas
+#   ao final, abertas como memmap.
+#
+# Em memória fica só um bloco por vez, mais as probabilidades do teste
+# (8 bytes por cliente de teste). A qualidade deve ficar dentro de
+# TOLERANCIA_AUC do modelo treinado em memória (ver
+# src/benchmarks/bench_churn_out_of_core.py).
+
+LINHAS_POR_BLOCO = 100_000
+ARVORES_POR_BLOCO = 10
+
+# Diferença máxima aceita de ROC AUC (teste) em relação ao modelo em memória
+TOLERANCIA_AUC = 0.01
+
+def iter_churn_chunks(path=PROCESSED_DATA_PATH, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Lê a tabela de treino do churn em blocos tipados.
+
+    Args:
+        path (str): Artefato Feather do notebook 04 (lido por memory map), CSV
+                    ou Parquet com as mesmas colunas.
+        linhas_por_bloco (int): Clientes por bloco.
+
+    Yields:
+        tuple: (X float32 sem NaN, com as colunas de features; y int8 com 'is_churn')
+    """
+    if path.endswith('.feather') and not os.path.exists(path):
+        # Ainda só existe o CSV antigo
+        path = os.path.splitext(path)[0] + '.csv'
+
+    if path.endswith('.feather'):
+        import pyarrow.feather as feather
+
+        # Memory map: só as páginas do bloco atual são lidas do disco
+        tabela = feather.read_table(path, memory_map=True)
+        colunas = [col for col in tabela.column_names
+                   if col not in FEATURES_EXCLUIDAS and col != 'id_cliente' and not col.startswith('__')]
+        tabela = tabela.select(colunas + ['is_churn'])
+        blocos = (tabela.slice(inicio, linhas_por_bloco).to_pandas().astype(np.float32)
+                  for inicio in range(0, tabela.num_rows, linhas_por_bloco))
+    elif path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        arquivo = pq.ParquetFile(path)
+        colunas = [col for col in arquivo.schema_arrow.names
+                   if col not in FEATURES_EXCLUIDAS and col != 'id_cliente' and not col.startswith('__')]
+        blocos = (lote.to_pandas().astype(np.float32)
+                  for lote in arquivo.iter_batches(batch_size=linhas_por_bloco, columns=colunas + ['is_churn']))
+    else:
+        # Só o cabeçalho, para saber as colunas (a 1ª é o índice 'id_cliente')
+        cabecalho = pd.read_csv(path, nrows=0).columns
+        colunas = [col for col in cabecalho[1:] if col not in FEATURES_EXCLUIDAS]
+        blocos = pd.read_csv(path, usecols=colunas + ['is_churn'], dtype=np.float32,
+                             chunksize=linhas_por_bloco)
+
+    for df_bloco in blocos:
+        # Limpa possíveis NaNs (ex: se um cliente teve 0 transações)
+        yield df_bloco[colunas].fillna(0), df_bloco['is_churn'].to_numpy().astype(np.int8)
+
+class StreamingStratifiedSplit:
+    """
+    Split treino/teste estratificado em streaming: a k-ésima linha de uma
+    classe vai para o teste quando floor(k * test_size + fase) avança, então
+    cada classe tem exatamente floor(n * test_size) linhas de teste (±1),
+    sem conhecer 'n' de antemão.
+    """
+
+    def __init__(self, test_size=0.25, random_state=42):
+        self.test_size = test_size
+        self._rng = np.random.default_rng(random_state)
+        self._vistos = {}  # classe -> linhas já vistas
+        self._fases = {}   # classe -> início aleatório em [0, 1)
+
+    def __call__(self, y):
+        """Máscara booleana (True = teste) para o próximo bloco de rótulos."""
+        teste = np.zeros(len(y), dtype=bool)
+        for classe in np.unique(y):
+            posicoes = np.flatnonzero(y == classe)
+            if classe not in self._vistos:
+                self._vistos[classe] = 0
+                self._fases[classe] = self._rng.random()
+            k = self._vistos[classe] + np.arange(1, len(posicoes) + 1)
+            fase = self._fases[classe]
+            teste[posicoes] = (np.floor(k * self.test_size + fase) > np.floor((k - 1) * self.test_size + fase))
+            self._vistos[classe] += len(posicoes)
+        return teste
+
+def peak_rss_mb():
+    """Pico de memória residente do processo atual (em MB), ou None fora do Unix."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+def train_churn_out_of_core(path=PROCESSED_DATA_PATH, linhas_por_bloco=LINHAS_POR_BLOCO,
+                            arvores_por_bloco=ARVORES_POR_BLOCO, test_size=0.25, n_jobs=None,
+                            random_state=42):
+    """
+    Treina a floresta de churn bloco a bloco e a avalia no teste em streaming.
+
+    Args:
+        path (str): Tabela de treino (CSV ou Parquet).
+        linhas_por_bloco (int): Clientes lidos por bloco.
+        arvores_por_bloco (int): Árvores adicionadas a cada bloco de treino.
+        test_size (float): Fração de cada classe reservada para o teste.
+        n_jobs (int): Processos do scikit-learn no ajuste de cada bloco.
+
+    Returns:
+        tuple: (modelo; dict com as métricas do teste, tempos e pico de memória)
+    """
+    inicio = time.perf_counter()
+    split = StreamingStratifiedSplit(test_size, random_state)
+
+    # Mesmos parâmetros do modelo em memória (train_churn_model.py)
+    model = RandomForestClassifier(
+        n_estimators=0,
+        random_state=random_state,
+        max_depth=8,
+        class_weight='balanced',
+        warm_start=True,
+        n_jobs=n_jobs,
+    )
+
+    pasta = tempfile.mkdtemp(prefix='churn_ooc_')
+    try:
+        # 1. Um passe pelo arquivo: treina com a parte de treino de cada
+        #    bloco e grava a parte de teste em disco
+        path_teste = os.path.join(pasta, 'X_teste.f32')
+        y_teste = []
+        pendente = None  # bloco de treino com uma só classe, juntado ao próximo
+        n_treino = n_blocos = 0
+        features_list = None
+        with open(path_teste, 'wb') as arquivo_teste:
+            for X_bloco, y_bloco in iter_churn_chunks(path, linhas_por_bloco):
+                features_list = list(X_bloco.columns)
+                teste = split(y_bloco)
+
+                arquivo_teste.write(np.ascontiguousarray(X_bloco.to_numpy()[teste], dtype=np.float32).tobytes())
+                y_teste.append(y_bloco[teste])
+
+                X_treino, y_treino = X_bloco[~teste], y_bloco[~teste]
+                if pendente is not None:
+                    X_treino = pd.concat([pendente[0], X_treino])
+                    y_treino = np.concatenate([pendente[1], y_treino])
+                    pendente = None
+                if len(np.unique(y_treino)) < 2:
+                    pendente = (X_treino, y_treino)
+                    continue
+
+                model.n_estimators += arvores_por_bloco
+                with warnings.catch_warnings():
+                    # O 'balanced' é calculado no bloco; como o split é
+                    # estratificado, a proporção das classes é a do arquivo
+                    warnings.filterwarnings('ignore', message='class_weight presets')
+                    model.fit(X_treino, y_treino)
+                n_treino += len(y_treino)
+                n_blocos += 1
+
+        if pendente is not None and n_blocos == 0:
+            raise ValueError("A tabela de treino precisa ter as duas classes de 'is_churn'.")
+        model.set_params(warm_start=False)
+        tempo_treino = time.perf_counter() - inicio
+
+        # 2. Avaliação: teste aberto como memmap e previsto em blocos
+        y_teste = np.concatenate(y_teste)
+        X_teste = np.memmap(path_teste, dtype=np.float32, mode='r', shape=(len(y_teste), len(features_list)))
+        proba = np.empty(len(y_teste), dtype=np.float64)
+        for i in range(0, len(y_teste), linhas_por_bloco):
+            bloco = pd.DataFrame(X_teste[i:i + linhas_por_bloco], columns=features_list)
+            proba[i:i + linhas_por_bloco] = model.predict_proba(bloco)[:, 1]
+        del X_teste
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    # Mesma decisão do 'predict' da floresta (classe de maior probabilidade)
+    y_pred = (proba > 0.5).astype(np.int8)
+    pico = peak_rss_mb()
+    metricas = {
+        'clientes_treino': int(n_treino),
+        'clientes_teste': int(len(y_teste)),
+        'blocos': int(n_blocos),
+        'arvores': int(model.n_estimators),
+        'roc_auc': round(float(roc_auc_score(y_teste, proba)), 4),
+        'average_precision': round(float(average_precision_score(y_teste, proba)), 4),
+        'tempo_treino_s': round(tempo_treino, 2),
+        'tempo_total_s': round(time.perf_counter() - inicio, 2),
+        'pico_memoria_mb': round(pico, 1) if pico is not None else None,
+        'relatorio': classification_report(y_teste, y_pred, target_names=['Classe 0 (Ativo)', 'Classe 1 (Churn)']),
+        'matriz_confusao': confusion_matrix(y_teste, y_pred),
+    }
+    return model, metricas
+
+def train_and_save_churn_model_out_of_core(path=PROCESSED_DATA_PATH, linhas_por_bloco=LINHAS_POR_BLOCO,
+                                           arvores_por_bloco=ARVORES_POR_BLOCO, n_jobs=None):
+    """
+    FASE 5 (Modelagem) fora da memória: treina, avalia e salva os mesmos
+    artefatos de 'train_and_save_churn_model' (.joblib e .npz).
+    """
+    print("--- Iniciando FASE 5: Treinamento do Modelo de Churn (fora da memória) ---")
+
+    if not os.path.exists(path) and not os.path.exists(os.path.splitext(path)[0] + '.csv'):
+        print(f"Erro: Arquivo de features de churn não encontrado em {path}")
+        print("Certifique-se que a FASE 5 (notebook 04) foi executada com sucesso.")
+        return
+
+    print(f"Lendo {path} em blocos de {linhas_por_bloco} clientes ({arvores_por_bloco} árvores por bloco)...")
+    model_churn, metricas = train_churn_out_of_core(path, linhas_por_bloco, arvores_por_bloco, n_jobs=n_jobs)
+    print(f"Treinamento concluído: {metricas['arvores']} árvores em {metricas['blocos']} blocos, "
+          f"{metricas['clientes_treino']} clientes de treino ({metricas['tempo_treino_s']}s).")
+
+    print("\n--- Relatório de Classificação (Churn) ---")
+    print(metricas['relatorio'])
+    print("\n--- Matriz de Confusão ---")
+    print(metricas['matriz_confusao'])
+    print(f"\nROC AUC: {metricas['roc_auc']} | Average precision: {metricas['average_precision']}")
+    print(f"Pico de memória (RSS): {metricas['pico_memoria_mb']} MB")
+
+    # Mesmos artefatos do treino em memória
+    os.makedirs(MODEL_OUTPUT_PATH, exist_ok=True)
+    model_path = MODEL_PATH
+    save_artifact(model_churn, model_path)
+    flat_path = os.path.join(MODEL_OUTPUT_PATH, 'churn_predictor.npz')
+    export_forest(model_churn, flat_path)
+    write_metadata(model_path, {'features_churn_clientes': artifact_hash(path), 'modo': 'out-of-core'})
+
+    print(f"\nModelo de CHURN salvo em: {model_path}")
+    print(f"Floresta achatada salva em: {flat_path}")
+    print("--- FASE 5 (Modelagem) Concluída ---")
+    return metricas
+
+if __name__ == '__main__':
+    # Rode com: python src/models/train_churn_out_of_core.py --blocos 100000
+    parser = argparse.ArgumentParser(description="FASE 5: treino do modelo de churn fora da memória.")
+    parser.add_argument('--entrada', default=PROCESSED_DATA_PATH, help="Tabela de treino (Feather, CSV ou Parquet).")
+    parser.add_argument('--blocos', type=int, default=LINHAS_POR_BLOCO, help="Clientes por bloco.")
+    parser.add_argument('--arvores-por-bloco', type=int, default=ARVORES_POR_BLOCO)
+    parser.add_argument('--jobs', type=int, default=None, help="Processos do ajuste de cada bloco.")
+    args = parser.parse_args()
+
+    train_and_save_churn_model_out_of_core(args.entrada, args.blocos, args.arvores_por_bloco, args.jobs)
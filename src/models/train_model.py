@@ -1,6 +1,6 @@
-import pandas as pd
-import joblib
+import argparse
 import os
+import sys
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
@@ -8,46 +8,79 @@ from sklearn.metrics import classification_report
 
 # Caminho raiz do projeto (sobe 2 níveis: src/models -> projeto_raiz)
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-PROCESSED_DATA_PATH = os.path.join(PROJECT_ROOT, 'dados', 'processed', 'features_clientes.csv')
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para podermos importar
+# o 'model_registry' e os artefatos da FASE 2 ('data.artifacts')
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from data.artifacts import (FEATURES_CLIENTES_PATH, artifact_hash, code_hash, is_up_to_date, read_artifact,
+                            write_metadata)
+from data.instrumentation import instrumented, span
+
+from models import classification_rules, flat_forest, tuning
+from models.classification_rules import classify_attainment
+from models.flat_forest import export_forest
+from models.model_registry import save_artifact
+from models.tuning import ESPACO_HEALTH_SCORE, save_tuning_report, tune_forest
+
+# Caminhos
+PROCESSED_DATA_PATH = FEATURES_CLIENTES_PATH
 MODEL_OUTPUT_PATH = os.path.join(PROJECT_ROOT, 'modelos')
+MODEL_PATH = os.path.join(MODEL_OUTPUT_PATH, 'health_score_classifier.joblib')
+
+# Código do treino: o hash entra nos metadados do modelo (mesmo esquema da
+# fase de treino em src/pipeline/run_pipeline.py, que lê e grava o mesmo arquivo)
+CODIGO_TREINO = [sys.modules[__name__], classification_rules, flat_forest, tuning]
+
+def training_upstream(tune=False):
+    """Entradas do modelo salvo: hash do código, 'tune' e hash das features."""
+    return {'codigo': code_hash(CODIGO_TREINO), 'tune': tune,
+            'features_clientes': artifact_hash(PROCESSED_DATA_PATH)}
 
 def apply_classification_rules(df):
     """
     Aplica as regras de negócio (do saida.xlsx) para criar o "label" (alvo).
     Usa a coluna 'atingimento_meta_tpv' como base.
+
+    As faixas vêm da tabela compartilhada REGRAS_CLASSIFICACAO
+    (classification_rules.py); a coluna 'Classificacao' sai como categórica.
     """
     # atingimento_meta_tpv já é um percentual (ex: 1.12, 0.75)
-    
-    def get_class(atingimento):
-        if atingimento >= 1.0:
-            return 'Alta Performance'
-        if atingimento >= 0.8:
-            return 'Boa Performance'
-        if atingimento >= 0.5:
-            return 'Performance Regular'
-        if atingimento >= 0.1:
-            return 'Baixa Performance'
-        return 'Critico' # Menor que 0.1 (10%)
-
-    df['Classificacao'] = df['atingimento_meta_tpv'].apply(get_class)
+    df['Classificacao'] = classify_attainment(df['atingimento_meta_tpv'])
     return df
 
-def train_and_save_model():
+@instrumented('treino_health_score')
+def train_and_save_model(tune=False, n_workers=-1, force=False):
     """
     Função principal da FASE 3.
     Carrega features, aplica regras, treina o modelo e salva os artefatos.
+
+    Args:
+        tune (bool): Se True, escolhe os parâmetros da floresta com a busca
+                     de tuning.py (successive halving + validação cruzada)
+                     em vez dos valores fixos.
+        n_workers (int): Processos usados na busca (-1 = todos os núcleos).
+        force (bool): Se True, treina mesmo que as features não tenham mudado.
     """
     
     print("--- Iniciando FASE 3: Treinamento do Modelo ---")
+
+    # 0. Pula o treino se o modelo salvo já veio destas mesmas features (e do mesmo código)
+    upstream = training_upstream(tune)
+    if not force and upstream['features_clientes'] is not None and is_up_to_date(MODEL_PATH, upstream):
+        print(f"Features sem mudanças desde o último treino ({upstream['features_clientes']}). "
+              "Use --force para treinar de novo.")
+        return
     
     # 1. Carregar DataFrame de Features (da FASE 2)
-    try:
-        df_features = pd.read_csv(PROCESSED_DATA_PATH, index_col='id_cliente')
-        print(f"DataFrame de features carregado: {df_features.shape}")
-    except FileNotFoundError:
-        print(f"Erro: Arquivo de features não encontrado em {PROCESSED_DATA_PATH}")
+    df_features = read_artifact(PROCESSED_DATA_PATH)
+    if df_features is None:
         print("Certifique-se que a FASE 2 (notebook 02) foi executada com sucesso.")
         return
+    print(f"DataFrame de features carregado: {df_features.shape}")
 
     # 2. Definição do Alvo (Label 'y')
     # Aplicamos as regras do 'saida.xlsx' para criar nossa coluna alvo
@@ -91,13 +124,21 @@ def train_and_save_model():
     print(f"Dados divididos: {len(X_train)} para treino, {len(X_test)} para teste.")
 
     # 6. Treinamento do Modelo (Random Forest)
-    print("Treinando o modelo RandomForestClassifier...")
-    model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10)
-    model.fit(X_train, y_train)
+    with span('fit', linhas_entrada=len(X_train)):
+        if tune:
+            # Busca dos parâmetros (o modelo escolhido já vem treinado em X_train)
+            model, relatorio = tune_forest(X_train, y_train, ESPACO_HEALTH_SCORE, 'health_score',
+                                           scoring='f1_macro', n_workers=n_workers)
+            save_tuning_report(relatorio, MODEL_OUTPUT_PATH)
+        else:
+            print("Treinando o modelo RandomForestClassifier...")
+            model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10)
+            model.fit(X_train, y_train)
     print("Treinamento concluído.")
 
     # 7. Avaliação (Ver se o modelo é bom)
-    y_pred = model.predict(X_test)
+    with span('predict', linhas_entrada=len(X_test)):
+        y_pred = model.predict(X_test)
     print("\n--- Relatório de Classificação (Performance do Modelo) ---")
     # Imprime o relatório com as classes reais (decodificadas)
     print(classification_report(y_test, y_pred, target_names=encoder.classes_))
@@ -106,17 +147,33 @@ def train_and_save_model():
     # Criamos a pasta /modelos/ se ela não existir
     os.makedirs(MODEL_OUTPUT_PATH, exist_ok=True)
     
-    model_path = os.path.join(MODEL_OUTPUT_PATH, 'health_score_classifier.joblib')
+    model_path = MODEL_PATH
     encoder_path = os.path.join(MODEL_OUTPUT_PATH, 'label_encoder.joblib')
     
-    joblib.dump(model, model_path)
-    joblib.dump(encoder, encoder_path)
+    # Escrita atômica: a API recarrega a nova versão sem ler arquivo pela metade
+    save_artifact(model, model_path)
+    save_artifact(encoder, encoder_path)
+
+    # Versão achatada da floresta (.npz), usada no scoring sem o scikit-learn
+    flat_path = os.path.join(MODEL_OUTPUT_PATH, 'health_score_classifier.npz')
+    export_forest(model, flat_path, encoder=encoder)
+
+    # Hash das features usadas, para o próximo treino saber se pode ser pulado
+    write_metadata(model_path, upstream)
     
     print(f"\nModelo salvo em: {model_path}")
     print(f"Encoder salvo em: {encoder_path}")
+    print(f"Floresta achatada salva em: {flat_path}")
     print("--- FASE 3 Concluída ---")
 
 if __name__ == '__main__':
     # Permite rodar este script diretamente do terminal
     # (com o venv ativado): python src/models/train_model.py
-    train_and_save_model()
\ No newline at end of file
+    # Modo tuning: python src/models/train_model.py --tune --workers 8
+    parser = argparse.ArgumentParser(description="FASE 3: treino do classificador de Health Score.")
+    parser.add_argument('--tune', action='store_true', help="Busca os parâmetros da floresta (tuning.py).")
+    parser.add_argument('--workers', type=int, default=-1, help="Processos da busca (-1 = todos os núcleos).")
+    parser.add_argument('--force', action='store_true', help="Treina mesmo sem mudanças nas features.")
+    args = parser.parse_args()
+
+    train_and_save_model(tune=args.tune, n_workers=args.workers, force=args.force)
\ No newline at end of file
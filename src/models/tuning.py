@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (habilita o HalvingGridSearchCV)
+from sklearn.model_selection import HalvingGridSearchCV, StratifiedKFold
+
+# Adiciona a pasta 'src' ao path para podermos importar os módulos do projeto
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+if SRC_PATH not in sys.path:
+    sys.path.append(SRC_PATH)
+
+from models.model_registry import MODEL_DIR
+
+# Modo de ajuste (tuning) dos classificadores das FASES 3 e 5: busca com
+# validação cruzada sobre os parâmetros da floresta, em um pool de processos.
+#
+# - A matriz de features é gravada UMA vez em um arquivo e aberta como
+#   memmap: os processos do pool (joblib/loky) recebem só a referência ao
+#   arquivo, em vez de uma cópia serializada dos dados a cada tarefa.
+# - Successive halving (HalvingGridSearchCV): todas as configurações começam
+#   com uma amostra pequena dos clientes; a cada rodada só o melhor 1/'fator'
+#   continua, com 'fator' vezes mais clientes. As configurações ruins são
+#   descartadas antes de custarem um ajuste com a carteira inteira.
+# - O relatório (JSON em 'modelos/') guarda o tempo total, o tempo de ajuste
+#   de cada configuração em cada rodada e a configuração escolhida.
+
+# Espaços de busca (os valores fixos dos scripts de treino estão incluídos)
+ESPACO_HEALTH_SCORE = {
+    'n_estimators': [100, 200],
+    'max_depth': [8, 10, 14, None],
+    'min_samples_leaf': [1, 5, 20],
+    'max_features': ['sqrt', 0.5],
+}
+
+ESPACO_CHURN = {
+    'n_estimators': [100, 200],
+    'max_depth': [6, 8, 12],
+    'min_samples_leaf': [1, 5, 20],
+    'max_features': ['sqrt', 0.5],
+}
+
+def _memmap(X, pasta):
+    """Grava X (float32, contíguo) em 'pasta' e o reabre como memmap somente leitura."""
+    path = os.path.join(pasta, 'X.joblib')
+    joblib.dump(np.ascontiguousarray(X, dtype=np.float32), path)
+    return joblib.load(path, mmap_mode='r')
+
+def tune_forest(X, y, espaco, nome, params_fixos=None, scoring='f1_macro', n_workers=-1,
+                n_folds=3, fator=3, random_state=42):
+    """
+    Busca os parâmetros da floresta com successive halving e validação cruzada.
+
+    Args:
+        X (pd.DataFrame): Features de treino.
+        y (array-like): Alvo.
+        espaco (dict): Grade de parâmetros (ver ESPACO_HEALTH_SCORE / ESPACO_CHURN).
+        nome (str): Nome do modelo (usado no relatório: 'tuning_<nome>.json').
+        params_fixos (dict): Parâmetros fixos da floresta (ex: class_weight).
+        scoring (str): Métrica da validação cruzada (scikit-learn).
+        n_workers (int): Processos do pool (-1 = todos os núcleos).
+        n_folds (int): Dobras da validação cruzada (estratificada).
+        fator (int): A cada rodada fica 1/'fator' das configurações.
+
+    Returns:
+        tuple: (modelo escolhido, re-treinado em todo X; relatório em dict)
+    """
+    params_fixos = dict(params_fixos or {})
+    base = RandomForestClassifier(random_state=random_state, n_jobs=1, **params_fixos)
+    n_configuracoes = int(np.prod([len(valores) for valores in espaco.values()]))
+    print(f"Tuning '{nome}': {n_configuracoes} configurações, {n_folds} dobras, {len(X)} clientes.")
+
+    inicio = time.perf_counter()
+    pasta = tempfile.mkdtemp(prefix='tuning_')
+    try:
+        # 1. Dados em memmap (compartilhados pelos processos, sem cópia)
+        X_memmap = _memmap(X, pasta)
+        y_array = np.asarray(y)
+
+        # 2. Successive halving em paralelo (uma tarefa por configuração x dobra)
+        busca = HalvingGridSearchCV(
+            base, espaco, factor=fator, resource='n_samples',
+            min_resources=max(len(X) // fator ** 3, 20 * n_folds),
+            cv=StratifiedKFold(n_folds, shuffle=True, random_state=random_state),
+            scoring=scoring, n_jobs=n_workers, refit=False, random_state=random_state,
+        )
+        busca.fit(X_memmap, y_array)
+        tempo_busca = time.perf_counter() - inicio
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    # 3. Modelo escolhido, re-treinado com todos os dados (com os nomes das features)
+    melhores = dict(busca.best_params_)
+    inicio_final = time.perf_counter()
+    model = RandomForestClassifier(random_state=random_state, n_jobs=n_workers, **params_fixos, **melhores)
+    model.fit(X, y)
+    model.set_params(n_jobs=None)  # na predição, o padrão do script original
+    tempo_final = time.perf_counter() - inicio_final
+
+    # 4. Relatório
+    resultados = pd.DataFrame(busca.cv_results_)
+    relatorio = {
+        'modelo': nome,
+        'clientes': len(X),
+        'scoring': scoring,
+        'configuracoes': n_configuracoes,
+        'rodadas': int(busca.n_iterations_),
+        'clientes_por_rodada': [int(n) for n in busca.n_resources_],
+        'tempo_busca_s': round(tempo_busca, 2),
+        'tempo_modelo_final_s': round(tempo_final, 2),
+        'tempo_total_s': round(tempo_busca + tempo_final, 2),
+        'melhores_params': melhores,
+        'melhor_score_cv': round(float(busca.best_score_), 4),
+        'ajustes': [
+            {
+                'rodada': int(linha['iter']),
+                'clientes': int(linha['n_resources']),
+                'params': linha['params'],
+                'tempo_ajuste_medio_s': round(float(linha['mean_fit_time']), 3),
+                'score_cv': round(float(linha['mean_test_score']), 4),
+            }
+            for _, linha in resultados.iterrows()
+        ],
+    }
+
+    print(f"Busca concluída em {relatorio['tempo_busca_s']}s ({relatorio['rodadas']} rodadas: "
+          f"{relatorio['clientes_por_rodada']} clientes). Modelo final: {relatorio['tempo_modelo_final_s']}s.")
+    print(f"Melhores parâmetros: {melhores} ({scoring} = {relatorio['melhor_score_cv']})")
+    return model, relatorio
+
+def save_tuning_report(relatorio, model_dir=MODEL_DIR):
+    """Grava o relatório do tuning em 'modelos/tuning_<nome>.json'."""
+    os.makedirs(model_dir, exist_ok=True)
+    path = os.path.join(model_dir, f"tuning_{relatorio['modelo']}.json")
+    with open(path, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2, default=str)
+    print(f"Relatório do tuning salvo em: {path}")
+    return path
+
+if __name__ == '__main__':
+    # Teste rápido com features sintéticas (rode com: python src/models/tuning.py)
+    import contextlib
+    import io
+    from benchmarks.synthetic import make_synthetic_history, make_synthetic_metas
+    from features.build_features import engineer_features
+    from models.classification_rules import classify_attainment
+
+    df_historico = make_synthetic_history(5_000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_features = engineer_features(df_historico, make_synthetic_metas(df_historico))
+    features_list = ['atingimento_meta_tpv', 'margem_op_media', 'tendencia_tpv', 'volatilidade_tpv'] + \
+        [col for col in df_features.columns if 'mix_pct_' in col]
+    y = classify_attainment(df_features['atingimento_meta_tpv']).cat.codes
+
+    model, relatorio = tune_forest(df_features[features_list], y, ESPACO_HEALTH_SCORE, 'teste')
+    print(json.dumps({k: v for k, v in relatorio.items() if k != 'ajustes'}, ensure_ascii=False, indent=2, default=str))
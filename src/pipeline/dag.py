@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Adiciona a raiz do projeto ao path para importar 'data.artifacts'
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from data.artifacts import (artifact_hash, code_hash, content_hash, is_up_to_date, read_artifact, write_artifact,
+                            write_metadata)
+
+# Executor de fases em DAG: cada fase declara de quais fases depende, os
+# parâmetros que mudam o resultado e o código que a implementa.
+#
+# - Fases independentes rodam ao mesmo tempo, em threads. O pandas, o NumPy, o
+#   Arrow e as árvores do scikit-learn liberam o GIL nos laços pesados, e os
+#   valores em memória (ex: o histórico) são compartilhados sem cópia.
+# - Chave de cache de uma fase: hash do código, parâmetros e hash do
+#   conteúdo de cada dependência (não da chave dela). Se a saída de uma fase
+#   refeita sai igual, as de baixo continuam válidas.
+# - Fases com saída em disco ('artefato' em Feather ou 'arquivo' gravado pela
+#   própria fase, ex: um modelo) são puladas quando a chave é a mesma da última
+#   execução (mesmos metadados 'upstream' de data/artifacts.py). O valor de uma
+#   fase pulada só é lido do disco se alguma fase de baixo precisar rodar.
+# - Fases só em memória (ex: a carga da fonte) rodam sempre; o hash do
+#   conteúdo delas decide o resto.
+# - O valor em memória de uma fase é liberado quando todas as fases que
+#   dependem dela terminam.
+
+class Phase:
+    """
+    Uma fase do pipeline.
+
+    Args:
+        nome (str): Nome da fase (as dependências se referem a ele).
+        funcao (callable): funcao(entradas, **parametros, **opcoes), em que
+                           'entradas' é {nome da dependência: valor}.
+        dependencias (list): Nomes das fases de entrada.
+        parametros (dict, opcional): Parâmetros que mudam o resultado (entram
+                                     na chave de cache; precisam ser JSON).
+        opcoes (dict, opcional): Repassadas à função sem entrar na chave
+                                 (ex: n_workers).
+        codigo (list, opcional): Módulos ou funções que implementam a fase (o
+                                 código-fonte entra na chave; default: 'funcao').
+        artefato (str, opcional): Feather onde o DataFrame devolvido é gravado.
+        arquivo (str, opcional): Arquivo gravado pela própria fase (ex: modelo).
+    """
+
+    def __init__(self, nome, funcao, dependencias=(), parametros=None, opcoes=None, codigo=None,
+                 artefato=None, arquivo=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.dependencias = list(dependencias)
+        self.parametros = dict(parametros or {})
+        self.opcoes = dict(opcoes or {})
+        self.codigo = list(codigo) if codigo is not None else [funcao]
+        self.artefato = artefato
+        self.arquivo = arquivo
+
+    @property
+    def persistente(self):
+        return self.artefato is not None or self.arquivo is not None
+
+def _upstream_key(upstream):
+    return hashlib.blake2b(json.dumps(upstream, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+def _topological_order(fases):
+    """Nomes das fases em ordem topológica (ValueError se houver ciclo ou dependência desconhecida)."""
+    ordem, visitadas, em_curso = [], set(), set()
+
+    def visitar(nome, caminho):
+        if nome in visitadas:
+            return
+        if nome not in fases:
+            raise ValueError(f"Fase desconhecida: '{nome}' (dependência de '{caminho[-1]}').")
+        if nome in em_curso:
+            raise ValueError(f"Ciclo entre as fases: {' -> '.join(caminho + [nome])}")
+        em_curso.add(nome)
+        for dependencia in fases[nome].dependencias:
+            visitar(dependencia, caminho + [nome])
+        em_curso.discard(nome)
+        visitadas.add(nome)
+        ordem.append(nome)
+
+    for nome in fases:
+        visitar(nome, [])
+    return ordem
+
+class _Values:
+    """
+    Valores das fases já resolvidas. Uma fase pulada guarda só o caminho do
+    artefato e é lida (uma vez, por memory map) quando a primeira fase de
+    baixo pede o valor.
+    """
+
+    def __init__(self, dependentes):
+        self._valores = {}
+        self._artefatos = {}
+        self._pendentes = dict(dependentes)  # fase -> dependentes que ainda não terminaram
+        self._locks = {nome: threading.Lock() for nome in dependentes}
+
+    def set(self, nome, valor=None, artefato=None):
+        if self._pendentes[nome] == 0:
+            return
+        if artefato is not None:
+            self._artefatos[nome] = artefato
+        else:
+            self._valores[nome] = valor
+
+    def get(self, nome):
+        with self._locks[nome]:
+            if nome not in self._valores and nome in self._artefatos:
+                self._valores[nome] = read_artifact(self._artefatos[nome])
+            return self._valores.get(nome)
+
+    def release(self, dependencias):
+        # Chamado quando uma fase termina: libera o que ninguém mais vai usar
+        for nome in dependencias:
+            self._pendentes[nome] -= 1
+            if self._pendentes[nome] == 0:
+                self._valores.pop(nome, None)
+
+def _run_phase(fase, hashes, valores, forcar):
+    """
+    Roda (ou pula) uma fase.
+
+    Returns:
+        dict: {status, hash, tempo_s}; status 'executada', 'pulada' ou 'falhou'.
+    """
+    inicio = time.perf_counter()
+    upstream = {'codigo': code_hash(fase.codigo), **fase.parametros}
+    upstream.update({nome: hashes[nome] for nome in fase.dependencias})
+    destino = fase.artefato or fase.arquivo
+
+    # 1. Mesma chave da última execução: pula (o valor fica no disco)
+    if fase.persistente and not forcar and is_up_to_date(destino, upstream):
+        if fase.artefato is not None:
+            saida = artifact_hash(fase.artefato)
+            valores.set(fase.nome, artefato=fase.artefato)
+        else:
+            saida = _upstream_key(upstream)
+        return {'status': 'pulada', 'hash': saida, 'tempo_s': time.perf_counter() - inicio}
+
+    # 2. Executa com os valores das dependências
+    entradas = {nome: valores.get(nome) for nome in fase.dependencias}
+    resultado = fase.funcao(entradas, **fase.parametros, **fase.opcoes)
+
+    # 3. Grava a saída com a chave, para a próxima execução poder pular
+    if fase.artefato is not None:
+        if resultado is None:
+            return {'status': 'falhou', 'hash': None, 'tempo_s': time.perf_counter() - inicio}
+        saida = write_artifact(resultado, fase.artefato, upstream=upstream)['hash']
+    elif fase.arquivo is not None:
+        if not os.path.exists(fase.arquivo):
+            return {'status': 'falhou', 'hash': None, 'tempo_s': time.perf_counter() - inicio}
+        saida = _upstream_key(upstream)
+        write_metadata(fase.arquivo, upstream, hash=saida)
+    else:
+        if resultado is None:
+            return {'status': 'falhou', 'hash': None, 'tempo_s': time.perf_counter() - inicio}
+        saida = content_hash(resultado)
+    valores.set(fase.nome, resultado)
+    return {'status': 'executada', 'hash': saida, 'tempo_s': time.perf_counter() - inicio}
+
+def run_dag(fases, forcar=(), n_workers=None):
+    """
+    Roda as fases respeitando as dependências, com as fases independentes em
+    paralelo e as que não mudaram puladas.
+
+    Args:
+        fases (list): Objetos 'Phase'.
+        forcar (list, opcional): Nomes das fases a refazer mesmo sem mudanças
+                                 (as de baixo só refazem se a saída mudar).
+        n_workers (int, opcional): Fases ao mesmo tempo (default: todas as prontas).
+
+    Returns:
+        dict: Nome da fase -> {status, hash, tempo_s}. Status: 'executada',
+              'pulada', 'falhou' (erro ou retorno None) ou 'cancelada'
+              (uma dependência falhou).
+    """
+    fases = {fase.nome: fase for fase in fases}
+    ordem = _topological_order(fases)
+    dependentes = {nome: sum(nome in fase.dependencias for fase in fases.values()) for nome in fases}
+    valores = _Values(dependentes)
+    hashes, resultados, em_execucao = {}, {}, {}
+
+    with ThreadPoolExecutor(max_workers=n_workers or len(fases)) as executor:
+        while len(resultados) < len(fases):
+            # 1. Dispara as fases com todas as dependências resolvidas
+            for nome in ordem:
+                if nome in resultados or nome in em_execucao.values():
+                    continue
+                status_dependencias = [resultados.get(dep, {}).get('status') for dep in fases[nome].dependencias]
+                if any(status in ('falhou', 'cancelada') for status in status_dependencias):
+                    resultados[nome] = {'status': 'cancelada', 'hash': None, 'tempo_s': 0.0}
+                    valores.release(fases[nome].dependencias)
+                    print(f"[pipeline] {nome}: cancelada (dependência falhou)")
+                elif all(status_dependencias):
+                    futuro = executor.submit(_run_phase, fases[nome], hashes, valores, nome in forcar)
+                    em_execucao[futuro] = nome
+            if not em_execucao:
+                continue
+
+            # 2. Espera a próxima terminar
+            prontos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                nome = em_execucao.pop(futuro)
+                try:
+                    resultados[nome] = futuro.result()
+                except Exception as e:
+                    print(f"Erro na fase '{nome}': {type(e).__name__}: {e}")
+                    resultados[nome] = {'status': 'falhou', 'hash': None, 'tempo_s': None}
+                hashes[nome] = resultados[nome]['hash']
+                valores.release(fases[nome].dependencias)
+                tempo = resultados[nome]['tempo_s']
+                print(f"[pipeline] {nome}: {resultados[nome]['status']}"
+                      + (f" em {tempo:.2f}s" if tempo is not None else ""))
+
+    return {nome: resultados[nome] for nome in ordem}
@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+import time
+
+# Adiciona a raiz do projeto e a pasta 'src' ao path para importar os módulos
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SRC_PATH = os.path.join(PROJECT_ROOT, 'src')
+for path in (PROJECT_ROOT, SRC_PATH):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from data.artifacts import LABELS_CHURN_PATH
+from data.history_cache import get_cached_historical_data
+from data.make_dataset import get_metas_from_redshift
+from features import build_churn_labels, build_features
+from models import train_churn_model, train_model
+from pipeline.dag import Phase, run_dag
+
+# Pipeline completo (FASES 1, 2, 3 e 5, antes encadeadas à mão nos notebooks
+# 02 a 05) declarado como um DAG:
+#
+#   historico --+--> features_clientes --+--------------------------> treino_health_score
+#               |                        |
+#   metas ------+                        +--> features_churn_clientes --> treino_churn
+#               |                        |
+#               +--> labels_churn -------+
+#
+# O histórico é carregado uma vez (o notebook 04 buscava de novo só para os
+# labels) e compartilhado entre o ramo das features e o dos labels de churn.
+# Os dois treinos rodam em paralelo. Cada fase é pulada quando o código, os
+# parâmetros e o conteúdo das entradas são os mesmos da última execução: mudar
+# 'days_for_churn' refaz só labels -> tabela de churn -> treino de churn. As
+# fases de treino usam as mesmas entradas que train_model.py e
+# train_churn_model.py gravam nos metadados do modelo ('training_upstream'): um
+# modelo treinado pelo script vale para o pipeline e vice-versa.
+
+def _load_history(entradas, dat_start_filter, carregar):
+    return carregar(dat_start_filter=dat_start_filter)
+
+def _load_goals(entradas, carregar):
+    return carregar()
+
+def _features(entradas, n_workers):
+    return build_features.engineer_features(entradas['historico'], entradas['metas'], n_workers=n_workers)
+
+def _churn_labels(entradas, days_for_churn):
+    return build_churn_labels.create_churn_labels(entradas['historico'][['data', 'id_cliente']],
+                                                  days_for_churn=days_for_churn)
+
+def _churn_training_table(entradas):
+    # Junta as features (X) com o alvo (y) e remove clientes sem label
+    return entradas['features_clientes'].join(entradas['labels_churn']).dropna(subset=['is_churn'])
+
+def _train_health_score(entradas, tune, n_workers):
+    train_model.train_and_save_model(tune=tune, n_workers=n_workers, force=True)
+
+def _train_churn(entradas, tune, n_workers):
+    train_churn_model.train_and_save_churn_model(tune=tune, n_workers=n_workers, force=True)
+
+def build_pipeline(dat_start_filter='2024-01-01', days_for_churn=45, tune=False, n_workers=1,
+                   carregar_historico=get_cached_historical_data, carregar_metas=get_metas_from_redshift):
+    """
+    Declara as fases do pipeline. Os caminhos dos artefatos e modelos vêm de
+    train_model.py e train_churn_model.py (os mesmos dos scripts de treino).
+
+    Args:
+        dat_start_filter (str): Início do histórico (YYYY-MM-DD).
+        days_for_churn (int): Janela em dias para o label de churn.
+        tune (bool): Se True, os treinos usam a busca de tuning.py.
+        n_workers (int): Processos da agregação de features e do tuning
+                         (não muda o resultado, não entra no cache).
+        carregar_historico (callable): Fonte do histórico (default: cache local + Redshift).
+        carregar_metas (callable): Fonte das metas (default: Redshift).
+
+    Returns:
+        list: Objetos 'Phase' para 'run_dag'.
+    """
+    return [
+        Phase('historico', _load_history, parametros={'dat_start_filter': dat_start_filter},
+              opcoes={'carregar': carregar_historico}),
+        Phase('metas', _load_goals, opcoes={'carregar': carregar_metas}),
+        Phase('features_clientes', _features, ['historico', 'metas'], opcoes={'n_workers': n_workers},
+              codigo=[_features, build_features], artefato=train_model.PROCESSED_DATA_PATH),
+        Phase('labels_churn', _churn_labels, ['historico'], parametros={'days_for_churn': days_for_churn},
+              codigo=[_churn_labels, build_churn_labels], artefato=LABELS_CHURN_PATH),
+        Phase('features_churn_clientes', _churn_training_table, ['features_clientes', 'labels_churn'],
+              artefato=train_churn_model.PROCESSED_DATA_PATH),
+        Phase('treino_health_score', _train_health_score, ['features_clientes'], parametros={'tune': tune},
+              opcoes={'n_workers': n_workers}, codigo=train_model.CODIGO_TREINO,
+              arquivo=train_model.MODEL_PATH),
+        Phase('treino_churn', _train_churn, ['features_churn_clientes'], parametros={'tune': tune},
+              opcoes={'n_workers': n_workers}, codigo=train_churn_model.CODIGO_TREINO,
+              arquivo=train_churn_model.MODEL_PATH),
+    ]
+
+def run_pipeline(forcar=(), max_paralelas=None, **parametros):
+    """
+    Roda o pipeline inteiro (ver 'build_pipeline' para os parâmetros).
+
+    Returns:
+        dict: Nome da fase -> {status, hash, tempo_s} (ver 'run_dag').
+    """
+    print("--- Iniciando pipeline (FASES 1, 2, 3 e 5) ---")
+    inicio = time.perf_counter()
+    resultados = run_dag(build_pipeline(**parametros), forcar=forcar, n_workers=max_paralelas)
+
+    print(f"\n--- Pipeline concluído em {time.perf_counter() - inicio:.2f}s ---")
+    for nome, resultado in resultados.items():
+        tempo = f"{resultado['tempo_s']:.2f}s" if resultado['tempo_s'] is not None else '-'
+        print(f"{nome:<25} {resultado['status']:<10} {tempo:>8}")
+    return resultados
+
+if __name__ == '__main__':
+    # Rode com: python src/pipeline/run_pipeline.py --dias-churn 45
+    parser = argparse.ArgumentParser(description="Pipeline completo: histórico, features, labels de churn e treinos.")
+    parser.add_argument('--inicio', default='2024-01-01', help="Início do histórico (YYYY-MM-DD).")
+    parser.add_argument('--dias-churn', type=int, default=45, help="Janela do label de churn (dias).")
+    parser.add_argument('--tune', action='store_true', help="Busca os parâmetros das florestas (tuning.py).")
+    parser.add_argument('--workers', type=int, default=1, help="Processos da agregação e do tuning.")
+    parser.add_argument('--forcar', nargs='*', default=[], help="Fases a refazer mesmo sem mudanças.")
+    args = parser.parse_args()
+
+    run_pipeline(forcar=args.forcar, dat_start_filter=args.inicio, days_for_churn=args.dias_churn,
+                 tune=args.tune, n_workers=args.workers)